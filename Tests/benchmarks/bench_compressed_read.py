@@ -0,0 +1,59 @@
+'''
+Benchmark of reading compressed *.dat files (gzip, xz, bz2 and zstd if available)
+The throughput is given in MB/s of the uncompressed file
+'''
+
+# Python imports
+import os
+import gzip
+import lzma
+import bz2
+
+import benchmark_utilities as bench_utils
+
+
+def GetZstdCompress():
+    try:
+        from compression import zstd # Python 3.14
+        return zstd.compress
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        return zstandard.ZstdCompressor().compress
+    except ImportError:
+        return None
+
+
+if __name__ == "__main__":
+    args = bench_utils.ParseArguments(__doc__, default_size=30)
+    import global_utilities as global_utils
+
+    dat_file_path = os.path.join(args.work_dir, "bench_compressed_read.dat")
+    bench_utils.WriteDatFile(dat_file_path, *bench_utils.CreateTetrahedraMesh(args.size))
+    with open(dat_file_path, "rb") as dat_file:
+        file_content = dat_file.read()
+    file_size_mb = len(file_content) / 1024**2
+
+    compressions = {"plain" : None, "gzip" : gzip.compress, "xz" : lzma.compress, "bz2" : bz2.compress, "zstd" : GetZstdCompress()}
+
+    print("File size: {:.1f} MB (uncompressed)".format(file_size_mb))
+    for compression, compress_function in compressions.items():
+        if compression == "plain":
+            file_path = dat_file_path
+        elif compress_function is None:
+            print("{:>6}: not available".format(compression))
+            continue
+        else:
+            file_path = dat_file_path + "." + compression
+            with open(file_path, "wb") as compressed_file:
+                compressed_file.write(compress_function(file_content))
+
+        for use_arrays in [False, True]:
+            time_needed = bench_utils.TimeFunction(lambda: global_utils.ReadAndParseSalomeDatFile(file_path, use_arrays=use_arrays), args.repetitions)
+            print("{:>6}, use_arrays={:<5}: {:.2f} s, {:.1f} MB/s".format(compression, str(use_arrays), time_needed, file_size_mb / time_needed))
+
+        if file_path != dat_file_path:
+            os.remove(file_path)
+
+    os.remove(dat_file_path)
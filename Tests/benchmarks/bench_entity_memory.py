@@ -0,0 +1,45 @@
+'''
+Benchmark of the memory used by the entities in object mode (use_arrays=False)
+Reported are the bytes per geometric entity after reading the *.dat file (incl. the node list
+and the share of the nodes) and the bytes per element that the ModelPart adds when it is written
+'''
+
+# Python imports
+import os
+import tracemalloc
+
+import benchmark_utilities as bench_utils
+
+
+if __name__ == "__main__":
+    args = bench_utils.ParseArguments(__doc__, default_size=30)
+    import global_utilities as global_utils
+    import kratos_io_utilities as kratos_utils
+
+    dat_file_path = os.path.join(args.work_dir, "bench_entity_memory.dat")
+    mdpa_file_path = os.path.join(args.work_dir, "bench_entity_memory.mdpa")
+    bench_utils.WriteDatFile(dat_file_path, *bench_utils.CreateTetrahedraMesh(args.size))
+
+    tracemalloc.start()
+
+    memory_before_reading = tracemalloc.get_traced_memory()[0]
+    valid_file, nodes, geom_entities = global_utils.ReadAndParseSalomeDatFile(dat_file_path)
+    memory_after_reading = tracemalloc.get_traced_memory()[0]
+    if not valid_file:
+        raise Exception("The synthetic mesh could not be read!")
+    num_entities = sum([len(entities) for entities in geom_entities.values()])
+
+    model_part = kratos_utils.MainModelPart()
+    model_part.AddMesh({"smp_name" : "domain"}, {"write_smp" : 1, "entity_creation" : {304 : {"Element" : {"SmallDisplacementElement3D4N" : "0"}}}},
+                       nodes, geom_entities)
+    model_part.WriteMesh(mdpa_file_path)
+    memory_after_writing = tracemalloc.get_traced_memory()[0]
+
+    tracemalloc.stop()
+
+    print("Number of nodes: {}, number of tetrahedra: {}".format(len(nodes), num_entities))
+    print("Geometric entity (read, incl. node list and nodes): {:.0f} B".format((memory_after_reading - memory_before_reading) / num_entities))
+    print("Element (added by the ModelPart when writing):      {:.0f} B".format((memory_after_writing - memory_after_reading) / num_entities))
+
+    os.remove(dat_file_path)
+    os.remove(mdpa_file_path)
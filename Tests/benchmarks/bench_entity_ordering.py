@@ -0,0 +1,65 @@
+'''
+Benchmark of the space-filling-curve ordering of the elements (WriteMesh with "order_entities=True")
+The locality is measured by the ID distance between adjacent elements (tetrahedra that share a face)
+in the written mdpa file, the elements of the synthetic mesh are read in random order
+'''
+
+# Python imports
+import os
+
+# Third party imports
+import numpy as np
+
+import benchmark_utilities as bench_utils
+
+
+def ReadElements(mdpa_file_path):
+    """Returns the IDs and the connectivities of the tetrahedra in the mdpa file"""
+    with open(mdpa_file_path) as mdpa_file:
+        lines = mdpa_file.read().split("\n")
+    begin_elements = [i for i, line in enumerate(lines) if line.startswith("Begin Elements")][0]
+    end_elements = [i for i, line in enumerate(lines) if line.startswith("End Elements")][0]
+    values = np.array([line.split()[:6] for line in lines[begin_elements+1:end_elements]], dtype=np.int64)
+    return values[:,0], values[:,2:6]
+
+
+def GetAdjacentElementsIdDistances(element_IDs, connectivities):
+    """Returns the ID distances of all pairs of tetrahedra that share a face"""
+    faces = []
+    for face in [(0,1,2), (0,1,3), (0,2,3), (1,2,3)]:
+        faces.append(np.column_stack((np.sort(connectivities[:,face], axis=1), element_IDs)))
+    faces = np.concatenate(faces)
+    faces = faces[np.lexsort((faces[:,2], faces[:,1], faces[:,0]))]
+    is_shared = np.all(faces[1:,:3] == faces[:-1,:3], axis=1)
+    return np.abs(faces[1:,3][is_shared] - faces[:-1,3][is_shared])
+
+
+if __name__ == "__main__":
+    args = bench_utils.ParseArguments(__doc__, default_size=30)
+    import global_utilities as global_utils
+    import kratos_io_utilities as kratos_utils
+
+    dat_file_path = os.path.join(args.work_dir, "bench_entity_ordering.dat")
+    mdpa_file_path = os.path.join(args.work_dir, "bench_entity_ordering.mdpa")
+    bench_utils.WriteDatFile(dat_file_path, *bench_utils.CreateTetrahedraMesh(args.size, shuffle=True))
+
+    for use_arrays in [False, True]:
+        valid_file, nodes, geom_entities = global_utils.ReadAndParseSalomeDatFile(dat_file_path, use_arrays=use_arrays)
+        if not valid_file:
+            raise Exception("The synthetic mesh could not be read!")
+
+        for order_entities in [False, True]:
+            def WriteMesh():
+                # a new ModelPart such that the assembly is timed as well
+                model_part = kratos_utils.MainModelPart()
+                model_part.AddMesh({"smp_name" : "domain"}, {"write_smp" : 1, "entity_creation" : {304 : {"Element" : {"SmallDisplacementElement3D4N" : "0"}}}},
+                                   nodes, geom_entities)
+                model_part.WriteMesh(mdpa_file_path, order_entities=order_entities)
+
+            time_needed = bench_utils.TimeFunction(WriteMesh, args.repetitions)
+            distances = GetAdjacentElementsIdDistances(*ReadElements(mdpa_file_path))
+            print("use_arrays={:<5}, order_entities={:<5}: ID distance of adjacent elements mean {:.1f} / median {:.0f}, WriteMesh {:.2f} s".format(
+                str(use_arrays), str(order_entities), np.mean(distances), np.median(distances), time_needed))
+
+    os.remove(dat_file_path)
+    os.remove(mdpa_file_path)
@@ -0,0 +1,46 @@
+'''
+Benchmark of writing the mdpa file, given in lines per second
+The ModelPart is assembled by the first call, the following calls (which are timed) only format and write
+Compare with an older version with "--package-dir" (only object mode is available there)
+'''
+
+# Python imports
+import os
+
+import benchmark_utilities as bench_utils
+
+
+if __name__ == "__main__":
+    args = bench_utils.ParseArguments(__doc__, default_size=30)
+    import global_utilities as global_utils
+    import kratos_io_utilities as kratos_utils
+
+    dat_file_path = os.path.join(args.work_dir, "bench_write_mesh.dat")
+    mdpa_file_path = os.path.join(args.work_dir, "bench_write_mesh.mdpa")
+    bench_utils.WriteDatFile(dat_file_path, *bench_utils.CreateTetrahedraMesh(args.size))
+
+    for use_arrays in [False, True]:
+        if not use_arrays:
+            valid_file, nodes, geom_entities = global_utils.ReadAndParseSalomeDatFile(dat_file_path)
+        elif not hasattr(global_utils, "NodesArrayMapping"): # older versions only have the object mode
+            print("use_arrays=True: not available")
+            continue
+        else:
+            valid_file, nodes, geom_entities = global_utils.ReadAndParseSalomeDatFile(dat_file_path, use_arrays=True)
+        if not valid_file:
+            raise Exception("The synthetic mesh could not be read!")
+
+        model_part = kratos_utils.MainModelPart()
+        model_part.AddMesh({"smp_name" : "domain"}, {"write_smp" : 1, "entity_creation" : {304 : {"Element" : {"SmallDisplacementElement3D4N" : "0"}}}},
+                           nodes, geom_entities)
+
+        for readable_mdpa in [False, True]:
+            model_part.WriteMesh(mdpa_file_path, readable_mdpa=readable_mdpa)
+            time_needed = bench_utils.TimeFunction(lambda: model_part.WriteMesh(mdpa_file_path, readable_mdpa=readable_mdpa), args.repetitions)
+            with open(mdpa_file_path) as mdpa_file:
+                num_lines = sum(1 for line in mdpa_file)
+            print("use_arrays={:<5}, readable_mdpa={:<5}: {:.2f} s, {:.0f} lines/s".format(
+                str(use_arrays), str(readable_mdpa), time_needed, num_lines / time_needed))
+
+    os.remove(dat_file_path)
+    os.remove(mdpa_file_path)
@@ -0,0 +1,86 @@
+'''
+Utilities for the benchmarks in this folder
+The benchmarks are run by hand (they are not part of the tests), e.g.:
+    python bench_write_mesh.py --size 40
+With "--package-dir" another checkout of the converter is benchmarked, e.g. an older version for comparison
+'''
+
+# Python imports
+import os
+import sys
+import time
+import logging
+import argparse
+
+# Third party imports
+import numpy as np
+
+
+def ParseArguments(description, default_size):
+    """Parses the command line arguments that all benchmarks have in common
+    The converter in "--package-dir" is put on the path, the modules have to be imported afterwards
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--package-dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."),
+                        help="checkout of the converter that is benchmarked (default: this one)")
+    parser.add_argument("--size", type=int, default=default_size,
+                        help="number of cubes per direction of the synthetic mesh, each cube has 6 tetrahedra")
+    parser.add_argument("--repetitions", type=int, default=3,
+                        help="number of repetitions of the timed functions, the fastest one is reported")
+    parser.add_argument("--work-dir", default=os.getcwd(),
+                        help="folder for the temporary files")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(args.package_dir))
+    logging.disable(logging.INFO) # the converter logs its timings
+
+    return args
+
+
+def CreateTetrahedraMesh(num_cubes, shuffle=False, seed=0):
+    """Returns the nodes (IDs, coordinates) and the tetrahedra (IDs, connectivities) of a unit cube
+    that is split into "num_cubes"^3 cubes with 6 tetrahedra each
+    With "shuffle" the tetrahedra are in random order, like the output of an unstructured mesher
+    """
+    num_nodes_dir = num_cubes + 1
+    grid = np.arange(num_nodes_dir, dtype=np.float64) / num_cubes
+    x, y, z = np.meshgrid(grid, grid, grid, indexing="ij")
+    node_coords = np.column_stack((x.ravel(), y.ravel(), z.ravel()))
+    node_IDs = np.arange(1, node_coords.shape[0]+1)
+
+    # the 6 tetrahedra of a cube go from the first to the last corner along the edges (Kuhn)
+    i, j, k = np.meshgrid(*[np.arange(num_cubes)]*3, indexing="ij")
+    cube_corners = np.column_stack((i.ravel(), j.ravel(), k.ravel()))
+    connectivities = []
+    for axes in [(0,1,2), (0,2,1), (1,0,2), (1,2,0), (2,0,1), (2,1,0)]:
+        corner = cube_corners.copy()
+        tetrahedron = [corner.copy()]
+        for axis in axes:
+            corner[:,axis] += 1
+            tetrahedron.append(corner.copy())
+        connectivities.append(np.column_stack([(c[:,0]*num_nodes_dir + c[:,1])*num_nodes_dir + c[:,2] + 1 for c in tetrahedron]))
+    connectivities = np.concatenate(connectivities)
+
+    if shuffle:
+        connectivities = connectivities[np.random.default_rng(seed).permutation(connectivities.shape[0])]
+    element_IDs = np.arange(1, connectivities.shape[0]+1)
+
+    return node_IDs, node_coords, element_IDs, connectivities
+
+
+def WriteDatFile(file_path, node_IDs, node_coords, element_IDs, connectivities, geometry_identifier=304):
+    """Writes the mesh in the *.dat format of Salome"""
+    with open(file_path, "w") as dat_file:
+        dat_file.write("{} {}\n".format(node_IDs.shape[0], element_IDs.shape[0]))
+        np.savetxt(dat_file, np.column_stack((node_IDs, node_coords)), fmt="%d %.10f %.10f %.10f")
+        np.savetxt(dat_file, np.column_stack((element_IDs, np.full_like(element_IDs, geometry_identifier), connectivities)), fmt="%d")
+
+
+def TimeFunction(function, num_repetitions):
+    """Returns the fastest of "num_repetitions" calls of the function (in seconds)"""
+    times = []
+    for _ in range(max(num_repetitions, 1)):
+        start_time = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start_time)
+    return min(times)
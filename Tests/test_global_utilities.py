@@ -0,0 +1,456 @@
+import unittest
+import sys
+import os
+import gzip
+import lzma
+import bz2
+sys.path.insert(0, '../')
+import global_utilities as global_utils
+
+
+class DatFileTestCase(unittest.TestCase):
+    """Base class for the tests that write a temporary *.dat file"""
+
+    def setUp(self):
+        self.dat_file = os.path.join(os.getcwd(), "..", "Examples", "use_converter_from_python", "domain.dat")
+        self.test_file = os.path.join(os.getcwd(), "test_file.dat")
+
+    def tearDown(self):
+        if os.path.isfile(self.test_file):
+            os.remove(self.test_file)
+
+    def _write_test_file(self, file_content):
+        with open(self.test_file, "w") as test_file:
+            test_file.write(file_content)
+
+
+class TestReadAndParseSalomeDatFile(DatFileTestCase):
+
+    def test_ReadExampleFile(self):
+        valid_file, nodes, geom_entities = global_utils.ReadAndParseSalomeDatFile(self.dat_file)
+
+        self.assertTrue(valid_file)
+        self.assertEqual(156, len(nodes))
+        self.assertEqual([[0.0, 0.0, 0.0], {}], nodes[1])
+        self.assertEqual([[5.0, 1.0, 0.0], {}], nodes[3])
+
+        self.assertEqual([102, 204], sorted(geom_entities.keys()))
+        self.assertEqual(60, len(geom_entities[102]))
+        self.assertEqual(125, len(geom_entities[204]))
+        self.assertEqual(global_utils.GeometricEntity(185, 204, [156, 32, 3, 33]), geom_entities[204][-1])
+
+    def test_FileNotFound(self):
+        valid_file, nodes, geom_entities = global_utils.ReadAndParseSalomeDatFile("not_existing_file.dat")
+
+        self.assertFalse(valid_file)
+        self.assertIsNone(nodes)
+        self.assertIsNone(geom_entities)
+
+    def test_NoNodes(self):
+        self._write_test_file("0 0\n")
+
+        valid_file, nodes, geom_entities = global_utils.ReadAndParseSalomeDatFile(self.test_file)
+
+        self.assertFalse(valid_file)
+
+    def test_TrailingEmptyLines(self):
+        self._write_test_file("2 1\n1 0.0 0.0 0.0\n2 1.0 0.0 0.0\n1 102 1 2 \n\n\n")
+
+        valid_file, nodes, geom_entities = global_utils.ReadAndParseSalomeDatFile(self.test_file)
+
+        self.assertTrue(valid_file)
+        self.assertEqual(2, len(nodes))
+        self.assertEqual([global_utils.GeometricEntity(1, 102, [1, 2])], geom_entities[102])
+
+    def test_LessEntitiesThanInHeader(self):
+        self._write_test_file("2 2\n1 0.0 0.0 0.0\n2 1.0 0.0 0.0\n1 102 1 2\n")
+
+        valid_file, nodes, geom_entities = global_utils.ReadAndParseSalomeDatFile(self.test_file)
+
+        self.assertFalse(valid_file)
+
+    def test_MoreEntitiesThanInHeader(self):
+        self._write_test_file("2 1\n1 0.0 0.0 0.0\n2 1.0 0.0 0.0\n1 102 1 2\n2 102 2 1\n")
+
+        valid_file, nodes, geom_entities = global_utils.ReadAndParseSalomeDatFile(self.test_file)
+
+        self.assertFalse(valid_file)
+
+    def test_ReadExampleFileWithArrays(self):
+        valid_file, nodes, geom_entities = global_utils.ReadAndParseSalomeDatFile(self.dat_file)
+        valid_file_arrays, nodes_arrays, geom_entities_arrays = global_utils.ReadAndParseSalomeDatFile(self.dat_file, use_arrays=True)
+
+        self.assertTrue(valid_file_arrays)
+        self.assertIsInstance(nodes_arrays, global_utils.NodesArrayMapping)
+        self.assertEqual((156,), nodes_arrays.GetIds().shape)
+        self.assertEqual((156,3), nodes_arrays.GetCoordinates().shape)
+        self.assertEqual(nodes, nodes_arrays)
+
+        self.assertEqual(sorted(geom_entities.keys()), sorted(geom_entities_arrays.keys()))
+        for geometry_identifier, entities in geom_entities.items():
+            entities_array = geom_entities_arrays[geometry_identifier]
+            self.assertIsInstance(entities_array, global_utils.GeometricEntitiesArray)
+            self.assertEqual(len(entities), len(entities_array))
+            for row, entity in enumerate(entities):
+                self.assertEqual(entity, entities_array.GetGeometricEntity(row))
+
+    def test_HexahedraNodeOrderWithArrays(self):
+        self._write_test_file("8 1\n" + "".join(["{} 0.0 0.0 0.0\n".format(i) for i in range(1,9)]) + "1 308 1 2 3 4 5 6 7 8\n")
+
+        valid_file, nodes, geom_entities = global_utils.ReadAndParseSalomeDatFile(self.test_file)
+        valid_file_arrays, nodes_arrays, geom_entities_arrays = global_utils.ReadAndParseSalomeDatFile(self.test_file, use_arrays=True)
+
+        self.assertTrue(valid_file_arrays)
+        self.assertEqual([1, 4, 3, 2, 5, 8, 7, 6], geom_entities[308][0].GetNodeList())
+        self.assertEqual(geom_entities[308][0], geom_entities_arrays[308].GetGeometricEntity(0))
+
+    def test_NodeOrderWithArrays(self):
+        for geometry_identifier, node_order in global_utils.SALOME_TO_KRATOS_NODE_ORDER.items():
+            num_nodes = geometry_identifier % 100
+            self.assertEqual(list(range(num_nodes)), sorted(node_order))
+
+            node_list = list(range(1, num_nodes+1))
+            connectivities = global_utils.np.array([node_list, node_list[::-1]])
+            global_utils.CorrectSalomeConnectivityOrder(connectivities, geometry_identifier)
+
+            self.assertEqual(global_utils.CorrectSalomeNodeListOrder(node_list, geometry_identifier), connectivities[0].tolist())
+            self.assertEqual([num_nodes - i for i in node_order], connectivities[1].tolist())
+
+    def test_QuadraticNodeOrder(self):
+        # the mid-nodes in SALOME are ordered as in MED, in Kratos as in GiD
+        salome_edges = {
+            313 : [(0,1),(1,2),(2,3),(3,0),(0,4),(1,4),(2,4),(3,4)],
+            315 : [(0,1),(1,2),(2,0),(3,4),(4,5),(5,3),(0,3),(1,4),(2,5)],
+            320 : [(0,1),(1,2),(2,3),(3,0),(4,5),(5,6),(6,7),(7,4),(0,4),(1,5),(2,6),(3,7)]
+        }
+        kratos_edges = {
+            313 : [(0,1),(1,2),(2,3),(3,0),(0,4),(1,4),(2,4),(3,4)],
+            315 : [(0,1),(1,2),(2,0),(0,3),(1,4),(2,5),(3,4),(4,5),(5,3)],
+            320 : [(0,1),(1,2),(2,3),(3,0),(0,4),(1,5),(2,6),(3,7),(4,5),(5,6),(6,7),(7,4)]
+        }
+        for geometry_identifier in salome_edges:
+            # the ID of a mid-node encodes the two corner-nodes
+            num_corners = geometry_identifier % 100 - len(salome_edges[geometry_identifier])
+            node_list = list(range(num_corners)) + [100*(i+1) + 10*(j+1) for i, j in salome_edges[geometry_identifier]]
+
+            global_utils.CorrectSalomeNodeListOrder(node_list, geometry_identifier)
+
+            for k, (i, j) in enumerate(kratos_edges[geometry_identifier]):
+                corners = sorted([node_list[i]+1, node_list[j]+1])
+                self.assertIn(node_list[num_corners+k], [100*corners[0] + 10*corners[1], 100*corners[1] + 10*corners[0]])
+
+    def test_DifferentNumberOfNodesWithArrays(self):
+        self._write_test_file("3 2\n1 0.0 0.0 0.0\n2 1.0 0.0 0.0\n3 1.0 1.0 0.0\n1 102 1 2\n2 102 1 2 3\n")
+
+        valid_file, nodes, geom_entities = global_utils.ReadAndParseSalomeDatFile(self.test_file, use_arrays=True)
+
+        self.assertFalse(valid_file)
+
+    def test_InvalidValuesWithArrays(self):
+        self._write_test_file("2 1\n1 0.0 x 0.0\n2 1.0 0.0 0.0\n1 102 1 2\n")
+
+        valid_file, nodes, geom_entities = global_utils.ReadAndParseSalomeDatFile(self.test_file, use_arrays=True)
+
+        self.assertFalse(valid_file)
+
+    def test_ParseSalomeDatLines(self):
+        self.assertEqual([[1, 102, 1, 2], [2, 102, 2, 3]],
+                         global_utils.ParseSalomeDatLines(b"1 102 1 2\n2 102 2 3\n", 2, int).tolist())
+
+        with self.assertRaisesRegex(Exception, "Lines could not be parsed!"):
+            global_utils.ParseSalomeDatLines(b"1 102 1 2\n2 102 2 x\n", 2, int)
+        with self.assertRaisesRegex(Exception, "Lines could not be parsed!"):
+            global_utils.ParseSalomeDatLines(b"1 102 1 2\n2 102 2 3 4\n", 2, int)
+        with self.assertRaisesRegex(Exception, "Lines could not be parsed!"):
+            global_utils.ParseSalomeDatLines(b"1 102 1 2\n", 2, int)
+
+    def test_LessNodesThanInHeaderWithArrays(self):
+        self._write_test_file("3 0\n1 0.0 0.0 0.0\n2 1.0 0.0 0.0\n")
+
+        valid_file, nodes, geom_entities = global_utils.ReadAndParseSalomeDatFile(self.test_file, use_arrays=True)
+
+        self.assertFalse(valid_file)
+
+    def test_ReadExampleFileWithMmap(self):
+        reference = global_utils.ReadAndParseSalomeDatFile(self.dat_file)
+        reference_arrays = global_utils.ReadAndParseSalomeDatFile(self.dat_file, use_arrays=True)
+
+        self.assertEqual(reference, global_utils.ReadAndParseSalomeDatFile(self.dat_file, use_mmap=True))
+        self.assertEqual(reference_arrays, global_utils.ReadAndParseSalomeDatFile(self.dat_file, use_arrays=True, use_mmap=True))
+
+    def test_LessEntitiesThanInHeaderWithMmap(self):
+        self._write_test_file("2 2\n1 0.0 0.0 0.0\n2 1.0 0.0 0.0\n1 102 1 2\n")
+
+        valid_file, nodes, geom_entities = global_utils.ReadAndParseSalomeDatFile(self.test_file, use_mmap=True)
+
+        self.assertFalse(valid_file)
+
+    def test_MoreEntitiesThanInHeaderWithMmap(self):
+        self._write_test_file("2 1\n1 0.0 0.0 0.0\n2 1.0 0.0 0.0\n1 102 1 2\n2 102 2 1\n")
+
+        valid_file, nodes, geom_entities = global_utils.ReadAndParseSalomeDatFile(self.test_file, use_mmap=True)
+
+        self.assertFalse(valid_file)
+
+
+class TestReadManySalomeDatFiles(unittest.TestCase):
+
+    def setUp(self):
+        example_dir = os.path.join(os.getcwd(), "..", "Examples", "use_converter_from_python")
+        self.dat_files = [os.path.join(example_dir, file_name) for file_name in ["domain.dat", "dirichlet.dat", "neumann.dat"]]
+
+    def test_ReadManyFiles(self):
+        results = global_utils.ReadManySalomeDatFiles(self.dat_files)
+
+        self.assertEqual(self.dat_files, list(results.keys()))
+        for dat_file in self.dat_files:
+            self.assertEqual(global_utils.ReadAndParseSalomeDatFile(dat_file), results[dat_file])
+
+    def test_ReadManyFilesInParallel(self):
+        results = global_utils.ReadManySalomeDatFiles(self.dat_files, num_workers=2, use_arrays=True)
+
+        self.assertEqual(self.dat_files, list(results.keys()))
+        for dat_file in self.dat_files:
+            self.assertEqual(global_utils.ReadAndParseSalomeDatFile(dat_file, use_arrays=True), results[dat_file])
+
+    def test_ReadManyFilesInSpawnedProcesses(self):
+        results = global_utils.ReadManySalomeDatFiles(self.dat_files, num_workers=2, start_method="spawn", use_arrays=True)
+
+        for dat_file in self.dat_files:
+            self.assertEqual(global_utils.ReadAndParseSalomeDatFile(dat_file, use_arrays=True), results[dat_file])
+
+    def test_InvalidFile(self):
+        invalid_file = os.path.join(os.getcwd(), "not_existing_file.dat")
+        results = global_utils.ReadManySalomeDatFiles([self.dat_files[0], invalid_file], num_workers=2)
+
+        self.assertTrue(results[self.dat_files[0]][0])
+        self.assertFalse(results[invalid_file][0])
+
+
+class TestCompressedSalomeDatFile(DatFileTestCase):
+
+    def _check_compression(self, compress_function, compression):
+        with open(self.dat_file, "rb") as dat_file:
+            file_content = dat_file.read()
+        with open(self.test_file, "wb") as test_file: # the file name does not indicate the compression
+            test_file.write(compress_function(file_content))
+
+        self.assertEqual(compression, global_utils.GetCompression(self.test_file))
+        self.assertEqual(global_utils.ReadAndParseSalomeDatFile(self.dat_file),
+                         global_utils.ReadAndParseSalomeDatFile(self.test_file))
+        self.assertEqual(global_utils.ReadAndParseSalomeDatFile(self.dat_file, use_arrays=True),
+                         global_utils.ReadAndParseSalomeDatFile(self.test_file, use_arrays=True, use_mmap=True))
+        self.assertEqual(global_utils.ScanSalomeDatFile(self.dat_file), global_utils.ScanSalomeDatFile(self.test_file))
+
+    def test_Uncompressed(self):
+        self.assertEqual(None, global_utils.GetCompression(self.dat_file))
+
+    def test_Gzip(self):
+        self._check_compression(gzip.compress, "gzip")
+
+    def test_Xz(self):
+        self._check_compression(lzma.compress, "xz")
+
+    def test_Bz2(self):
+        self._check_compression(bz2.compress, "bz2")
+
+
+class TestScanSalomeDatFile(DatFileTestCase):
+
+    def test_ScanExampleFile(self):
+        dat_file = os.path.join(os.getcwd(), "..", "Examples", "use_converter_from_python", "domain.dat")
+        valid_file, nodes, geom_entities = global_utils.ReadAndParseSalomeDatFile(dat_file)
+
+        self.assertEqual((True, len(nodes), {geometry_identifier : len(entities) for geometry_identifier, entities in geom_entities.items()}),
+                         global_utils.ScanSalomeDatFile(dat_file))
+
+    def test_MixedGeometries(self):
+        self._write_test_file("3 4\n1 0.0 0.0 0.0\n2 1.0 0.0 0.0\n3 1.0 1.0 0.0\n1 102 1 2\n2 203 1 2 3\n3 102 2 3\n4 102 3 1\n")
+
+        self.assertEqual((True, 3, {102 : 3, 203 : 1}), global_utils.ScanSalomeDatFile(self.test_file))
+
+    def test_InvalidFiles(self):
+        self.assertFalse(global_utils.ScanSalomeDatFile(self.test_file)[0]) # file does not exist
+
+        self._write_test_file("0 1\n1 102 1 2\n")
+        self.assertFalse(global_utils.ScanSalomeDatFile(self.test_file)[0])
+
+        self._write_test_file("2 2\n1 0.0 0.0 0.0\n2 1.0 0.0 0.0\n1 102 1 2\n")
+        self.assertFalse(global_utils.ScanSalomeDatFile(self.test_file)[0])
+
+    def test_GetEntityCountString(self):
+        self.assertEqual("12 345", global_utils.GetEntityCountString(12345))
+        self.assertEqual("9 876 543", global_utils.GetEntityCountString(9876543))
+        self.assertEqual("12", global_utils.GetEntityCountString(12))
+
+
+class TestSalomeDatCache(DatFileTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache_file = global_utils.GetSalomeDatCachePath(self.test_file)
+
+    def tearDown(self):
+        super().tearDown()
+        if os.path.isfile(self.cache_file):
+            os.remove(self.cache_file)
+
+    def test_CacheIsUsed(self):
+        self._write_test_file("3 2\n1 0.0 0.0 0.0\n2 1.0 0.0 0.0\n3 1.0 1.0 0.0\n1 102 1 2\n2 203 1 2 3\n")
+        reference = global_utils.ReadAndParseSalomeDatFile(self.test_file)
+        reference_arrays = global_utils.ReadAndParseSalomeDatFile(self.test_file, use_arrays=True)
+
+        self.assertEqual(reference, global_utils.ReadAndParseSalomeDatFile(self.test_file, use_cache=True))
+        self.assertTrue(os.path.isfile(self.cache_file))
+        self.assertEqual(reference, global_utils.ReadAndParseSalomeDatFile(self.test_file, use_cache=True))
+        self.assertEqual(reference_arrays, global_utils.ReadAndParseSalomeDatFile(self.test_file, use_arrays=True, use_cache=True))
+
+    def test_CacheIsInvalidated(self):
+        self._write_test_file("3 1\n1 0.0 0.0 0.0\n2 1.0 0.0 0.0\n3 1.0 1.0 0.0\n1 102 1 2\n")
+        global_utils.ReadAndParseSalomeDatFile(self.test_file, use_cache=True)
+
+        # same size but different content
+        file_stat = os.stat(self.test_file)
+        self._write_test_file("3 1\n1 0.0 0.0 0.0\n2 1.0 0.0 0.0\n3 1.0 1.0 0.0\n1 102 2 3\n")
+        os.utime(self.test_file, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns + 10**9)) # the modification time might be too coarse
+        valid_file, nodes, geom_entities = global_utils.ReadAndParseSalomeDatFile(self.test_file, use_arrays=True, use_cache=True)
+
+        self.assertTrue(valid_file)
+        self.assertEqual([[2, 3]], geom_entities[102].GetConnectivities().tolist())
+
+    def test_TouchedFile(self):
+        self._write_test_file("3 1\n1 0.0 0.0 0.0\n2 1.0 0.0 0.0\n3 1.0 1.0 0.0\n1 102 1 2\n")
+        reference = global_utils.ReadAndParseSalomeDatFile(self.test_file, use_cache=True)
+
+        file_stat = os.stat(self.test_file)
+        os.utime(self.test_file, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns + 10**9))
+
+        self.assertEqual(reference, global_utils.ReadAndParseSalomeDatFile(self.test_file, use_cache=True))
+
+        # the new modification time is saved, the hash is not computed again
+        with global_utils.np.load(self.cache_file) as cache_content:
+            self.assertEqual(os.stat(self.test_file).st_mtime_ns, int(cache_content["file_mtime_ns"]))
+        self.assertEqual(reference, global_utils.ReadAndParseSalomeDatFile(self.test_file, use_cache=True))
+
+    def test_InvalidFileIsNotCached(self):
+        self._write_test_file("0 1\n1 102 1 2\n")
+
+        valid_file, nodes, geom_entities = global_utils.ReadAndParseSalomeDatFile(self.test_file, use_cache=True)
+
+        self.assertFalse(valid_file)
+        self.assertFalse(os.path.isfile(self.cache_file))
+
+
+class TestMappedSalomeDatFile(DatFileTestCase):
+
+    def _check_file(self, file_content):
+        self._write_test_file(file_content)
+        reference = global_utils.ReadAndParseSalomeDatFile(self.test_file, use_arrays=True)
+
+        with global_utils.MappedSalomeDatFile(self.test_file, window_size=2) as dat_file:
+            self.assertEqual(reference[1], dat_file.ReadNodes())
+            self.assertEqual(reference[2], dat_file.ReadGeometricEntities())
+            self.assertEqual(list(reference[2].keys()), dat_file.GetGeometryIdentifiers())
+
+            return {geometry_identifier : len(entities) for geometry_identifier, entities in reference[2].items()}, dat_file.NumberOfEntitiesByGeometry()
+
+    def test_MixedGeometries(self):
+        file_content  = "5 7\n1 0.0 0.0 0.0\n2 1.0 0.0 0.0\n3 1.0 1.0 0.0\n4 0.0 1.0 0.0\n5 0.5 0.5 0.0\n"
+        file_content += "1 102 1 2\n2 102 2 3\n3 203 1 2 5\n4 102 3 4\n5 204 1 2 3 4\n6 204 1 2 3 4\n7 204 1 2 3 4" # no line break at the end
+
+        counts, counts_mmap = self._check_file(file_content)
+        self.assertEqual({102 : 3, 203 : 1, 204 : 3}, counts_mmap)
+        self.assertEqual(counts, counts_mmap)
+
+    def test_OtherWhitespaces(self):
+        file_content  = "3 3\r\n1 0.0 0.0 0.0\r\n2\t1.0 0.0 0.0\r\n3 1.0 1.0 0.0\r\n"
+        file_content += " 1 102 1 2\r\n2\t102\t2 3\r\n3  203  1 2 3\r\n\r\n"
+
+        counts, counts_mmap = self._check_file(file_content)
+        self.assertEqual(counts, counts_mmap)
+
+    def test_ReadOneGeometry(self):
+        file_content  = "3 4\n1 0.0 0.0 0.0\n2 1.0 0.0 0.0\n3 1.0 1.0 0.0\n"
+        file_content += "1 102 1 2\n2 203 1 2 3\n3 102 2 3\n4 102 3 1\n"
+        self._write_test_file(file_content)
+
+        with global_utils.MappedSalomeDatFile(self.test_file, window_size=2) as dat_file:
+            geom_entities = dat_file.ReadGeometricEntities([102])
+
+        self.assertEqual([102], list(geom_entities.keys()))
+        self.assertEqual(global_utils.GeometricEntitiesArray(102, [1, 3, 4], [[1, 2], [2, 3], [3, 1]]), geom_entities[102])
+
+    def test_ParallelParsing(self):
+        file_content  = "5 7\n1 0.0 0.0 0.0\n2 1.0 0.0 0.0\n3 1.0 1.0 0.0\n4 0.0 1.0 0.0\n5 0.5 0.5 0.0\n"
+        file_content += "1 102 1 2\n2 102 2 3\n3 203 1 2 5\n4 102 3 4\n5 204 1 2 3 4\n6 204 1 2 3 4\n7 204 1 2 3 4\n"
+        self._write_test_file(file_content)
+
+        with global_utils.MappedSalomeDatFile(self.test_file, window_size=2) as dat_file:
+            reference = dat_file.ReadGeometricEntities()
+            self.assertEqual(reference, dat_file.ReadGeometricEntities(num_workers=2))
+            self.assertEqual(list(reference.keys()), list(dat_file.ReadGeometricEntities(num_workers=2).keys()))
+
+        self.assertEqual(global_utils.ReadAndParseSalomeDatFile(self.test_file), global_utils.ReadAndParseSalomeDatFile(self.test_file, num_workers=2))
+
+
+class TestNodesArrayMapping(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes = global_utils.NodesArrayMapping([5, 2, 9], [[0.0, 0.0, 0.0], [1.0, 2.0, 3.0], [4.0, 5.0, 6.0]])
+
+    def test_Mapping(self):
+        self.assertEqual(3, len(self.nodes))
+        self.assertEqual([5, 2, 9], list(self.nodes.keys())) # the order of the input is kept
+        self.assertEqual([[1.0, 2.0, 3.0], {}], self.nodes[2])
+        self.assertTrue(9 in self.nodes)
+        self.assertFalse(3 in self.nodes)
+        self.assertFalse(10 in self.nodes)
+
+        with self.assertRaises(KeyError):
+            self.nodes[3]
+
+    def test_NodalData(self):
+        self.nodes.SetNodalData(9, "NODAL_MASS", 1.5)
+
+        self.assertEqual([[4.0, 5.0, 6.0], {"NODAL_MASS" : 1.5}], self.nodes[9])
+        self.assertEqual({}, self.nodes[5][1])
+        self.assertEqual({2 : {"NODAL_MASS" : 1.5}}, self.nodes.GetNodalDataByIndex())
+
+        with self.assertRaises(KeyError):
+            self.nodes.SetNodalData(3, "NODAL_MASS", 1.5)
+
+    def test_ReadingDoesNotStoreNodalData(self):
+        self.assertEqual({5 : [[0.0, 0.0, 0.0], {}], 2 : [[1.0, 2.0, 3.0], {}], 9 : [[4.0, 5.0, 6.0], {}]}, dict(self.nodes))
+        self.assertEqual({}, self.nodes.nodal_data)
+
+    def test_WrongInput(self):
+        with self.assertRaisesRegex(Exception, "Number of IDs and number of coordinates do not match!"):
+            global_utils.NodesArrayMapping([1, 2], [[0.0, 0.0, 0.0]])
+
+
+class TestGeometricEntitiesArray(unittest.TestCase):
+
+    def setUp(self):
+        self.entities = global_utils.GeometricEntitiesArray(102, [23, 24], [[1, 2], [2, 3]])
+
+    def test_GeometricEntitiesArray(self):
+        self.assertEqual(2, len(self.entities))
+        self.assertEqual(102, self.entities.GetGeometryIdentifier())
+        self.assertEqual(global_utils.GeometricEntity(24, 102, [2, 3]), self.entities.GetGeometricEntity(1))
+        self.assertEqual([[23, 102, [1, 2], {}], [24, 102, [2, 3], {}]], self.entities.Serialize())
+
+    def test_EntityData(self):
+        self.assertFalse(self.entities.HasEntityData())
+        self.entities.SetEntityData(1, "Data", 1.5)
+
+        self.assertTrue(self.entities.HasEntityData())
+        self.assertEqual({1 : {"Data" : 1.5}}, self.entities.GetEntityData())
+        self.assertEqual([24, 102, [2, 3], {"Data" : 1.5}], self.entities.GetGeometricEntity(1).Serialize())
+
+    def test_WrongInput(self):
+        with self.assertRaisesRegex(Exception, "The connectivities have to be provided with one row per entity!"):
+            global_utils.GeometricEntitiesArray(102, [23, 24], [1, 2, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,11 @@ import unittest
 import sys
 import os
 import filecmp
+import io
+import threading
+import gzip
+import lzma
+import numpy as np
 sys.path.insert(0, '../')
 import kratos_io_utilities as kratos_utils
 import global_utilities as global_utils
@@ -124,6 +129,356 @@ class TestKratosEntity(unittest.TestCase):
         self._execute_entity_tests(class2test)
 
 
+class TestNodeStore(unittest.TestCase):
+
+    def setUp(self):
+        self.node_store = kratos_utils.NodeStore([7, 2, 5], [[7.0, 0.0, 0.0], [2.0, 0.0, 0.0], [5.0, 0.0, 0.0]], {5: {"PRESSURE" : 1.5}})
+
+    def test_Lookup(self):
+        self.assertEqual([2, 5, 7], self.node_store.GetIds().tolist())
+        self.assertEqual(3, len(self.node_store))
+        self.assertIn(5, self.node_store)
+        self.assertNotIn(3, self.node_store)
+        self.assertNotIn(8, self.node_store)
+
+        self.assertEqual([[5.0, 0.0, 0.0], {"PRESSURE" : 1.5}], self.node_store[5])
+        self.assertEqual([[2.0, 0.0, 0.0], {}], self.node_store[2])
+        with self.assertRaises(KeyError):
+            self.node_store[3]
+
+        self.assertEqual([2, 0], self.node_store.GetIndices([7, 2]).tolist())
+        with self.assertRaises(KeyError):
+            self.node_store.GetIndices([7, 3])
+
+    def test_DictFacade(self):
+        self.assertEqual([2, 5, 7], list(self.node_store))
+        self.assertEqual({2: [[2.0, 0.0, 0.0], {}],
+                          5: [[5.0, 0.0, 0.0], {"PRESSURE" : 1.5}],
+                          7: [[7.0, 0.0, 0.0], {}]}, dict(self.node_store))
+        self.assertEqual([5], list(self.node_store.nodal_data.keys())) # reading does not create nodal_data
+
+    def test_IterateInChunks(self):
+        node_IDs = list(range(1, 12))
+        node_store = kratos_utils.NodeStore(node_IDs[::-1], [[float(i), 0.0, 0.0] for i in node_IDs[::-1]])
+
+        chunk_size = kratos_utils.NODE_ITERATION_CHUNK_SIZE
+        kratos_utils.NODE_ITERATION_CHUNK_SIZE = 4 # several chunks, the last one is incomplete
+        try:
+            self.assertEqual(node_IDs, list(node_store))
+            self.assertTrue(all(type(node_ID) is int for node_ID in node_store)) # e.g. for serializing to json
+        finally:
+            kratos_utils.NODE_ITERATION_CHUNK_SIZE = chunk_size
+
+    def test_SetNodalData(self):
+        self.node_store.SetNodalData(2, "TEMPERATURE", 3.0)
+        self.node_store.SetNodalData(5, "TEMPERATURE", 4.0)
+        self.assertEqual([(2, {"TEMPERATURE" : 3.0}), (5, {"PRESSURE" : 1.5, "TEMPERATURE" : 4.0})], self.node_store.GetNodalDataItems())
+        with self.assertRaises(KeyError):
+            self.node_store.SetNodalData(3, "TEMPERATURE", 3.0)
+
+    def test_Duplicates(self):
+        node_store = kratos_utils.NodeStore([3, 1, 3], [[3.0, 0.0, 0.0], [1.0, 0.0, 0.0], [3.0, 0.0, 0.0]])
+        self.assertEqual([1, 3], node_store.GetIds().tolist())
+
+        with self.assertRaisesRegex(Exception, "Node with ID 3 already exists with different coordinates!"):
+            kratos_utils.NodeStore([3, 1, 3], [[3.0, 0.0, 0.0], [1.0, 0.0, 0.0], [3.0, 1.0, 0.0]])
+
+    def test_Union(self):
+        other = kratos_utils.NodeStore([1, 5], [[1.0, 0.0, 0.0], [5.0, 0.0, 0.0]], {5: {"PRESSURE" : 2.0}, 1: {"TEMPERATURE" : 3.0}})
+        union = self.node_store.Union(other)
+
+        self.assertEqual([1, 2, 5, 7], union.GetIds().tolist())
+        self.assertEqual([[1.0, 0.0, 0.0], [7.0, 0.0, 0.0]], union.GetCoordinates([1, 7]).tolist())
+        self.assertEqual([(1, {"TEMPERATURE" : 3.0}), (5, {"PRESSURE" : 1.5})], union.GetNodalDataItems())
+        self.assertEqual(3, len(self.node_store)) # the original is unchanged
+
+        with self.assertRaisesRegex(Exception, "Node with ID 7 already exists with different coordinates!"):
+            self.node_store.Union(kratos_utils.NodeStore([7], [[7.0, 1.0, 0.0]]))
+
+    def test_AddAndRemoveNodes(self):
+        self.node_store.AddNodes([4, 2], [[4.0, 0.0, 0.0], [2.0, 0.0, 0.0]])
+        self.assertEqual([2, 4, 5, 7], self.node_store.GetIds().tolist())
+
+        self.node_store.RemoveNodes([5, 2])
+        self.assertEqual([4, 7], self.node_store.GetIds().tolist())
+        self.assertEqual([], self.node_store.GetNodalDataItems())
+
+
+class TestFindCoincidentNodes(unittest.TestCase):
+
+    def test_FindCoincidentNodes(self):
+        coords = [[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [1.0, 0.05, 0.0], [0.0, 0.0, 0.1], [1.0, 0.1, 0.0]]
+
+        # nodes 1, 2 and 4 are merged transitively
+        self.assertEqual([0, 1, 1, 3, 1], kratos_utils.FindCoincidentNodes(coords, 0.06).tolist())
+        self.assertEqual([0, 1, 2, 3, 4], kratos_utils.FindCoincidentNodes(coords, 0.01).tolist())
+        self.assertEqual([0, 1, 1, 0, 1], kratos_utils.FindCoincidentNodes(coords, 0.1).tolist())
+
+        with self.assertRaisesRegex(Exception, "The tolerance for merging nodes has to be larger than 0!"):
+            kratos_utils.FindCoincidentNodes(coords, 0.0)
+
+
+class TestReverseCuthillMcKee(unittest.TestCase):
+
+    def test_ReverseCuthillMcKee(self):
+        # a chain of line elements 0-3-1-4-2 and node 5 without elements
+        connectivities = [np.array([[0, 3], [3, 1], [1, 4], [4, 2]])]
+        adjacency_i, adjacency_j = kratos_utils.GetNodeAdjacency(connectivities, 6)
+        self.assertEqual(8, adjacency_i.shape[0])
+        self.assertEqual(3, kratos_utils.ComputeBandwidth(adjacency_i, adjacency_j))
+
+        order = kratos_utils.ReverseCuthillMcKee(6, adjacency_i, adjacency_j)
+        self.assertEqual([2, 4, 1, 3, 0, 5], order.tolist())
+
+        new_indices = np.empty_like(order)
+        new_indices[order] = np.arange(6)
+        self.assertEqual(1, kratos_utils.ComputeBandwidth(adjacency_i, adjacency_j, new_indices))
+
+
+class TestComputeMortonKeys(unittest.TestCase):
+
+    def test_ComputeMortonKeys(self):
+        points = [[0.0, 0.0, 0.0], [2.0, 0.0, 0.0], [0.0, 2.0, 0.0], [2.0, 2.0, 0.0], [0.0, 0.0, 2.0], [2.0, 2.0, 2.0]]
+        keys = kratos_utils.ComputeMortonKeys(points, [0.0, 0.0, 0.0], [2.0, 2.0, 2.0])
+
+        self.assertEqual([0, 1, 2, 3, 4, 5], np.argsort(keys).tolist()) # Z-order
+        self.assertEqual(0, keys[0])
+        self.assertEqual(2**63-1, keys[-1]) # 21 bits per direction
+
+        keys = kratos_utils.ComputeMortonKeys([[0.1, 0.1, 0.0], [1.9, 0.1, 0.0], [0.1, 1.1, 0.0], [0.2, 0.2, 0.0]], [0.0, 0.0, 0.0], [2.0, 2.0, 0.0])
+        self.assertEqual([0, 3, 1, 2], np.argsort(keys).tolist())
+
+
+class TestFormatRoundedFloats(unittest.TestCase):
+
+    def test_FormatRoundedFloats(self):
+        values = [0.0, -0.0, 1.0, -2.5, 0.1+0.2, 1.0/3, 1e-4, 4.27e-05, 1e-13, 999.9999999999995, 1e3, 8192.5, 1.2345e20, float("inf")]
+
+        self.assertEqual([str(round(value, 12)) for value in values], kratos_utils.FormatRoundedFloats(values, 12))
+        self.assertEqual([str(round(value, 3)) for value in values], kratos_utils.FormatRoundedFloats(values, 3))
+        self.assertEqual([], kratos_utils.FormatRoundedFloats([], 12))
+
+
+class TestCreateRowFormatter(unittest.TestCase):
+
+    def test_CreateRowFormatter(self):
+        row_formatter = kratos_utils.CreateRowFormatter(3, 1, False)
+        self.assertEqual("12 1 4 5 6\n", row_formatter(12, 4, 5, 6))
+
+        row_formatter = kratos_utils.CreateRowFormatter(2, 1, True, ID_width=4, property_width=3)
+        self.assertEqual("  12   1\t4\t5\n", row_formatter(12, 4, 5))
+
+        row_formatter = kratos_utils.CreateRowFormatter(1, 0, False, write_origin_IDs=True)
+        self.assertEqual("12 0 4 // 33\n", row_formatter(12, 4, 33))
+
+
+class TestGetMdpaFilePath(unittest.TestCase):
+
+    def test_GetMdpaFilePath(self):
+        self.assertEqual(("mesh.mdpa", None), kratos_utils.GetMdpaFilePath("mesh"))
+        self.assertEqual(("mesh.mdpa", None), kratos_utils.GetMdpaFilePath("mesh.mdpa"))
+        self.assertEqual(("mesh.mdpa.gz", "gzip"), kratos_utils.GetMdpaFilePath("mesh.mdpa.gz"))
+        self.assertEqual(("mesh.mdpa.xz", "xz"), kratos_utils.GetMdpaFilePath("mesh", "xz"))
+        self.assertEqual(("mesh.mdpa.gz", "gzip"), kratos_utils.GetMdpaFilePath("mesh.mdpa.gz", "gzip"))
+
+        with self.assertRaisesRegex(Exception, 'Unknown compression "zip"'):
+            kratos_utils.GetMdpaFilePath("mesh", "zip")
+
+
+class TestBlockCompressedFileWriter(unittest.TestCase):
+
+    def test_Write(self):
+        file_name = "test_file_blocks.txt"
+        text = "".join([str(i) + "\n" for i in range(1000)])
+
+        for compression, open_function in [("gzip", gzip.open), ("xz", lzma.open)]:
+            with kratos_utils.BlockCompressedFileWriter(file_name, compression, 6, num_workers=2, block_size=100) as compressed_file:
+                for i in range(1000):
+                    compressed_file.write(str(i) + "\n")
+
+            with open_function(file_name, "rt", newline="") as decompressed_file:
+                self.assertEqual(text.replace("\n", os.linesep), decompressed_file.read())
+
+        os.remove(file_name)
+
+
+class TestBufferedFileWriter(unittest.TestCase):
+
+    def test_Write(self):
+        open_file = io.StringIO()
+        with kratos_utils.BufferedFileWriter(open_file, buffer_size=10) as buffered_file:
+            for i in range(1000):
+                buffered_file.write(str(i) + "\n")
+
+        self.assertEqual("".join([str(i) + "\n" for i in range(1000)]), open_file.getvalue())
+        self.assertEqual(len(open_file.getvalue()), buffered_file.num_written_chars)
+
+    def test_WriteError(self):
+        class FailingFile(object):
+            def write(self, text):
+                raise IOError("disk full")
+
+        with self.assertRaisesRegex(IOError, "disk full"):
+            with kratos_utils.BufferedFileWriter(FailingFile(), buffer_size=10) as buffered_file:
+                for i in range(1000):
+                    buffered_file.write(str(i) + "\n")
+
+
+class TestWriteSections(unittest.TestCase):
+
+    def setUp(self):
+        self.sections = ["a\n"] + [(lambda open_file, i: open_file.write(str(i) + "\n"), (i,)) for i in range(20)] + ["b\n"]
+        self.expected_text = "a\n" + "".join([str(i) + "\n" for i in range(20)]) + "b\n"
+
+    def test_Write(self):
+        for num_workers in [1, 2]:
+            open_file = io.StringIO()
+            kratos_utils.WriteSections(open_file, self.sections, num_workers, max_pending_sections=3)
+            self.assertEqual(self.expected_text, open_file.getvalue())
+
+    def test_NoForkWhileThreadsAreRunning(self):
+        stop_event = threading.Event()
+        thread = threading.Thread(target=stop_event.wait)
+        thread.start()
+        try:
+            with kratos_utils.CreateSectionsExecutor(self.sections, 2) as executor:
+                self.assertIsInstance(executor, kratos_utils.concurrent.futures.ThreadPoolExecutor)
+                open_file = io.StringIO()
+                kratos_utils.WriteSections(open_file, self.sections, 2, executor=executor)
+        finally:
+            stop_event.set()
+            thread.join()
+
+        self.assertEqual(self.expected_text, open_file.getvalue())
+
+
+class TestNodePool(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes_1 = {1: [[0.0, 0.0, 0.0],{}], 2: [[5.0, 0.0, 0.0],{}], 3: [[5.0, 1.0, 0.0],{}]}
+        self.nodes_2 = {3: [[5.0, 1.0, 0.0],{}], 4: [[0.0, 1.0, 0.0],{"PRESSURE" : 1.5}]}
+
+    def test_AddNodes(self):
+        node_pool = kratos_utils.NodePool()
+
+        self.assertEqual([1, 2, 3], node_pool.AddNodes(self.nodes_1).tolist())
+        self.assertEqual([3, 4], node_pool.AddNodes(self.nodes_2).tolist())
+
+        self.assertEqual(4, len(node_pool))
+        self.assertEqual([[5.0, 1.0, 0.0], [0.0, 0.0, 0.0]], node_pool.GetCoordinates([3, 1]).tolist())
+        self.assertEqual([(4, {"PRESSURE" : 1.5})], node_pool.GetNodalDataOfNodes([1, 2, 3, 4]))
+        self.assertEqual([], node_pool.GetNodalDataOfNodes([1, 2, 3]))
+
+    def test_AddNodesArrayMapping(self):
+        node_pool = kratos_utils.NodePool()
+        node_pool.AddNodes(self.nodes_1)
+
+        nodes = global_utils.NodesArrayMapping([3, 7], [[5.0, 1.0, 0.0], [1.0, 1.0, 1.0]])
+        self.assertEqual([3, 7], node_pool.AddNodes(nodes).tolist())
+        self.assertEqual([[1.0, 1.0, 1.0]], node_pool.GetCoordinates([7]).tolist())
+
+    def test_DifferentCoordinates(self):
+        node_pool = kratos_utils.NodePool()
+        node_pool.AddNodes(self.nodes_1)
+
+        with self.assertRaisesRegex(Exception, "Node with ID 3 already exists with different coordinates!"):
+            node_pool.AddNodes({4: [[0.0, 1.0, 0.0],{}], 3: [[5.0, 2.0, 0.0],{}]})
+
+        self.assertEqual(3, len(node_pool)) # nothing was added
+        self.assertNotIn(4, node_pool)
+
+    def test_DifferentCoordinatesAllReported(self):
+        node_pool = kratos_utils.NodePool()
+        node_pool.AddNodes(self.nodes_1)
+
+        with self.assertRaises(Exception) as cm:
+            node_pool.AddNodes({1: [[0.0, 0.0, 1.0],{}], 2: [[5.0, 0.0, 0.0],{}], 3: [[5.0, 2.0, 0.0],{}]})
+
+        err_msg = str(cm.exception)
+        self.assertIn("2 node(s) already exist with different coordinates, IDs: [1, 3]", err_msg)
+        self.assertIn("Node with ID 1 already exists with different coordinates!", err_msg)
+        self.assertIn("Node with ID 3 already exists with different coordinates!", err_msg)
+        self.assertNotIn("Node with ID 2 ", err_msg)
+
+    def test_RemoveNodes(self):
+        node_pool = kratos_utils.NodePool()
+        node_ids_1 = node_pool.AddNodes(self.nodes_1)
+        node_ids_2 = node_pool.AddNodes(self.nodes_2)
+
+        node_pool.RemoveNodes(node_ids_2)
+        self.assertEqual(3, len(node_pool))
+        self.assertIn(3, node_pool) # still used by the first nodes
+        self.assertEqual([], node_pool.GetNodalDataOfNodes([1, 2, 3]))
+
+        node_pool.RemoveNodes(node_ids_1)
+        self.assertEqual(0, len(node_pool))
+
+        # removed nodes can be added with different coordinates
+        node_pool.AddNodes({3: [[5.0, 2.0, 0.0],{}]})
+        self.assertEqual([[5.0, 2.0, 0.0]], node_pool.GetCoordinates([3]).tolist())
+
+    def test_SharedBySubModelParts(self):
+        smp_mesh = {'write_smp': 1, 'entity_creation': {}}
+
+        main_mp = kratos_utils.MainModelPart()
+        main_mp.AddMesh({'smp_name': 'smp_1'}, smp_mesh, self.nodes_1, {})
+        main_mp.AddMesh({'smp_name': 'smp_2'}, smp_mesh, self.nodes_2, {})
+
+        self.assertEqual(4, len(main_mp.node_pool))
+
+        with self.assertRaisesRegex(Exception, "Node with ID 2 already exists with different coordinates!"):
+            main_mp.AddMesh({'smp_name': 'smp_3'}, smp_mesh, {2: [[5.0, 2.0, 0.0],{}]}, {})
+        self.assertFalse(main_mp.SubModelPartNameExists('smp_3'))
+
+        main_mp.RemoveSubmodelPart('smp_1')
+        self.assertEqual(2, len(main_mp.node_pool))
+
+
+class TestEntityInstanceTable(unittest.TestCase):
+
+    def test_GetInstance(self):
+        geom_entity = global_utils.GeometricEntity(1, 102, [1, 2])
+        entity_instances = kratos_utils.EntityInstanceTable()
+
+        element = entity_instances.GetInstance(geom_entity, "Element2D2N", kratos_utils.Element, 0)
+        self.assertIs(element, entity_instances.GetInstance(geom_entity, "Element2D2N", kratos_utils.Element, 0))
+        self.assertIsNot(element, entity_instances.GetInstance(geom_entity, "OtherElement2D2N", kratos_utils.Element, 0))
+        self.assertEqual(2, len(entity_instances))
+
+        entity_instances.Clear()
+        self.assertEqual(0, len(entity_instances))
+        self.assertIsNot(element, entity_instances.GetInstance(geom_entity, "Element2D2N", kratos_utils.Element, 0))
+
+    def test_GetInstances(self):
+        geom_entities = [global_utils.GeometricEntity(1, 102, [1, 2]), global_utils.GeometricEntity(2, 102, [2, 3])]
+        entity_instances = kratos_utils.EntityInstanceTable()
+
+        condition = entity_instances.GetInstance(geom_entities[1], "Condition2D2N", kratos_utils.Condition, 0)
+        conditions = entity_instances.GetInstances(geom_entities, "Condition2D2N", kratos_utils.Condition, 0)
+
+        self.assertEqual(2, len(conditions))
+        self.assertIs(geom_entities[0], conditions[0].origin_entity)
+        self.assertIs(condition, conditions[1])
+
+    def test_ReleaseInstances(self):
+        geom_entity = global_utils.GeometricEntity(1, 102, [1, 2])
+        entity_instances = kratos_utils.EntityInstanceTable()
+
+        element = entity_instances.GetInstance(geom_entity, "Element2D2N", kratos_utils.Element, 0)
+        entity_instances.GetInstance(geom_entity, "Element2D2N", kratos_utils.Element, 0) # used by a second SubModelPart
+        other_element = entity_instances.GetInstance(geom_entity, "Element2D2N", kratos_utils.Element, 7)
+        self.assertIsNot(element, other_element) # different property
+        self.assertEqual(2, len(entity_instances))
+
+        entity_instances.ReleaseInstances([element, other_element])
+        self.assertEqual(1, len(entity_instances))
+        self.assertIs(element, entity_instances.GetInstance(geom_entity, "Element2D2N", kratos_utils.Element, 0))
+
+        entity_instances.ReleaseInstances([element])
+        entity_instances.ReleaseInstances([element])
+        self.assertEqual(0, len(entity_instances))
+
+
 class TestMainModelPart(unittest.TestCase):
     maxDiff = None # this is needed to get the output of "self.assertDictEqual"
 
@@ -283,6 +638,20 @@ class TestMainModelPart(unittest.TestCase):
         self.assertEqual(obj2test.GetMeshRead(),True)
         self._test_mp_for_correctness(obj2test)
 
+    def testDeserializeConflictingNodes(self):
+        # projects saved by older versions can contain nodes with the same ID but different coordinates
+        serialized_mp = dict(self.serialized_mp)
+        serialized_mp['other'] = {'submodelpart_information': {'smp_name': 'other', 'smp_file_name': 'other', 'smp_file_path': 'other.dat'},
+                                  'mesh_information': {'write_smp': 1, 'entity_creation': {102: {'Condition': {'LineLoadCondition2D2N': '0'}}}},
+                                  'nodes_read': {1: [[7.0, 0.0, 0.0], {}], 2: [[5.0, 0.0, 0.0], {}]},
+                                  'geom_entities_read': [[23, 102, [1, 2], {}]]}
+
+        obj2test = kratos_utils.MainModelPart()
+        self.assertEqual(['other'], obj2test.Deserialize(serialized_mp))
+
+        self.assertEqual(['domain_custom'], obj2test.GetTreeItems())
+        self._test_mp_for_correctness(obj2test)
+
     def test_SameEntitiesInDifferentSMPs(self):
         nodes = {1: [[0.0, 0.0, 0.0],{}], 2: [[5.0, 0.0, 0.0],{}], 3: [[5.0, 1.0, 0.0],{}]}
 
@@ -307,6 +676,369 @@ class TestMainModelPart(unittest.TestCase):
         print(main_mp.NumberOfElements())
         print(main_mp.NumberOfConditions())
 
+    def test_WriteMeshWithNodesArrayMapping(self):
+        file_name_dict = "test_file_dict.mdpa"
+        file_name_arrays = "test_file_arrays.mdpa"
+
+        node_ids = sorted(self.nodes.keys())
+        nodes_arrays = global_utils.NodesArrayMapping(node_ids, [self.nodes[node_id][0] for node_id in node_ids])
+
+        main_mp = kratos_utils.MainModelPart()
+        main_mp.AddMesh(self.smp1_dict, self.smp1_mesh_dict, self.nodes, self.geom_entities)
+        main_mp.WriteMesh(file_name_dict)
+
+        main_mp = kratos_utils.MainModelPart()
+        main_mp.AddMesh(self.smp1_dict, self.smp1_mesh_dict, nodes_arrays, self.geom_entities)
+        main_mp.WriteMesh(file_name_arrays)
+
+        self.assertDictEqual(self.serialized_mp, main_mp.Serialize())
+        self.assertTrue(filecmp.cmp(file_name_dict, file_name_arrays, shallow=False))
+
+        os.remove(file_name_dict)
+        os.remove(file_name_arrays)
+
+    def test_WriteMeshWithArrays(self):
+        file_name_objects = "test_file_objects.mdpa"
+        file_name_arrays = "test_file_arrays.mdpa"
+
+        files_dir = os.path.join(os.getcwd(), "..", "Examples", "use_converter_from_python")
+        mesh_dicts = {
+            "domain"    : {'write_smp': 1, 'entity_creation': {204: {'Element': {'SmallDisplacementElement2D4N': '0'}},
+                                                               102: {'Condition': {'LineLoadCondition2D2N': '0'}}}},
+            "dirichlet" : {'write_smp': 1, 'entity_creation': {102: {'Condition': {'LineLoadCondition2D2N': '0'}}}},
+            "neumann"   : {'write_smp': 1, 'entity_creation': {101: {'Condition': {'PointLoadCondition2D1N': '0'}}}}
+        }
+
+        for use_arrays, file_name in zip([False, True], [file_name_objects, file_name_arrays]):
+            main_mp = kratos_utils.MainModelPart()
+            for smp_name in sorted(mesh_dicts.keys()):
+                valid_file, nodes, geom_entities = global_utils.ReadAndParseSalomeDatFile(os.path.join(files_dir, smp_name + ".dat"), use_arrays)
+                self.assertTrue(valid_file)
+                main_mp.AddMesh({'smp_name': smp_name}, mesh_dicts[smp_name], nodes, geom_entities)
+
+            main_mp.WriteMesh(file_name, readable_mdpa=use_arrays)
+            main_mp.WriteMesh(file_name, readable_mdpa=False) # writing twice must give the same result
+            self.assertEqual(156, main_mp.NumberOfNodes())
+            self.assertEqual(125, main_mp.NumberOfElements())
+            self.assertEqual(71, main_mp.NumberOfConditions())
+
+        self.assertTrue(filecmp.cmp(file_name_objects, file_name_arrays, shallow=False))
+
+        os.remove(file_name_objects)
+        os.remove(file_name_arrays)
+
+    def test_WriteMeshMergeNodes(self):
+        file_name = "test_file_merged_nodes.mdpa"
+
+        nodes_1 = {1: [[0.0, 0.0, 0.0],{}], 2: [[1.0, 0.0, 0.0],{}]}
+        nodes_2 = {11: [[1.0, 1e-10, 0.0],{"PRESSURE" : 1.5}], 12: [[2.0, 0.0, 0.0],{}]}
+        geom_entities_1 = {102 : [global_utils.GeometricEntity(1, 102, [1, 2])]}
+        geom_entities_2 = {102 : global_utils.GeometricEntitiesArray(102, [1], [[11, 12]])}
+        smp_mesh = {'write_smp': 1, 'entity_creation': {102: {'Element': {'TrussElement': '0'}}}}
+
+        main_mp = kratos_utils.MainModelPart()
+        main_mp.AddMesh({'smp_name': 'part_1'}, smp_mesh, nodes_1, geom_entities_1)
+        main_mp.AddMesh({'smp_name': 'part_2'}, smp_mesh, nodes_2, geom_entities_2)
+
+        main_mp.WriteMesh(file_name, merge_tolerance=1e-6)
+        self.assertEqual(3, main_mp.NumberOfNodes())
+        with open(file_name) as mdpa_file:
+            mdpa = mdpa_file.read()
+        self.assertIn("Begin Nodes\n1 0.0 0.0 0.0\n2 1.0 0.0 0.0\n12 2.0 0.0 0.0\nEnd Nodes", mdpa)
+        self.assertIn("Begin Elements TrussElement\n1 0 1 2\n2 0 2 12\nEnd Elements", mdpa)
+        self.assertIn("Begin NodalData PRESSURE\n2 1.5\nEnd NodalData", mdpa)
+        self.assertIn("Begin SubModelPartNodes\n2\n12\nEnd SubModelPartNodes", mdpa)
+
+        main_mp.WriteMesh(file_name) # nothing is merged
+        self.assertEqual(4, main_mp.NumberOfNodes())
+
+        os.remove(file_name)
+
+    def test_WriteMeshRenumberNodes(self):
+        file_name = "test_file_renumbered_nodes.mdpa"
+        file_name_ref = "test_file_ref.mdpa"
+
+        def ReadNodesAndElements(file_name):
+            with open(file_name) as mdpa_file:
+                lines = mdpa_file.read().split("\n")
+            nodes = {}
+            elements = []
+            for line in lines[lines.index("Begin Nodes")+1 : lines.index("End Nodes")]:
+                words = line.split()
+                nodes[int(words[0])] = tuple(words[1:])
+            begin_elements = lines.index("Begin Elements SmallDisplacementElement2D4N")
+            for line in lines[begin_elements+1 : lines.index("End Elements // SmallDisplacementElement2D4N")]:
+                elements.append([nodes[int(node_ID)] for node_ID in line.split()[2:]])
+            return nodes, elements
+
+        files_dir = os.path.join(os.getcwd(), "..", "Examples", "use_converter_from_python")
+        mesh_dict = {'write_smp': 1, 'entity_creation': {204: {'Element': {'SmallDisplacementElement2D4N': '0'}}}}
+
+        for use_arrays in [False, True]:
+            valid_file, nodes, geom_entities = global_utils.ReadAndParseSalomeDatFile(os.path.join(files_dir, "domain.dat"), use_arrays)
+            main_mp = kratos_utils.MainModelPart()
+            main_mp.AddMesh({'smp_name': "domain"}, mesh_dict, nodes, geom_entities)
+            main_mp.WriteMesh(file_name_ref)
+            main_mp.WriteMesh(file_name, renumber_nodes=True)
+
+            nodes_ref, elements_ref = ReadNodesAndElements(file_name_ref)
+            nodes_renumbered, elements_renumbered = ReadNodesAndElements(file_name)
+
+            self.assertEqual(list(range(1, len(nodes_ref)+1)), sorted(nodes_renumbered.keys()))
+            self.assertEqual(sorted(nodes_ref.values()), sorted(nodes_renumbered.values()))
+            self.assertEqual(elements_ref, elements_renumbered) # same elements with the same coordinates
+
+        os.remove(file_name)
+        os.remove(file_name_ref)
+
+    def test_WriteMeshOrderEntities(self):
+        file_name_objects = "test_file_ordered_objects.mdpa"
+        file_name_arrays = "test_file_ordered_arrays.mdpa"
+        file_name_ref = "test_file_ref.mdpa"
+
+        def ReadElements(file_name):
+            with open(file_name) as mdpa_file:
+                lines = mdpa_file.read().split("\n")
+            begin_elements = lines.index("Begin Elements SmallDisplacementElement2D4N")
+            return [line.split() for line in lines[begin_elements+1 : lines.index("End Elements // SmallDisplacementElement2D4N")]]
+
+        files_dir = os.path.join(os.getcwd(), "..", "Examples", "use_converter_from_python")
+        mesh_dict = {'write_smp': 1, 'entity_creation': {204: {'Element': {'SmallDisplacementElement2D4N': '0'}}}}
+
+        for use_arrays, file_name in zip([False, True], [file_name_objects, file_name_arrays]):
+            valid_file, nodes, geom_entities = global_utils.ReadAndParseSalomeDatFile(os.path.join(files_dir, "domain.dat"), use_arrays)
+            main_mp = kratos_utils.MainModelPart()
+            main_mp.AddMesh({'smp_name': "domain"}, mesh_dict, nodes, geom_entities)
+            main_mp.WriteMesh(file_name_ref)
+            main_mp.WriteMesh(file_name, order_entities=True)
+
+            elements_ref = ReadElements(file_name_ref)
+            elements_ordered = ReadElements(file_name)
+
+            self.assertEqual([str(i) for i in range(1, len(elements_ref)+1)], [element[0] for element in elements_ordered])
+            self.assertNotEqual(elements_ref, elements_ordered)
+            self.assertEqual(sorted([element[1:] for element in elements_ref]), sorted([element[1:] for element in elements_ordered]))
+
+        self.assertTrue(filecmp.cmp(file_name_objects, file_name_arrays, shallow=False))
+
+        main_mp.WriteMesh(file_name_arrays) # without ordering again
+        self.assertTrue(filecmp.cmp(file_name_arrays, file_name_ref, shallow=False))
+
+        os.remove(file_name_objects)
+        os.remove(file_name_arrays)
+        os.remove(file_name_ref)
+
+    def test_WriteMeshIncrementallyOrdered(self):
+        file_name_incremental = "test_file_incremental.mdpa"
+        file_name_ref = "test_file_ref.mdpa"
+
+        rng = np.random.default_rng(42)
+        mesh_dict = {'write_smp': 1, 'entity_creation': {102: {'Element': {'TrussElement': '0'}}}}
+        nodes_1 = {i: [rng.random(3).tolist(), {}] for i in range(1, 51)}
+        geom_entities_1 = {102 : [global_utils.GeometricEntity(i, 102, [i, i%50+1]) for i in range(1, 51)]}
+        # outside of the bounding box of the nodes of the first SubModelPart
+        nodes_2 = {i: [[100.0 + i, 0.0, 0.0], {}] for i in range(51, 54)}
+        geom_entities_2 = {102 : [global_utils.GeometricEntity(i, 102, [i, i+1]) for i in range(51, 53)]}
+
+        main_mp = kratos_utils.MainModelPart()
+        main_mp.AddMesh({'smp_name': "part_1"}, mesh_dict, nodes_1, geom_entities_1)
+        main_mp.WriteMesh(file_name_incremental, order_entities=True)
+        main_mp.AddMesh({'smp_name': "part_2"}, mesh_dict, nodes_2, geom_entities_2)
+        main_mp.WriteMesh(file_name_incremental, order_entities=True)
+
+        main_mp_ref = kratos_utils.MainModelPart()
+        main_mp_ref.AddMesh({'smp_name': "part_1"}, mesh_dict, nodes_1, geom_entities_1)
+        main_mp_ref.AddMesh({'smp_name': "part_2"}, mesh_dict, nodes_2, geom_entities_2)
+        main_mp_ref.WriteMesh(file_name_ref, order_entities=True)
+
+        self.assertTrue(filecmp.cmp(file_name_incremental, file_name_ref, shallow=False))
+
+        os.remove(file_name_incremental)
+        os.remove(file_name_ref)
+
+    def test_WriteMeshCompactNodeIds(self):
+        file_name = "test_file_compact_node_ids.mdpa"
+        file_name_mapping = "test_file_node_id_mapping.txt"
+
+        nodes_1 = {10: [[0.0, 0.0, 0.0],{}], 200: [[1.0, 0.0, 0.0],{}]}
+        nodes_2 = {3000: [[1.0, 1e-10, 0.0],{"PRESSURE" : 1.5}], 40000: [[2.0, 0.0, 0.0],{}]}
+        geom_entities_1 = {102 : [global_utils.GeometricEntity(1, 102, [10, 200])]}
+        geom_entities_2 = {102 : global_utils.GeometricEntitiesArray(102, [1], [[3000, 40000]])}
+        smp_mesh = {'write_smp': 1, 'entity_creation': {102: {'Element': {'TrussElement': '0'}}}}
+
+        main_mp = kratos_utils.MainModelPart()
+        main_mp.AddMesh({'smp_name': 'part_1'}, smp_mesh, nodes_1, geom_entities_1)
+        main_mp.AddMesh({'smp_name': 'part_2'}, smp_mesh, nodes_2, geom_entities_2)
+
+        main_mp.WriteMesh(file_name, compact_node_ids=True)
+        with open(file_name) as mdpa_file:
+            mdpa = mdpa_file.read()
+        self.assertIn("Begin Nodes\n1 0.0 0.0 0.0\n2 1.0 0.0 0.0\n3 1.0 1e-10 0.0\n4 2.0 0.0 0.0\nEnd Nodes", mdpa)
+        self.assertIn("Begin Elements TrussElement\n1 0 1 2\n2 0 3 4\nEnd Elements", mdpa)
+        self.assertIn("Begin NodalData PRESSURE\n3 1.5\nEnd NodalData", mdpa)
+        self.assertIn("Begin SubModelPartNodes\n3\n4\nEnd SubModelPartNodes", mdpa)
+
+        node_IDs, new_node_IDs = main_mp.GetNodeIdMapping()
+        self.assertEqual([10, 200, 3000, 40000], node_IDs.tolist())
+        self.assertEqual([1, 2, 3, 4], new_node_IDs.tolist())
+
+        # together with merging the nodes
+        main_mp.WriteMesh(file_name, compact_node_ids=True, merge_tolerance=1e-6)
+        with open(file_name) as mdpa_file:
+            mdpa = mdpa_file.read()
+        self.assertIn("Begin Nodes\n1 0.0 0.0 0.0\n2 1.0 0.0 0.0\n3 2.0 0.0 0.0\nEnd Nodes", mdpa)
+        self.assertIn("Begin Elements TrussElement\n1 0 1 2\n2 0 2 3\nEnd Elements", mdpa)
+
+        main_mp.WriteNodeIdMapping(file_name_mapping)
+        with open(file_name_mapping) as mapping_file:
+            self.assertEqual("10 1\n200 2\n3000 2\n40000 3\n", mapping_file.read())
+
+        os.remove(file_name)
+        os.remove(file_name_mapping)
+
+    def test_WriteMeshWorkers(self):
+        file_name_serial = "test_file_serial.mdpa"
+        file_name_parallel = "test_file_parallel.mdpa"
+
+        nodes_1 = {i: [[float(i), 0.0, 0.0],{}] for i in range(1, 12)}
+        nodes_2 = {i: [[float(i), 0.0, 0.0],{"PRESSURE" : 1.5}] for i in range(5, 9)}
+        geom_entities_1 = {102 : global_utils.GeometricEntitiesArray(102, list(range(1, 11)), [[i, i+1] for i in range(1, 11)])}
+        geom_entities_2 = {101 : [global_utils.GeometricEntity(i, 101, [i]) for i in range(5, 9)]}
+
+        main_mp = kratos_utils.MainModelPart()
+        main_mp.AddMesh({'smp_name': 'part_1'}, {'write_smp': 1, 'entity_creation': {102: {'Element': {'TrussElement': '0'}}}}, nodes_1, geom_entities_1)
+        main_mp.AddMesh({'smp_name': 'part_2'}, {'write_smp': 1, 'entity_creation': {101: {'Condition': {'PointLoadCondition': '0'}}}}, nodes_2, geom_entities_2)
+
+        # small chunks such that the blocks are split into several sections
+        main_mp.node_chunk_size = 3
+        main_mp.entity_chunk_size = 3
+        main_mp.max_pending_sections = 4
+
+        for readable_mdpa in [False, True]:
+            main_mp.WriteMesh(file_name_serial, readable_mdpa=readable_mdpa)
+            main_mp.WriteMesh(file_name_parallel, readable_mdpa=readable_mdpa, workers=2)
+            self.assertTrue(filecmp.cmp(file_name_serial, file_name_parallel, shallow=False))
+            main_mp.WriteMesh(file_name_parallel, readable_mdpa=readable_mdpa, write_buffer_size=16)
+            self.assertTrue(filecmp.cmp(file_name_serial, file_name_parallel, shallow=False))
+            main_mp.WriteMesh(file_name_parallel, readable_mdpa=readable_mdpa, workers=2, write_buffer_size=16)
+            self.assertTrue(filecmp.cmp(file_name_serial, file_name_parallel, shallow=False))
+
+        os.remove(file_name_serial)
+        os.remove(file_name_parallel)
+
+    def test_WriteMeshCompressed(self):
+        file_name = "test_file_compressed.mdpa"
+
+        nodes = {1: [[0.0, 0.0, 0.0],{}], 2: [[1.0, 0.0, 0.0],{}]}
+        geom_entities = {102 : [global_utils.GeometricEntity(1, 102, [1, 2])]}
+
+        main_mp = kratos_utils.MainModelPart()
+        main_mp.AddMesh({'smp_name': 'part_1'}, {'write_smp': 1, 'entity_creation': {102: {'Element': {'TrussElement': '0'}}}}, nodes, geom_entities)
+
+        main_mp.WriteMesh(file_name)
+        with open(file_name) as mdpa_file:
+            mdpa = mdpa_file.read()
+
+        main_mp.WriteMesh(file_name + ".gz")
+        with gzip.open(file_name + ".gz", "rt") as mdpa_file:
+            self.assertEqual(mdpa, mdpa_file.read())
+
+        main_mp.WriteMesh(file_name, compression="xz", compression_level="fast", compression_workers=2)
+        with lzma.open(file_name + ".xz", "rt") as mdpa_file:
+            self.assertEqual(mdpa, mdpa_file.read())
+
+        with self.assertRaisesRegex(Exception, 'does not match'):
+            main_mp.WriteMesh(file_name + ".gz", compression="xz")
+
+        os.remove(file_name)
+        os.remove(file_name + ".gz")
+        os.remove(file_name + ".xz")
+
+    def test_WriteMeshIncrementally(self):
+        file_name_incremental = "test_file_incremental.mdpa"
+        file_name_ref = "test_file_ref.mdpa"
+
+        files_dir = os.path.join(os.getcwd(), "..", "Examples", "use_converter_from_python")
+        mesh_dicts = {
+            "domain"    : {'write_smp': 1, 'entity_creation': {204: {'Element': {'SmallDisplacementElement2D4N': '0'}},
+                                                               102: {'Condition': {'LineLoadCondition2D2N': '0'}}}},
+            "dirichlet" : {'write_smp': 1, 'entity_creation': {102: {'Condition': {'LineLoadCondition2D2N': '0'}}}},
+            "neumann"   : {'write_smp': 1, 'entity_creation': {101: {'Condition': {'PointLoadCondition2D1N': '0'}}}}
+        }
+        updated_mesh_dict = {'write_smp': 1, 'entity_creation': {102: {'Condition': {'LineLoadCondition2D2N': '0', 'OtherCondition2D2N': '1'}}}}
+
+        meshes_read = {}
+        for smp_name in mesh_dicts.keys():
+            valid_file, nodes, geom_entities = global_utils.ReadAndParseSalomeDatFile(os.path.join(files_dir, smp_name + ".dat"))
+            self.assertTrue(valid_file)
+            meshes_read[smp_name] = (nodes, geom_entities)
+
+        def WriteReference(smp_names, updated_smp_name=None):
+            main_mp = kratos_utils.MainModelPart()
+            for smp_name in smp_names:
+                mesh_dict = updated_mesh_dict if smp_name == updated_smp_name else mesh_dicts[smp_name]
+                main_mp.AddMesh({'smp_name': smp_name}, mesh_dict, *meshes_read[smp_name])
+            main_mp.WriteMesh(file_name_ref)
+
+        main_mp = kratos_utils.MainModelPart()
+        for smp_name in ["domain", "neumann"]:
+            main_mp.AddMesh({'smp_name': smp_name}, mesh_dicts[smp_name], *meshes_read[smp_name])
+        main_mp.WriteMesh(file_name_incremental)
+
+        # adding a SubModelPart in between
+        main_mp.AddMesh({'smp_name': "dirichlet"}, mesh_dicts["dirichlet"], *meshes_read["dirichlet"])
+        main_mp.WriteMesh(file_name_incremental)
+        WriteReference(["dirichlet", "domain", "neumann"])
+        self.assertTrue(filecmp.cmp(file_name_incremental, file_name_ref, shallow=False))
+
+        # updating a SubModelPart
+        main_mp.UpdateMesh("domain", {'smp_name': "domain"}, updated_mesh_dict)
+        main_mp.WriteMesh(file_name_incremental)
+        WriteReference(["dirichlet", "domain", "neumann"], "domain")
+        self.assertTrue(filecmp.cmp(file_name_incremental, file_name_ref, shallow=False))
+
+        # removing a SubModelPart
+        main_mp.RemoveSubmodelPart("dirichlet")
+        main_mp.WriteMesh(file_name_incremental)
+        WriteReference(["domain", "neumann"], "domain")
+        self.assertTrue(filecmp.cmp(file_name_incremental, file_name_ref, shallow=False))
+
+        os.remove(file_name_incremental)
+        os.remove(file_name_ref)
+
+    def test_WriteMeshUpdateProperty(self):
+        file_name = "test_file_update_property.mdpa"
+
+        nodes = {1: [[0.0, 0.0, 0.0],{}], 2: [[1.0, 0.0, 0.0],{}], 3: [[2.0, 0.0, 0.0],{}]}
+        mesh_dict = {'write_smp': 1, 'entity_creation': {102: {'Condition': {'LineLoadCondition2D2N': '0'}},
+                                                         101: {'Condition': {'PointLoadCondition2D1N': '0'}}}}
+        updated_mesh_dict = {'write_smp': 1, 'entity_creation': {102: {'Condition': {'LineLoadCondition2D2N': '7'}},
+                                                                 101: {'Condition': {'PointLoadCondition2D1N': '0'}}}}
+
+        for geom_entities in [{102 : [global_utils.GeometricEntity(1, 102, [1, 2]), global_utils.GeometricEntity(2, 102, [2, 3])]},
+                              {102 : global_utils.GeometricEntitiesArray(102, [1, 2], [[1, 2], [2, 3]])}]:
+            main_mp = kratos_utils.MainModelPart()
+            # this SubModelPart stays assembled, such that the other one is assembled incrementally
+            main_mp.AddMesh({'smp_name': 'part_0'}, {'write_smp': 1, 'entity_creation': {102: {'Element': {'TrussElement': '0'}}}},
+                            {10: [[0.0, 1.0, 0.0],{}], 11: [[1.0, 1.0, 0.0],{}]}, {102 : [global_utils.GeometricEntity(1, 102, [10, 11])]})
+            main_mp.AddMesh({'smp_name': 'part_1'}, mesh_dict, nodes, geom_entities)
+            main_mp.WriteMesh(file_name)
+
+            main_mp.UpdateMesh('part_1', {'smp_name': 'part_1'}, updated_mesh_dict)
+            for i in range(2):
+                main_mp.WriteMesh(file_name)
+                with open(file_name) as mdpa_file:
+                    self.assertIn("Begin Conditions LineLoadCondition2D2N\n1 7 1 2\n2 7 2 3\nEnd Conditions", mdpa_file.read())
+
+            # the instances of the old property and of the (recreated) point conditions are not kept
+            num_line_condition_instances = 2 if isinstance(geom_entities[102], list) else 1
+            self.assertEqual(1 + num_line_condition_instances + 1, len(main_mp.entity_instances)) # the point conditions are one array
+
+            main_mp.RemoveSubmodelPart('part_1')
+            self.assertEqual(1, len(main_mp.entity_instances))
+
+        os.remove(file_name)
+
 
 
 
@@ -650,4 +1382,4 @@ class MeshSubmodelPart(unittest.TestCase):
 
 if __name__ == '__main__':
     unittest.main()
-    add test for multiple writing!
\ No newline at end of file
+    # add test for multiple writing!
\ No newline at end of file
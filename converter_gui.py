@@ -20,6 +20,7 @@ Intended for non-commercial use in research
 import tkinter as tk
 from tkinter import messagebox
 import time
+import os
 from tkinter import ttk
 import global_utilities as global_utils
 try: # ujson is much faster in file saving and a bit faster in file opening. Install in Ubuntu with: "sudo apt-get install python3-ujson"
@@ -263,10 +264,16 @@ class GUIObject(BaseWindow): # This is the main Window
                     with open(file_path, "r") as json_file:
                         serialized_model_part_dict = fast_json.load(json_file)
 
-                    self.model_part.Deserialize(serialized_model_part_dict)
+                    skipped_smp_names = self.model_part.Deserialize(serialized_model_part_dict)
                     self.UpdateMeshTree()
                     global_utils.LogTiming("Open Project", start_time)
-                    self.PlotCmdOutput("Opened the project", "green")
+                    if len(skipped_smp_names) > 0: # their nodes exist already with different coordinates
+                        self.SetUnsavedChangesExist() # saving the project would remove them
+                        self.PlotCmdOutput("Opened the project, {} SubModelPart(s) were skipped".format(len(skipped_smp_names)), "orange")
+                        messagebox.showwarning("Warning", "The following SubModelParts were skipped, " +
+                                               "their nodes exist already with different coordinates:\n" + "\n".join(skipped_smp_names))
+                    else:
+                        self.PlotCmdOutput("Opened the project", "green")
                     global_utils.LogInfo("Opened Project")
                 except:
                     self.PlotCmdOutput("Opening project from file \"{}\" failed".format(file_path), "red")
@@ -434,7 +441,9 @@ class ReadMeshWindow(BaseWindow):
         if smp_name: # This means that an existing mesh is edited
             smp = self.master.GetModelPart().GetSubModelPart(smp_name)
             smp_info_dict = smp.GetInfoDict()
-            self._FillInputTree(smp.GetGeomEntites())
+            geom_entity_counts = {geometry_identifier : len(geom_entities)
+                                  for geometry_identifier, geom_entities in smp.GetGeomEntites().items()}
+            self._FillInputTree(geom_entity_counts)
             mesh_dict = smp.GetMeshInfoDict()
             self._FillOutputTree(mesh_dict["entity_creation"])
             self.edited_mesh = True
@@ -529,9 +538,10 @@ class ReadMeshWindow(BaseWindow):
 
             file_name = utils.GetFileName(file_path)
 
-            valid_file, self.nodes_read, self.geom_entities_read = global_utils.ReadAndParseSalomeDatFile(file_path)
+            # Only the entity counts are needed here, the file is parsed when the mesh is saved
+            valid_file, num_nodes, geom_entity_counts = global_utils.ScanSalomeDatFile(file_path)
             if valid_file:
-                self._FillInputTree(self.geom_entities_read)
+                self._FillInputTree(geom_entity_counts, num_nodes)
                 self.file_parsed = True
 
                 self.file_name = file_name
@@ -543,19 +553,22 @@ class ReadMeshWindow(BaseWindow):
                 self.PlotCmdOutput("File is not valid", "red")
 
 
-    def _FillInputTree(self, geom_entities_read):
+    def _FillInputTree(self, geom_entity_counts, num_nodes=None):
         self.tree_input.delete(*self.tree_input.get_children())
         self.tree_output.delete(*self.tree_output.get_children())
 
-        self.tree_input.insert("", "end", text="Nodes", values=global_utils.NODE_IDENTIFIER, tags="clickable")
+        label = "Nodes"
+        if num_nodes is not None:
+            label += ": " + global_utils.GetEntityCountString(num_nodes)
+        self.tree_input.insert("", "end", text=label, values=global_utils.NODE_IDENTIFIER, tags="clickable")
         self.tree_output.insert("", "end", text="Nodes", tags="Node")
 
         # Keys are in format identifier_name
-        if geom_entities_read: # check if geom entities are present
-            sorted_keys = sorted(list(geom_entities_read.keys()))
+        if geom_entity_counts: # check if geom entities are present
+            sorted_keys = sorted(list(geom_entity_counts.keys()))
 
             for salome_identifier in sorted_keys:
-                label = global_utils.GetEntityType(salome_identifier)
+                label = global_utils.GetEntityType(salome_identifier) + ": " + global_utils.GetEntityCountString(geom_entity_counts[salome_identifier])
                 self.tree_input.insert("", "end", text=label, value=salome_identifier, tags="clickable")
 
 
@@ -643,14 +656,28 @@ class ReadMeshWindow(BaseWindow):
             mesh_dict = global_utils.GetDictFromTree(self.tree_output)
             mesh_dict["write_smp"] = self.write_smp_var.get()
 
-            if self.file_parsed and self.edited_mesh: # A mesh was edited but then re-read (overwritten)
-                self.master.GetModelPart().RemoveSubmodelPart(self.old_smp_name)
-                self.master.GetModelPart().AddMesh(smp_info_dict, mesh_dict, self.nodes_read, self.geom_entities_read)
+            if self.file_parsed: # The file was only scanned so far
+                valid_file, self.nodes_read, self.geom_entities_read = global_utils.ReadAndParseSalomeDatFile(self.file_path)
+                if not valid_file:
+                    self.PlotCmdOutput("File is not valid", "red")
+                    return
 
-            if self.file_parsed and not self.edited_mesh: # A mesh was read
-                self.master.GetModelPart().AddMesh(smp_info_dict, mesh_dict, self.nodes_read, self.geom_entities_read)
+            if self.file_parsed: # A mesh was read
+                if self.edited_mesh: # A mesh was edited but then re-read (overwritten)
+                    self.master.GetModelPart().RemoveSubmodelPart(self.old_smp_name)
+                    self.edited_mesh = False # the SubModelPart does not exist anymore, also if adding it fails
+                    self.master.UpdateMeshTree()
+                    self.master.SetUnsavedChangesExist()
 
-            elif not self.file_parsed and self.edited_mesh: # A mesh was edited
+                try:
+                    self.master.GetModelPart().AddMesh(smp_info_dict, mesh_dict, self.nodes_read, self.geom_entities_read)
+                except Exception as e: # e.g. nodes that exist already with different coordinates
+                    self.PlotCmdOutput("Mesh could not be added", "red")
+                    messagebox.showerror("Error", "Mesh could not be added:\n" + str(e))
+                    utils.BringWindowToFront(self.window)
+                    return
+
+            elif self.edited_mesh: # A mesh was edited
                 self.master.GetModelPart().UpdateMesh(self.old_smp_name, smp_info_dict, mesh_dict)
 
             self.master.UpdateMeshTree()
@@ -941,17 +968,28 @@ class FileSelectionWindow(BaseWindow):
     def _SaveAndCloseWindow(self):
         if self._ValidateInput():
             # pass stuff to Master
+            file_paths = [entry_field.get() for entry_field in self.entry_fields]
+            # the processes are spawned, forked processes would inherit the state of Tk (e.g. the connection to the display)
+            results = global_utils.ReadManySalomeDatFiles(file_paths, num_workers=os.cpu_count() or 1, start_method="spawn", use_arrays=True)
+
             all_files_valid = True
-            for file_name, entry_field in zip(self.file_names, self.entry_fields):
-                file_path = entry_field.get()
-                valid_file, nodes_read, geom_entities_read = global_utils.ReadAndParseFile(file_path)
+            for file_name, file_path in zip(self.file_names, file_paths):
+                valid_file, nodes_read, geom_entities_read = results[file_path]
                 if valid_file:
                     smp_info_dict = {}
                     smp_info_dict["smp_name"] = file_name
                     smp_info_dict["smp_file_name"] = file_name
                     smp_info_dict["smp_file_path"] = file_path
 
-                    self.master.GetModelPart().AddMesh(smp_info_dict, self.json_dict[file_name], nodes_read, geom_entities_read)
+                    try:
+                        self.master.GetModelPart().AddMesh(smp_info_dict, self.json_dict[file_name], nodes_read, geom_entities_read)
+                    except Exception as e: # e.g. nodes that exist already with different coordinates
+                        self.master.GetModelPart().Reset()
+                        all_files_valid = False
+                        self.PlotCmdOutput("Mesh for \"{}\" could not be added".format(file_name), "red")
+                        messagebox.showerror("Error", "Mesh for \"{}\" could not be added:\n{}".format(file_name, e))
+                        utils.BringWindowToFront(self.window)
+                        break # no need to add the other files
                 else:
                     self.master.GetModelPart().Reset()
                     all_files_valid = False
@@ -18,26 +18,72 @@ Intended for non-commercial use in research
 # Global Variables
 DEBUG = False          # Set this Variable to "True" for debugging
 LOG_TIMING = True
+MMAP_CHUNK_SIZE = 1 << 26  # Number of bytes that are scanned at once when indexing a memory-mapped file
+MMAP_WINDOW_SIZE = 1 << 16 # Number of lines that are parsed at once when reading a memory-mapped file
+DAT_CACHE_DIRECTORY = None # Directory for the parse-cache of *.dat files, if None the cache is saved next to the *.dat file
+DAT_CACHE_VERSION = 2      # Increase this if the content of the parse-cache changes (e.g. the node ordering)
 
 # Python imports
+import io
 import sys
 import os
 import time
 import logging
+import itertools
+import collections.abc
+import array
+import mmap
+import multiprocessing
+import concurrent.futures
+import hashlib
+import gzip
+import lzma
+import bz2
+
+# Third party imports
+import numpy as np
 
 if DEBUG:
     logging.basicConfig(level=logging.DEBUG)
 else:
     logging.basicConfig(level=logging.INFO)
 
+# Compressed *.dat files are detected by the first bytes of the file
+COMPRESSION_MAGIC_BYTES = {
+        b"\x1f\x8b" : "gzip",
+        b"\xfd7zXZ\x00" : "xz",
+        b"BZh" : "bz2",
+        b"\x28\xb5\x2f\xfd" : "zstd"
+}
+
 NODE_IDENTIFIER = 101 # This was made by me. Cannot start with 0!
 GEOMETRY_IDENTIFIERS = {
         NODE_IDENTIFIER : "Node",
         102 : "Line",
         203 : "Triangle",
         204 : "Quadrilateral",
+        206 : "QuadraticTriangle",
+        208 : "QuadraticQuadrilateral",
         304 : "Tetrahedral",
-        308 : "Hexahedral"
+        305 : "Pyramid",
+        306 : "Prism",
+        308 : "Hexahedral",
+        310 : "QuadraticTetrahedral",
+        313 : "QuadraticPyramid",
+        315 : "QuadraticPrism",
+        320 : "QuadraticHexahedral"
+}
+
+# The order of the nodes of some geometries is different btw SALOME and Kratos
+# Node i of the Kratos geometry is node "SALOME_TO_KRATOS_NODE_ORDER[geometry_identifier][i]" of the SALOME geometry
+# Geometries that are not listed have the same order (e.g. 206, 208 and 310, same as 203, 204 and 304)
+SALOME_TO_KRATOS_NODE_ORDER = {
+        305 : [0,3,2,1,4],
+        306 : [0,2,1,3,5,4],
+        308 : [0,3,2,1,4,7,6,5],
+        313 : [0,3,2,1,4,8,7,6,5,9,12,11,10],
+        315 : [0,2,1,3,5,4,8,7,6,12,14,13,11,10,9],
+        320 : [0,3,2,1,4,7,6,5,11,10,9,8,16,19,18,17,15,14,13,12]
 }
 
 ELEMENTS = {
@@ -52,12 +98,30 @@ ELEMENTS = {
         204 : [
             "Element2D4N"
         ],
+        206 : [
+            "Element2D6N"
+        ],
+        208 : [
+            "Element2D8N"
+        ],
         304 : [
             "Element3D4N"
         ],
+        306 : [
+            "Element3D6N"
+        ],
         308 : [
             "Element3D8N"
         ],
+        310 : [
+            "Element3D10N"
+        ],
+        315 : [
+            "Element3D15N"
+        ],
+        320 : [
+            "Element3D20N"
+        ],
     },
     "1_Fluid" : {
         203 : [
@@ -136,6 +200,12 @@ CONDITIONS = {
         ],
         204 : [
             "SurfaceCondition3D4N"
+        ],
+        206 : [
+            "SurfaceCondition3D6N"
+        ],
+        208 : [
+            "SurfaceCondition3D8N"
         ]
     },
     "1_Fluid" : {
@@ -168,7 +238,21 @@ CONDITIONS = {
 }
 
 
-def ReadAndParseSalomeDatFile(file_path):
+def ReadAndParseSalomeDatFile(file_path, use_arrays=False, use_mmap=False, num_workers=1, use_cache=False):
+    """This function reads a *.dat file exported from Salome
+    The file is streamed line by line, the counts from the header
+    determine how many lines belong to the nodes and to the geometric entities
+    If "use_arrays" is True, the node block is parsed in bulk into arrays
+    and the nodes are returned as "NodesArrayMapping". The geometric entities
+    are then stored columnar as one "GeometricEntitiesArray" per geometry identifier
+    If "use_mmap" is True, the file is read through a memory map (see "MappedSalomeDatFile")
+    With "num_workers" > 1 the geometric entities are parsed in parallel, this uses the memory map too
+    Compressed files (gzip, xz, bz2, zstd) are decompressed while they are read, see "OpenSalomeDatFile"
+    (the memory map cannot be used for them, they are always streamed)
+    If "use_cache" is True, the parsed arrays are saved in a cache-file (see "GetSalomeDatCachePath")
+    which is loaded instead of parsing the file again as long as the file does not change
+    Returns (valid_file, nodes, geom_entities)
+    """
     valid_file = True
     nodes = {}
     geom_entities = {}
@@ -178,48 +262,146 @@ def ReadAndParseSalomeDatFile(file_path):
 
         return False, None, None
 
+    if use_cache:
+        cache_content = ReadSalomeDatCache(file_path)
+        if cache_content is None:
+            valid_file, nodes, geom_entities = ReadAndParseSalomeDatFile(file_path, True, use_mmap, num_workers)
+            if not valid_file:
+                return valid_file, nodes, geom_entities
+            WriteSalomeDatCache(file_path, nodes, geom_entities)
+        else:
+            nodes, geom_entities = cache_content
+
+        if not use_arrays:
+            nodes, geom_entities = ConvertArraysToObjects(nodes, geom_entities)
+
+        return valid_file, nodes, geom_entities
+
+    if use_mmap or num_workers > 1:
+        if GetCompression(file_path) is None:
+            return ReadAndParseMappedSalomeDatFile(file_path, use_arrays, num_workers)
+        logging.debug('File \"{}\" is compressed, it is streamed instead of memory-mapped'.format(file_path))
+
     try:
-        with open(file_path,"r") as f:
-            lines = f.readlines()
-            # .dat header
-            line = lines[0].split()
-            num_nodes = int(line[0])
-            # num_elems = int(line[1])
-            # nodes = lines[1:num_nodes+1]
+        with OpenSalomeDatFile(file_path) as f:
+            num_nodes, num_elems = ReadSalomeDatHeader(f)
 
             if num_nodes == 0:
                 logging.error('No nodes in file \"{}\"'.format(file_path))
                 valid_file = False
 
             if valid_file:
+                # Read Nodes
+                if use_arrays:
+                    nodes = ReadSalomeDatNodeBlock(f, num_nodes)
+                else:
+                    for _ in range(num_nodes):
+                        words = next(f).split()
+                        salome_ID = int(words[0])
+                        coords = [float(words[1]), float(words[2]), float(words[3])] # X, Y, Z
+                        nodes[salome_ID] = [coords, {}]
+
+                # Read Geometric Objects (Lines, Triangles, Quads, ...)
+                if use_arrays:
+                    geom_entities = ReadSalomeDatEntityBlock(f, num_elems)
+                else:
+                    for _ in range(num_elems):
+                        words = next(f).split()
+                        salome_ID = int(words[0])
+                        geometry_identifier = int(words[1]) # get the salome identifier
+                        node_list = [int(word) for word in words[2:]]
+
+                        CorrectSalomeNodeListOrder(node_list, geometry_identifier)
+
+                        geom_entity = GeometricEntity(salome_ID,
+                                                      geometry_identifier,
+                                                      node_list)
+
+                        if geometry_identifier not in geom_entities:
+                            geom_entities[geometry_identifier] = []
+
+                        geom_entities[geometry_identifier].append(geom_entity)
+
+                # only empty lines are allowed after the entities
+                for line in f:
+                    if line.strip():
+                        logging.error('File \"{}\" contains more entities than specified in the header!'.format(file_path))
+                        valid_file = False
+                        break
+
+    except StopIteration:
+        logging.error('File \"{}\" contains less lines than specified in the header!'.format(file_path))
+        valid_file = False
+    except:
+        logging.error('Reading File \"{}\" failed!'.format(file_path))
+        valid_file = False
 
-                for line in lines[1:num_nodes+1]:
-                    words = line.split()
-                    salome_ID = int(words[0])
-                    coords = [float(words[1]), float(words[2]), float(words[3])] # X, Y, Z
-                    nodes.update( {salome_ID : [coords, {}] } )
+    return valid_file, nodes, geom_entities
 
-                geom_entities = {}
 
-                # Read Geometric Objects (Lines, Triangles, Quads, ...)
-                for line in lines[num_nodes+1:]:
-                    words = line.split()
-                    salome_ID = int(words[0])
-                    geometry_identifier = int(words[1]) # get the salome identifier
-                    node_list = []
-                    for i in range(2, len(words)):
-                        node_list.append(int(words[i]))
+def ReadManySalomeDatFiles(file_paths, num_workers=1, start_method=None, **read_options):
+    """This function reads many *.dat files, with "num_workers" > 1 they are read
+    concurrently in a pool of processes
+    "start_method" is the method with which the processes are started (see "multiprocessing"), e.g. "spawn"
+    if the calling process must not be forked (like the GUI, since the processes would inherit the Tk state)
+    The "read_options" are passed to "ReadAndParseSalomeDatFile" (e.g. "use_arrays=True",
+    which is recommended since the results are much faster to transfer btw the processes)
+    The time needed for every file is logged
+    Returns a dict {file_path : (valid_file, nodes, geom_entities)} in the order of the input
+    """
+    start_time = time.time()
+    file_paths = list(dict.fromkeys(file_paths)) # remove duplicates but keep the order
+
+    if num_workers > 1 and len(file_paths) > 1:
+        mp_context = None if start_method is None else multiprocessing.get_context(start_method)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(num_workers, len(file_paths)), mp_context=mp_context) as executor:
+            results = list(executor.map(ReadAndParseSalomeDatFileWithTiming, file_paths, itertools.repeat(read_options)))
+    else:
+        results = [ReadAndParseSalomeDatFileWithTiming(file_path, read_options) for file_path in file_paths]
+
+    results_by_path = {}
+    for file_path, (result, read_time) in zip(file_paths, results):
+        if LOG_TIMING:
+            logging.info(" [TIMING] \"Read {}\" {:.2f} sec".format(os.path.basename(file_path), read_time))
+        results_by_path[file_path] = result
 
-                    CorrectSalomeNodeListOrder(node_list, geometry_identifier)
+    LogTiming("Read {} files".format(len(file_paths)), start_time)
 
-                    geom_entity = GeometricEntity(salome_ID,
-                                                  geometry_identifier,
-                                                  node_list)
+    return results_by_path
 
-                    if geometry_identifier not in geom_entities: # geom entities with this identifier are already existing # TODO don't I have to use .key() here?
-                        geom_entities[geometry_identifier] = []
 
-                    geom_entities[geometry_identifier].append(geom_entity)
+def ReadAndParseSalomeDatFileWithTiming(file_path, read_options):
+    """This function calls "ReadAndParseSalomeDatFile" and measures the time
+    It is used by the worker processes of "ReadManySalomeDatFiles"
+    Returns ((valid_file, nodes, geom_entities), read_time)
+    """
+    start_time = time.time()
+    result = ReadAndParseSalomeDatFile(file_path, **read_options)
+
+    return result, time.time() - start_time
+
+
+def ReadAndParseMappedSalomeDatFile(file_path, use_arrays=False, num_workers=1):
+    """This function reads a *.dat file through a memory map
+    The entities are parsed with "num_workers" processes
+    The result is the same as for "ReadAndParseSalomeDatFile"
+    """
+    valid_file = True
+    nodes = {}
+    geom_entities = {}
+
+    try:
+        with MappedSalomeDatFile(file_path) as dat_file:
+            if dat_file.NumberOfNodes() == 0:
+                logging.error('No nodes in file \"{}\"'.format(file_path))
+                valid_file = False
+
+            if valid_file:
+                nodes = dat_file.ReadNodes()
+                geom_entities = dat_file.ReadGeometricEntities(num_workers=num_workers)
+
+        if valid_file and not use_arrays:
+            nodes, geom_entities = ConvertArraysToObjects(nodes, geom_entities)
     except:
         logging.error('Reading File \"{}\" failed!'.format(file_path))
         valid_file = False
@@ -227,6 +409,343 @@ def ReadAndParseSalomeDatFile(file_path):
     return valid_file, nodes, geom_entities
 
 
+def ScanSalomeDatFile(file_path):
+    """This function scans a *.dat file without parsing the nodes and the geometric entities
+    Only the header and the geometry identifiers of the entities are read
+    Returns (valid_file, num_nodes, geom_entity_counts), where "geom_entity_counts"
+    contains the number of entities per geometry identifier
+    """
+    if not os.path.isfile(file_path):
+        logging.error('File \"{}\" was not found!'.format(file_path))
+
+        return False, 0, {}
+
+    start_time = time.time()
+
+    try:
+        if GetCompression(file_path) is None:
+            with MappedSalomeDatFile(file_path) as dat_file:
+                num_nodes = dat_file.NumberOfNodes()
+                geom_entity_counts = dat_file.NumberOfEntitiesByGeometry()
+        else:
+            with OpenSalomeDatFile(file_path) as f:
+                num_nodes, num_elems = ReadSalomeDatHeader(f)
+                geom_entity_counts = CountSalomeDatEntities(f, num_nodes, num_elems)
+    except:
+        logging.error('Scanning File \"{}\" failed!'.format(file_path))
+
+        return False, 0, {}
+
+    if num_nodes == 0:
+        logging.error('No nodes in file \"{}\"'.format(file_path))
+
+        return False, 0, {}
+
+    LogTiming("Scan \"" + os.path.basename(file_path) + "\"", start_time)
+
+    return True, num_nodes, geom_entity_counts
+
+
+def CountSalomeDatEntities(open_file, num_nodes, num_elems):
+    """This function counts the geometric entities of a *.dat file per geometry identifier
+    The header has to be read already, the node-lines are skipped
+    """
+    for _ in range(num_nodes):
+        next(open_file)
+
+    geom_entity_counts = {}
+    for _ in range(num_elems):
+        geometry_identifier = int(next(open_file).split(None, 2)[1])
+        geom_entity_counts[geometry_identifier] = geom_entity_counts.get(geometry_identifier, 0) + 1
+
+    # only empty lines are allowed after the entities
+    for line in open_file:
+        if line.strip():
+            raise Exception("The file contains more entities than specified in the header!")
+
+    return geom_entity_counts
+
+
+def ConvertArraysToObjects(nodes, geom_entities):
+    """This function converts the nodes and geometric entities that were read
+    with "use_arrays=True" to the dict and the objects of type "GeometricEntity"
+    """
+    geom_entities_objects = {}
+    for geometry_identifier, entities in geom_entities.items():
+        geom_entities_objects[geometry_identifier] = entities.ToGeometricEntities()
+
+    return nodes.ToDict(), geom_entities_objects
+
+
+def GetSalomeDatCachePath(file_path):
+    """This function returns the path of the parse-cache of a *.dat file
+    It is saved next to the file ("<file_path>.npz") or in "DAT_CACHE_DIRECTORY"
+    """
+    if DAT_CACHE_DIRECTORY is None:
+        return file_path + ".npz"
+
+    # the hash of the path prevents clashes of files with the same name in different folders
+    path_hash = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(DAT_CACHE_DIRECTORY, os.path.basename(file_path) + "_" + path_hash + ".npz")
+
+
+def ComputeFileHash(file_path):
+    """This function returns the SHA-1 hash of the content of a file"""
+    file_hash = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(MMAP_CHUNK_SIZE), b""):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+
+def WriteSalomeDatCache(file_path, nodes, geom_entities, file_hash=None):
+    """This function saves the nodes and geometric entities that were read
+    with "use_arrays=True" in the parse-cache of a *.dat file
+    The size, the modification time and the hash of the file are saved too,
+    they are used to check whether the cache is still valid
+    The hash is computed if it is not given
+    """
+    start_time = time.time()
+    cache_path = GetSalomeDatCachePath(file_path)
+    file_stat = os.stat(file_path)
+
+    cache_content = {
+        "version" : np.array(DAT_CACHE_VERSION),
+        "file_size" : np.array(file_stat.st_size),
+        "file_mtime_ns" : np.array(file_stat.st_mtime_ns),
+        "file_hash" : np.array(ComputeFileHash(file_path) if file_hash is None else file_hash),
+        "node_ids" : nodes.GetIds(),
+        "node_coords" : nodes.GetCoordinates(),
+        "geometry_identifiers" : np.array(list(geom_entities.keys()), dtype=np.int64)
+    }
+    for geometry_identifier, entities in geom_entities.items():
+        cache_content["origin_ids_" + str(geometry_identifier)] = entities.GetOriginIDs()
+        cache_content["connectivities_" + str(geometry_identifier)] = entities.GetConnectivities()
+
+    try:
+        if DAT_CACHE_DIRECTORY is not None:
+            os.makedirs(DAT_CACHE_DIRECTORY, exist_ok=True)
+        # write to a temporary file first such that no incomplete cache can be read
+        tmp_cache_path = cache_path + ".tmp"
+        with open(tmp_cache_path, "wb") as cache_file:
+            np.savez(cache_file, **cache_content)
+        os.replace(tmp_cache_path, cache_path)
+    except OSError:
+        logging.warning('Parse-cache \"{}\" could not be written!'.format(cache_path))
+        return
+
+    LogTiming("Write parse-cache of \"" + os.path.basename(file_path) + "\"", start_time)
+
+
+def ReadSalomeDatCache(file_path):
+    """This function loads the parse-cache of a *.dat file
+    The cache is only used if the size of the file did not change
+    and if either the modification time or the hash of the file are the same
+    Returns (nodes, geom_entities) or None if there is no valid cache
+    """
+    cache_path = GetSalomeDatCachePath(file_path)
+    if not os.path.isfile(cache_path):
+        return None
+
+    start_time = time.time()
+    file_stat = os.stat(file_path)
+    file_hash = None
+
+    try:
+        with np.load(cache_path, allow_pickle=False) as cache_content:
+            if int(cache_content["version"]) != DAT_CACHE_VERSION:
+                return None
+            if int(cache_content["file_size"]) != file_stat.st_size:
+                return None
+            # the hash is only computed if the file was touched, this keeps loading fast
+            if int(cache_content["file_mtime_ns"]) != file_stat.st_mtime_ns:
+                file_hash = ComputeFileHash(file_path)
+                if str(cache_content["file_hash"]) != file_hash:
+                    return None
+
+            nodes = NodesArrayMapping(cache_content["node_ids"], cache_content["node_coords"])
+            geom_entities = {}
+            for geometry_identifier in cache_content["geometry_identifiers"].tolist():
+                # the connectivities in the cache are already in the order of Kratos
+                geom_entities[geometry_identifier] = GeometricEntitiesArray(geometry_identifier,
+                                                                            cache_content["origin_ids_" + str(geometry_identifier)],
+                                                                            cache_content["connectivities_" + str(geometry_identifier)])
+    except Exception:
+        logging.warning('Parse-cache \"{}\" could not be read!'.format(cache_path))
+        return None
+
+    LogTiming("Read parse-cache of \"" + os.path.basename(file_path) + "\"", start_time)
+
+    if file_hash is not None:
+        # the file was only touched, the cache is updated such that the hash is not computed again
+        WriteSalomeDatCache(file_path, nodes, geom_entities, file_hash)
+
+    return nodes, geom_entities
+
+
+def ParseSalomeDatLines(data, num_lines, dtype, num_words=None):
+    """This function parses bytes containing "num_lines" lines of a *.dat file
+    Returns an array with one row per line
+    If "num_words" is not given, it is taken from the first line
+    """
+    if num_words is None:
+        first_line_end = data.find(b"\n")
+        if first_line_end == -1:
+            first_line_end = len(data)
+        num_words = len(data[:first_line_end].split())
+
+    if num_lines == 0:
+        return np.empty((0, num_words), dtype=dtype)
+
+    try:
+        # raises if a value cannot be converted or if the lines have different numbers of values
+        values = np.loadtxt(io.BytesIO(data), dtype=dtype, comments=None, ndmin=2)
+    except ValueError as e:
+        raise Exception("Lines could not be parsed! " + str(e))
+    if values.shape != (num_lines, num_words):
+        raise Exception("Lines could not be parsed! Expected {} lines with {} values, got {} lines with {} values".format(
+            num_lines, num_words, values.shape[0], values.shape[1]))
+
+    return values
+
+
+def ParseSalomeDatFileRange(file_path, start, end, num_lines, dtype, num_words=None):
+    """This function reads the bytes [start, end) of a *.dat file and parses them
+    It is used by the worker processes when parsing in parallel
+    """
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    return ParseSalomeDatLines(data, num_lines, dtype, num_words)
+
+
+def GetCompression(file_path):
+    """This function detects whether a file is compressed by checking its first bytes
+    Returns the name of the compression (see "COMPRESSION_MAGIC_BYTES") or None
+    """
+    with open(file_path, "rb") as f:
+        first_bytes = f.read(max([len(magic_bytes) for magic_bytes in COMPRESSION_MAGIC_BYTES]))
+
+    for magic_bytes, compression in COMPRESSION_MAGIC_BYTES.items():
+        if first_bytes.startswith(magic_bytes):
+            return compression
+
+    return None
+
+
+def OpenSalomeDatFile(file_path):
+    """This function opens a *.dat file for reading in text-mode
+    Compressed files are decompressed while they are read
+    """
+    compression = GetCompression(file_path)
+
+    if compression is None:
+        return open(file_path, "r")
+    elif compression == "gzip":
+        return gzip.open(file_path, "rt")
+    elif compression == "xz":
+        return lzma.open(file_path, "rt")
+    elif compression == "bz2":
+        return bz2.open(file_path, "rt")
+    else: # zstd, which is only part of the standard library from Python 3.14 on
+        try:
+            from compression import zstd
+            return zstd.open(file_path, "rt")
+        except ImportError:
+            pass
+        try:
+            import zstandard
+            return zstandard.open(file_path, "rt")
+        except ImportError:
+            logging.error('Reading zstd-compressed file \"{}\" requires Python 3.14 or the "zstandard" package!'.format(file_path))
+            raise
+
+
+def ReadSalomeDatHeader(open_file):
+    """This function reads the header of a *.dat file
+    Returns the number of nodes and the number of geometric entities
+    """
+    words = open_file.readline().split()
+
+    return int(words[0]), int(words[1])
+
+
+def ReadSalomeDatNodeBlock(open_file, num_nodes):
+    """This function parses the next "num_nodes" lines of a *.dat file
+    in bulk and returns them as "NodesArrayMapping"
+    """
+    node_block = np.loadtxt(itertools.islice(open_file, num_nodes), dtype=np.float64, ndmin=2)
+    if node_block.shape[0] != num_nodes:
+        raise StopIteration # the file contains less nodes than specified in the header
+
+    return NodesArrayMapping(node_block[:,0].astype(np.int64), node_block[:,1:4])
+
+
+def ReadSalomeDatEntityBlock(open_file, num_elems):
+    """This function parses the next "num_elems" lines of a *.dat file
+    and returns one "GeometricEntitiesArray" per geometry identifier
+    The values are collected in compact buffers, no object is created per entity
+    """
+    entity_buffers = {} # geometry_identifier : [origin_ID, node_1, ..., node_n, origin_ID, ...]
+    num_words = {} # geometry_identifier : number of words per line
+
+    for _ in range(num_elems):
+        words = next(open_file).split()
+        geometry_identifier = int(words.pop(1))
+
+        if geometry_identifier not in entity_buffers:
+            entity_buffers[geometry_identifier] = array.array('q')
+            num_words[geometry_identifier] = len(words)
+        elif len(words) != num_words[geometry_identifier]:
+            raise Exception("Entities with geometry identifier " + str(geometry_identifier) + " have different numbers of nodes!")
+
+        entity_buffers[geometry_identifier].extend(map(int, words))
+
+    return CreateGeometricEntitiesArrays(entity_buffers, num_words)
+
+
+def CreateGeometricEntitiesArraysFromBlocks(entity_blocks):
+    """This function converts blocks of parsed lines ([origin_ID, geometry_identifier, node_1, ..., node_n])
+    into one "GeometricEntitiesArray" per geometry identifier
+    """
+    geom_entities = {}
+
+    for geometry_identifier, blocks in entity_blocks.items():
+        entity_block = np.concatenate(blocks)
+        origin_IDs = entity_block[:,0].copy()
+        connectivities = np.ascontiguousarray(entity_block[:,2:])
+
+        CorrectSalomeConnectivityOrder(connectivities, geometry_identifier)
+
+        geom_entities[geometry_identifier] = GeometricEntitiesArray(geometry_identifier,
+                                                                    origin_IDs,
+                                                                    connectivities)
+
+    return geom_entities
+
+
+def CreateGeometricEntitiesArrays(entity_buffers, num_words):
+    """This function converts the flat buffers of origin IDs and nodes
+    into one "GeometricEntitiesArray" per geometry identifier
+    """
+    geom_entities = {}
+
+    for geometry_identifier in entity_buffers:
+        entity_block = np.frombuffer(entity_buffers[geometry_identifier], dtype=np.int64).reshape(-1, num_words[geometry_identifier])
+        origin_IDs = entity_block[:,0].copy()
+        connectivities = np.ascontiguousarray(entity_block[:,1:])
+
+        CorrectSalomeConnectivityOrder(connectivities, geometry_identifier)
+
+        geom_entities[geometry_identifier] = GeometricEntitiesArray(geometry_identifier,
+                                                                    origin_IDs,
+                                                                    connectivities)
+
+    return geom_entities
+
+
 # Other Functions
 def GetGeneralInfoDict(Version=None):
     general_info_dict = {}
@@ -262,6 +781,11 @@ def GetEntityType(geometry_identifier):
     return str(geometry_identifier) + "_" + post_string
 
 
+def GetEntityCountString(num_entities):
+    """Returns the number of entities with spaces as thousands separator (e.g. "12 345")"""
+    return "{:,}".format(num_entities).replace(",", " ")
+
+
 def GetSalomeIdentifier(origin_entity):
     return int(origin_entity.split("_")[0])
 
@@ -297,13 +821,22 @@ def CorrectMeshDict(mesh_dict):
 def CorrectSalomeNodeListOrder(salome_node_list, geometry_identifier):
     # This function corrects the order in the node list because for
     # some elements the nodal order is different btw SALOME and Kratos
-    if geometry_identifier == 308: # Hexahedral
-        salome_node_list[1], salome_node_list[3] = salome_node_list[3], salome_node_list[1]
-        salome_node_list[5], salome_node_list[7] = salome_node_list[7], salome_node_list[5]
+    # (see "SALOME_TO_KRATOS_NODE_ORDER")
+    if geometry_identifier in SALOME_TO_KRATOS_NODE_ORDER:
+        salome_node_list[:] = [salome_node_list[i] for i in SALOME_TO_KRATOS_NODE_ORDER[geometry_identifier]]
 
     return salome_node_list
 
 
+def CorrectSalomeConnectivityOrder(connectivities, geometry_identifier):
+    # This function does the same as "CorrectSalomeNodeListOrder" but for all
+    # rows of a connectivity array at once (the array is modified in place)
+    if geometry_identifier in SALOME_TO_KRATOS_NODE_ORDER:
+        connectivities[:] = connectivities[:,SALOME_TO_KRATOS_NODE_ORDER[geometry_identifier]]
+
+    return connectivities
+
+
 def GetDictFromTree(tree):
     dictionary = {"entity_creation" : {}}
 
@@ -354,25 +887,52 @@ def LogTiming(log_info, start_time):
 
 
 
+class EmptyEntityData(collections.abc.Mapping):
+    """
+    This class is the (read-only) entity data of all entities that have no data
+    Only one object of it exists ("EMPTY_ENTITY_DATA"), also after pickling
+    """
+    def __getitem__(self, key):
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(())
+
+    def __len__(self):
+        return 0
+
+    def __str__(self):
+        return "{}"
+
+    __repr__ = __str__
+
+    def __reduce__(self):
+        return "EMPTY_ENTITY_DATA"
+
+EMPTY_ENTITY_DATA = EmptyEntityData()
+
 class GeometricEntity:
     """
     This class is a generic geometric entity
+    It uses "__slots__" and creates the dict for the entity data
+    only when it is needed, since there are many entities
     """
+    __slots__ = ["origin_ID", "geometry_identifier", "node_list", "entity_data"]
+
     def __init__(self, origin_ID, geometry_identifier, node_list, entity_data=None):
         self.origin_ID = origin_ID
         self.geometry_identifier = geometry_identifier
         self.node_list = node_list # The order or nodes has to be compatible with Kratos
         self.entity_data = entity_data # Nodal-, Elemental- or ConditionalData
-        if self.entity_data == None: # this is done bcs default args are shared!
-            self.entity_data = {}
-        self.child_objects = {}
+        if self.entity_data is None: # this is done bcs default args are shared!
+            self.entity_data = EMPTY_ENTITY_DATA
 
     def __str__(self):
         stringbuf = "GeometricEntity | "
         stringbuf += "origin_ID: " + str(self.origin_ID)
         stringbuf += "; geometry_identifier: " + str(self.geometry_identifier)
         stringbuf += "; node_list: " + str(self.node_list)
-        stringbuf += "; entity_data: " + str(self.entity_data)
+        stringbuf += "; entity_data: " + str(dict(self.entity_data))
         return stringbuf
 
     __repr__ = __str__
@@ -401,32 +961,19 @@ class GeometricEntity:
         return self.entity_data
 
     def SetEntityData(self, data_name, data_value):
+        if self.entity_data is EMPTY_ENTITY_DATA:
+            self.entity_data = {}
         self.entity_data[data_name] = data_value
 
     def GetGeometryIdentifier(self):
         return self.geometry_identifier
 
-    def GetChildObject(self, name_entity, class_object, propID):
-        """
-        This function checks if it already has a child of the
-        requested name. If not, it creates one and returns it.
-        This is needed if elements or conditions belong to separate
-        SubModelParts in order to not create them multiple times
-        """
-        if name_entity not in self.child_objects.keys():
-            self.child_objects[name_entity] = class_object(self, name_entity, propID)
-
-        return self.child_objects[name_entity]
-
-    def ClearChildObjects(self):
-        self.child_objects = {}
-
     def Serialize(self):
         """ This function serializes the object """
         serialized_entity = [self.origin_ID,
                              self.geometry_identifier,
                              self.node_list,
-                             self.entity_data]
+                             dict(self.entity_data)]
 
         return serialized_entity
 
@@ -440,6 +987,8 @@ class GeometricEntity:
         geometry_identifier = serialized_entity[1]
         node_list           = serialized_entity[2]
         entity_data         = serialized_entity[3]
+        if len(entity_data) == 0:
+            entity_data = None # use the shared empty entity data
 
         geom_entity = GeometricEntity(origin_ID,
                                       geometry_identifier,
@@ -447,3 +996,419 @@ class GeometricEntity:
                                       entity_data)
 
         return geom_entity
+
+
+
+class NodesArrayMapping(collections.abc.Mapping):
+    """
+    This class stores the nodes in an ID-array and a coordinate-array
+    It exposes them in the same way as the nodes-dict that is used
+    throughout the converter ({ID : [[X, Y, Z], nodal_data]})
+    """
+    def __init__(self, ids, coords):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.coords = np.asarray(coords, dtype=np.float64).reshape(-1,3)
+        if self.ids.shape[0] != self.coords.shape[0]:
+            raise Exception("Number of IDs and number of coordinates do not match!")
+
+        # the nodes are ordered in the file, only sort if this is not the case
+        if np.all(self.ids[1:] > self.ids[:-1]):
+            self.sort_order = None
+            self.sorted_ids = self.ids
+        else:
+            self.sort_order = np.argsort(self.ids, kind="stable")
+            self.sorted_ids = self.ids[self.sort_order]
+
+        self.nodal_data = {} # only for nodes that have nodal_data
+
+    def __str__(self):
+        return "NodesArrayMapping | number of nodes: " + str(len(self))
+
+    __repr__ = __str__
+
+    def __getitem__(self, node_ID):
+        # for nodes without nodal_data an empty dict is returned, which is not stored (see "SetNodalData")
+        index = self.GetIndex(node_ID)
+        return [self.coords[index].tolist(), self.nodal_data.get(node_ID, {})]
+
+    def __contains__(self, node_ID):
+        try:
+            self.GetIndex(node_ID)
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        return iter(self.ids.tolist())
+
+    def __len__(self):
+        return self.ids.shape[0]
+
+    def SetNodalData(self, node_ID, data_name, data_value):
+        self.GetIndex(node_ID) # raises if the node does not exist
+        self.nodal_data.setdefault(node_ID, {})[data_name] = data_value
+
+    def GetIndex(self, node_ID):
+        """ This function returns the position of a node in the arrays """
+        position = np.searchsorted(self.sorted_ids, node_ID)
+        if position == self.sorted_ids.shape[0] or self.sorted_ids[position] != node_ID:
+            raise KeyError(node_ID)
+        if self.sort_order is None:
+            return int(position)
+        return int(self.sort_order[position])
+
+    def GetIds(self):
+        return self.ids
+
+    def GetCoordinates(self):
+        return self.coords
+
+    def GetNodalDataByIndex(self):
+        """ Returns the non-empty nodal_data as {position of the node : nodal_data} """
+        return {self.GetIndex(node_ID) : nodal_data for node_ID, nodal_data in self.nodal_data.items() if len(nodal_data) > 0}
+
+    def ToDict(self):
+        """ This function returns the nodes as dict ({ID : [[X, Y, Z], nodal_data]}) """
+        return {node_ID : [coords, self.nodal_data.get(node_ID, {})]
+                for node_ID, coords in zip(self.ids.tolist(), self.coords.tolist())}
+
+
+class GeometricEntitiesArray:
+    """
+    This class stores all geometric entities with the same geometry identifier
+    in columnar form: one array with the origin IDs and one connectivity array
+    with one row per entity. It is the array-based counterpart of a list
+    of objects of type "GeometricEntity"
+    """
+    def __init__(self, geometry_identifier, origin_IDs, connectivities, entity_data=None):
+        self.geometry_identifier = geometry_identifier
+        self.origin_IDs = np.asarray(origin_IDs, dtype=np.int64)
+        self.connectivities = np.asarray(connectivities, dtype=np.int64) # The order or nodes has to be compatible with Kratos
+        if self.connectivities.ndim != 2 or self.connectivities.shape[0] != self.origin_IDs.shape[0]:
+            raise Exception("The connectivities have to be provided with one row per entity!")
+        self.entity_data = entity_data # Row : Nodal-, Elemental- or ConditionalData
+        if self.entity_data == None: # this is done bcs default args are shared!
+            self.entity_data = {}
+
+    def __str__(self):
+        stringbuf = "GeometricEntitiesArray | "
+        stringbuf += "geometry_identifier: " + str(self.geometry_identifier)
+        stringbuf += "; number of entities: " + str(len(self))
+        return stringbuf
+
+    __repr__ = __str__
+
+    def __len__(self):
+        return self.origin_IDs.shape[0]
+
+    def __eq__(self, Other):
+        if not isinstance(Other, GeometricEntitiesArray):
+            return False
+        if self.geometry_identifier != Other.geometry_identifier:
+            return False
+        if not np.array_equal(self.origin_IDs, Other.origin_IDs):
+            return False
+        if not np.array_equal(self.connectivities, Other.connectivities):
+            return False
+        if self.entity_data != Other.entity_data:
+            return False
+        return True
+
+    def GetOriginIDs(self):
+        return self.origin_IDs
+
+    def GetConnectivities(self):
+        return self.connectivities
+
+    def GetGeometryIdentifier(self):
+        return self.geometry_identifier
+
+    def GetGeometricEntity(self, row):
+        """ This function returns one row as object of type "GeometricEntity" """
+        return GeometricEntity(int(self.origin_IDs[row]),
+                               self.geometry_identifier,
+                               self.connectivities[row].tolist(),
+                               self.entity_data.get(row))
+
+    def ToGeometricEntities(self):
+        """ This function returns all rows as list of objects of type "GeometricEntity" """
+        return [GeometricEntity(origin_ID, self.geometry_identifier, node_list, self.entity_data.get(row))
+                for row, (origin_ID, node_list) in enumerate(zip(self.origin_IDs.tolist(), self.connectivities.tolist()))]
+
+    def HasEntityData(self):
+        return len(self.entity_data) > 0
+
+    def GetEntityData(self):
+        return self.entity_data
+
+    def SetEntityData(self, row, data_name, data_value):
+        if row not in self.entity_data:
+            self.entity_data[row] = {}
+        self.entity_data[row][data_name] = data_value
+
+    def Serialize(self):
+        """
+        This function serializes the entities in the same format as
+        "GeometricEntity.Serialize", such that the saved files are
+        independent of how the entities were stored
+        """
+        return [self.GetGeometricEntity(row).Serialize() for row in range(len(self))]
+
+
+class MappedSalomeDatFile:
+    """
+    This class provides access to a *.dat file through a memory map
+    When it is constructed, a compact index of the file is built:
+    - the byte offsets of every "MMAP_WINDOW_SIZE"-th line of the node- and the entity-block
+    - the runs of consecutive entities with the same geometry identifier
+    Afterwards ranges of the file (e.g. the entities of one geometry identifier)
+    are parsed in windows of "MMAP_WINDOW_SIZE" lines, the whole text is never materialized
+    """
+    def __init__(self, file_path, window_size=None):
+        self.file_path = file_path
+        self.window_size = window_size
+        if self.window_size is None:
+            self.window_size = MMAP_WINDOW_SIZE
+
+        self.file = open(file_path, "rb")
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.__BuildIndex()
+        except:
+            self.Close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.Close()
+
+    def Close(self):
+        if getattr(self, "map", None) is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    def NumberOfNodes(self):
+        return self.num_nodes
+
+    def NumberOfEntities(self):
+        return self.num_elems
+
+    def GetGeometryIdentifiers(self):
+        """ Returns the geometry identifiers in the order of their first appearance """
+        geometry_identifiers = []
+        for geometry_identifier in self.entity_runs[:,0].tolist():
+            if geometry_identifier not in geometry_identifiers:
+                geometry_identifiers.append(geometry_identifier)
+        return geometry_identifiers
+
+    def NumberOfEntitiesByGeometry(self):
+        """ Returns the number of entities for each geometry identifier """
+        run_lengths = np.diff(np.append(self.entity_runs[:,1], self.num_elems))
+        counts = {}
+        for geometry_identifier, run_length in zip(self.entity_runs[:,0].tolist(), run_lengths.tolist()):
+            counts[geometry_identifier] = counts.get(geometry_identifier, 0) + run_length
+        return counts
+
+    def ReadNodes(self):
+        """ This function parses the node-block window by window and returns a "NodesArrayMapping" """
+        node_blocks = []
+        window_starts = list(range(0, self.num_nodes, self.window_size))
+
+        for i, first_line in enumerate(window_starts):
+            num_lines = min(self.window_size, self.num_nodes - first_line)
+            start = self.node_window_offsets[i]
+            if i+1 < len(window_starts):
+                end = self.node_window_offsets[i+1]
+            else:
+                end = self.node_block_end
+            node_blocks.append(ParseSalomeDatLines(self.map[start:end], num_lines, np.float64, 4))
+
+        if len(node_blocks) == 0:
+            return NodesArrayMapping(np.empty(0, dtype=np.int64), np.empty((0,3)))
+
+        node_block = np.concatenate(node_blocks)
+        return NodesArrayMapping(node_block[:,0].astype(np.int64), node_block[:,1:4])
+
+    def ReadGeometricEntities(self, geometry_identifiers=None, num_workers=1):
+        """ This function parses the entity-block (or only the entities with the
+        given geometry identifiers) window by window
+        With "num_workers" > 1 the windows are parsed in a pool of processes,
+        the result is identical to the one of the serial version
+        Returns one "GeometricEntitiesArray" per geometry identifier
+        """
+        if geometry_identifiers is None:
+            geometry_identifiers = self.GetGeometryIdentifiers()
+
+        windows = [] # [geometry_identifier, start, end, num_lines]
+        for geometry_identifier, first_line, last_line in self.__GetRuns():
+            if geometry_identifier in geometry_identifiers:
+                windows.extend(self.__GetEntityWindows(geometry_identifier, first_line, last_line))
+
+        if num_workers > 1 and len(windows) > 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers) as executor:
+                # "map" returns the results in the order of the windows
+                blocks = list(executor.map(ParseSalomeDatFileRange,
+                                           itertools.repeat(self.file_path),
+                                           [window[1] for window in windows],
+                                           [window[2] for window in windows],
+                                           [window[3] for window in windows],
+                                           itertools.repeat(np.int64)))
+        else:
+            blocks = [ParseSalomeDatLines(self.map[start:end], num_lines, np.int64) for _, start, end, num_lines in windows]
+
+        entity_blocks = {} # geometry_identifier : [blocks]
+        for window, block in zip(windows, blocks):
+            geometry_identifier = window[0]
+            if not np.all(block[:,1] == geometry_identifier):
+                raise Exception('Entities in the range of geometry identifier {} in file \"{}\" have a different geometry identifier!'.format(geometry_identifier, self.file_path))
+            if geometry_identifier not in entity_blocks:
+                entity_blocks[geometry_identifier] = []
+            entity_blocks[geometry_identifier].append(block)
+
+        return CreateGeometricEntitiesArraysFromBlocks(entity_blocks)
+
+    def __GetRuns(self):
+        """ Returns the runs as (geometry_identifier, first_line, last_line) """
+        run_ends = np.append(self.entity_runs[1:,1], self.num_elems).tolist()
+        return zip(self.entity_runs[:,0].tolist(), self.entity_runs[:,1].tolist(), run_ends)
+
+    def __GetEntityWindows(self, geometry_identifier, first_line, last_line):
+        """ Splits the lines [first_line, last_line) of the entity-block, that all have the
+        same geometry identifier, into windows at the multiples of "window_size"
+        """
+        windows = []
+        window_start = first_line
+        while window_start < last_line:
+            window_end = min((window_start // self.window_size + 1) * self.window_size, last_line)
+            windows.append([geometry_identifier,
+                            self.__GetEntityLineOffset(window_start),
+                            self.__GetEntityLineOffset(window_end),
+                            window_end - window_start])
+            window_start = window_end
+        return windows
+
+    def __GetEntityLineOffset(self, line):
+        """ Returns the byte offset of a line of the entity-block, this
+        works only for the lines at the boundaries of windows and runs
+        """
+        if line == self.num_elems:
+            return self.entity_block_end
+        if line % self.window_size == 0:
+            return int(self.entity_window_offsets[line // self.window_size])
+        run_index = np.searchsorted(self.entity_runs[:,1], line)
+        if self.entity_runs[run_index,1] != line:
+            raise Exception("Line " + str(line) + " is not indexed!")
+        return int(self.entity_runs[run_index,2])
+
+    def __BuildIndex(self):
+        """ This function scans the file once and creates the index """
+        header_end = self.map.find(b"\n")
+        if header_end == -1:
+            header_end = len(self.map)
+        words = self.map[:header_end].split()
+        self.num_nodes = int(words[0])
+        self.num_elems = int(words[1])
+
+        # Node-block
+        self.node_window_offsets = np.empty((self.num_nodes + self.window_size - 1) // self.window_size, dtype=np.int64)
+        line_counter = 0
+        position = header_end + 1
+        for line_starts, line_ends in self.__IterateLines(position, self.num_nodes):
+            self.__AddWindowOffsets(self.node_window_offsets, line_counter, line_starts)
+            line_counter += line_starts.shape[0]
+            position = int(line_ends[-1]) + 1
+        self.node_block_end = min(position, len(self.map))
+
+        # Entity-block
+        self.entity_window_offsets = np.empty((self.num_elems + self.window_size - 1) // self.window_size, dtype=np.int64)
+        entity_runs = [] # [geometry_identifier, first_line, byte_offset]
+        line_counter = 0
+        for line_starts, line_ends in self.__IterateLines(position, self.num_elems):
+            self.__AddWindowOffsets(self.entity_window_offsets, line_counter, line_starts)
+
+            geometry_identifiers = self.__GetGeometryIdentifiers(line_starts, line_ends)
+            run_starts = np.flatnonzero(np.diff(geometry_identifiers)) + 1
+            if len(entity_runs) == 0 or entity_runs[-1][0] != geometry_identifiers[0]:
+                run_starts = np.insert(run_starts, 0, 0)
+            for run_start in run_starts.tolist():
+                entity_runs.append([int(geometry_identifiers[run_start]), line_counter + run_start, int(line_starts[run_start])])
+
+            line_counter += line_starts.shape[0]
+            position = int(line_ends[-1]) + 1
+        self.entity_block_end = min(position, len(self.map))
+        self.entity_runs = np.array(entity_runs, dtype=np.int64).reshape(-1,3)
+
+        # only whitespace is allowed after the entities
+        if self.map[self.entity_block_end:].strip():
+            raise Exception('File \"{}\" contains more entities than specified in the header!'.format(self.file_path))
+
+    def __AddWindowOffsets(self, window_offsets, line_counter, line_starts):
+        """ Stores the byte offset of every line that starts a window """
+        first = (-line_counter) % self.window_size
+        window_lines = line_starts[first::self.window_size]
+        first_window = (line_counter + first) // self.window_size
+        window_offsets[first_window:first_window + window_lines.shape[0]] = window_lines
+
+    def __IterateLines(self, position, num_lines):
+        """ Yields the start- and the end-positions of the next "num_lines" lines
+        The file is scanned in chunks of "MMAP_CHUNK_SIZE" bytes
+        """
+        file_size = len(self.map)
+        while num_lines > 0:
+            if position >= file_size:
+                raise Exception('File \"{}\" contains less lines than specified in the header!'.format(self.file_path))
+            count = min(MMAP_CHUNK_SIZE, file_size - position)
+            chunk = np.frombuffer(self.map, dtype=np.uint8, count=count, offset=position)
+            line_ends = np.flatnonzero(chunk == 10)[:num_lines] + position
+            del chunk # the memory map can only be closed if no array uses its buffer
+
+            if position + count == file_size and line_ends.shape[0] < num_lines:
+                line_ends = np.append(line_ends, file_size) # the last line has no line break
+
+            if line_ends.shape[0] == 0: # the line is longer than a chunk
+                raise Exception('File \"{}\" contains lines longer than {} bytes!'.format(self.file_path, MMAP_CHUNK_SIZE))
+
+            line_starts = np.empty_like(line_ends)
+            line_starts[0] = position
+            line_starts[1:] = line_ends[:-1] + 1
+
+            yield line_starts, line_ends
+
+            num_lines -= line_ends.shape[0]
+            position = int(line_ends[-1]) + 1
+
+    def __GetGeometryIdentifiers(self, line_starts, line_ends):
+        """ Returns the geometry identifier (second number) of each line """
+        first = int(line_starts[0])
+        count = int(line_ends[-1]) - first
+        chunk = np.frombuffer(self.map, dtype=np.uint8, count=count, offset=first)
+        local_starts = line_starts - first
+        local_ends = line_ends - first
+
+        # Vectorized version for lines like "ID GEOMETRY_IDENTIFIER NODE_1 ...", i.e. single spaces and no leading whitespace
+        space_positions = np.flatnonzero(chunk == 32)
+        first_space = np.searchsorted(space_positions, local_starts)
+        geometry_identifiers = None
+        if first_space.shape[0] == 0 or first_space[-1] + 1 < space_positions.shape[0]:
+            identifier_starts = space_positions[first_space] + 1
+            identifier_ends = space_positions[first_space + 1]
+            lengths = identifier_ends - identifier_starts
+            if np.all((identifier_starts > local_starts + 1) & (lengths > 0) & (lengths < 5) & (identifier_ends < local_ends)):
+                geometry_identifiers = np.zeros(line_starts.shape[0], dtype=np.int64)
+                valid = True
+                for i in range(int(np.max(lengths, initial=0))):
+                    has_digit = lengths > i
+                    digits = chunk[np.where(has_digit, identifier_starts + i, 0)].astype(np.int64) - 48
+                    valid = valid and bool(np.all((digits[has_digit] >= 0) & (digits[has_digit] <= 9)))
+                    geometry_identifiers = np.where(has_digit, geometry_identifiers*10 + digits, geometry_identifiers)
+                if not valid:
+                    geometry_identifiers = None
+
+        if geometry_identifiers is None: # Fallback for other formattings
+            geometry_identifiers = np.array([int(self.map[start:end].split()[1]) for start, end in zip(line_starts.tolist(), line_ends.tolist())], dtype=np.int64)
+
+        del chunk # the memory map can only be closed if no array uses its buffer
+        return geometry_identifiers
@@ -17,12 +17,39 @@ Intended for non-commercial use in research
 '''
 
 # Python imports
+import io
+import os
 import time
+import gzip
+import lzma
+import queue
+import itertools
+import threading
+import collections
+import collections.abc
+import contextlib
+import multiprocessing
+import concurrent.futures
+
+# Third party imports
+import numpy as np
 
 # Project imports
 import global_utilities as global_utils
 
 READABLE_MDPA = False
+NODE_ITERATION_CHUNK_SIZE = 4096 # number of node IDs that are converted at once when iterating a NodeStore
+
+# Compressed mdpa files, the compression is also determined from the file extension (e.g. "mesh.mdpa.gz")
+MDPA_COMPRESSION_EXTENSIONS = {
+        "gzip" : ".gz",
+        "xz" : ".xz"
+}
+COMPRESSION_LEVELS = { # presets that are used for gzip and xz
+        "fast" : 1,
+        "default" : 6,
+        "best" : 9
+}
 
 
 def CreateNode(node_id, coords, nodal_data={}):
@@ -35,6 +62,353 @@ def CreateNode(node_id, coords, nodal_data={}):
         raise Exception("The NodeCoords have to consist of three doubles!")
     return [coords, nodal_data]
 
+def CheckCoordinatesOfDuplicatedNodes(node_IDs, existing_coords, new_coords):
+    """Raises if nodes with the same ID have different coordinates
+    All nodes are compared at once and all offending nodes are reported
+    """
+    different_coords = np.flatnonzero(np.any(existing_coords != new_coords, axis=1))
+    if different_coords.shape[0] > 0:
+        offending_IDs = np.asarray(node_IDs)[different_coords].tolist()
+        err_msg  = str(len(set(offending_IDs))) + " node(s) already exist with different coordinates, IDs: "
+        err_msg += str(sorted(set(offending_IDs))) + "\n"
+        for node_ID, existing_node_coords, new_node_coords in zip(offending_IDs,
+                                                                  existing_coords[different_coords].tolist(),
+                                                                  new_coords[different_coords].tolist()):
+            err_msg += "Node with ID " + str(node_ID) + " already exists with different coordinates!\n"
+            err_msg += "\tExisting Coords: [" + str(existing_node_coords[0]) + " , "
+            err_msg += str(existing_node_coords[1]) + " , "
+            err_msg += str(existing_node_coords[2]) + "]\n"
+            err_msg += "\tNew Coords: [" + str(new_node_coords[0]) + " , "
+            err_msg += str(new_node_coords[1]) + " , "
+            err_msg += str(new_node_coords[2]) + "]\n"
+        raise ValueError(err_msg)
+
+def FindCoincidentNodes(coords, tolerance):
+    """Returns for every node the index of the node it is merged with
+    Nodes whose distance is not larger than "tolerance" are merged, also transitively
+    (A close to B close to C). The nodes of a group are merged with the node with the
+    smallest index. The nodes are sorted into a grid with a cell size of "tolerance",
+    such that only the nodes in neighboring cells have to be compared
+    """
+    if tolerance <= 0.0:
+        raise Exception("The tolerance for merging nodes has to be larger than 0!")
+
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1,3)
+    num_nodes = coords.shape[0]
+    if num_nodes == 0:
+        return np.arange(0)
+
+    # The cells are numbered consecutively, such that the numbers of the neighboring
+    # cells of sorted cells are also sorted. For very large grids the numbers overflow,
+    # this only leads to more node pairs that are checked
+    cells = np.floor(coords / tolerance).astype(np.int64)
+    cells -= np.min(cells, axis=0)
+    num_cells = [int(max_cell) + 3 for max_cell in np.max(cells, axis=0)] # with space for the neighbors
+    cell_numbers = (cells[:,0] * num_cells[1] + cells[:,1]) * num_cells[2] + cells[:,2]
+
+    sort_order = np.argsort(cell_numbers, kind="stable")
+    sorted_cell_numbers = cell_numbers[sort_order]
+
+    pairs_i = []
+    pairs_j = []
+    for offset in np.ndindex(3, 3, 3):
+        offset = (offset[0] - 1, offset[1] - 1, offset[2] - 1)
+        if offset < (0, 0, 0):
+            continue # the pairs with these neighbors are found from the other side
+
+        offset_number = (offset[0] * num_cells[1] + offset[1]) * num_cells[2] + offset[2]
+        offset_number = (offset_number + 2**63) % 2**64 - 2**63
+        neighbor_cell_numbers = sorted_cell_numbers + np.int64(offset_number)
+        first = np.searchsorted(sorted_cell_numbers, neighbor_cell_numbers, side="left")
+        last = np.searchsorted(sorted_cell_numbers, neighbor_cell_numbers, side="right")
+        counts = last - first
+        if np.sum(counts) == 0:
+            continue
+
+        # all pairs of a node and the nodes in the neighboring cell
+        nodes_i = np.repeat(sort_order, counts)
+        positions = np.arange(nodes_i.shape[0]) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(first, counts)
+        nodes_j = sort_order[positions]
+
+        if offset == (0, 0, 0):
+            is_candidate = nodes_i < nodes_j
+            nodes_i = nodes_i[is_candidate]
+            nodes_j = nodes_j[is_candidate]
+        is_close = np.sum((coords[nodes_i] - coords[nodes_j])**2, axis=1) <= tolerance**2
+        pairs_i.append(nodes_i[is_close])
+        pairs_j.append(nodes_j[is_close])
+
+    merged_with = np.arange(num_nodes)
+    if len(pairs_i) == 0:
+        return merged_with
+    pairs_i = np.concatenate(pairs_i)
+    pairs_j = np.concatenate(pairs_j)
+
+    # connected components, each node points to the smallest index of its group
+    while True:
+        previous = merged_with.copy()
+        np.minimum.at(merged_with, pairs_i, merged_with[pairs_j])
+        np.minimum.at(merged_with, pairs_j, merged_with[pairs_i])
+        merged_with = merged_with[merged_with]
+        if np.array_equal(merged_with, previous):
+            return merged_with
+
+def FormatRoundedFloats(values, precision):
+    """Returns the values as strings, the same as "[str(round(value, precision)) for value in values]"
+    For values with at most 15 significant digits after rounding (and no exponent in the
+    string) this is the fixed-point string without trailing zeros, which is much faster
+    """
+    values = np.asarray(values, dtype=np.float64)
+    abs_values = np.abs(values)
+    is_fixed_point = (abs_values == 0.0) | ((abs_values >= 1e-4) & (abs_values < 10.0**(15-precision)))
+
+    fixed_point_format = "%." + str(precision) + "f"
+    if precision > 0 and np.any(is_fixed_point):
+        strings = [string.rstrip("0") for string in map(fixed_point_format.__mod__, values.tolist())]
+        strings = [string + "0" if string[-1] == "." else string for string in strings]
+        for i in np.flatnonzero(~is_fixed_point).tolist():
+            strings[i] = str(round(float(values[i]), precision))
+        return strings
+
+    return [str(round(value, precision)) for value in values.tolist()]
+
+def CreateRowFormatter(num_nodes, property_ID, readable_mdpa, ID_width=0, property_width=0, write_origin_IDs=False):
+    """Returns a function that formats the line of an entity with "num_nodes" nodes and the property "property_ID"
+    The function takes the new ID, the node IDs and the origin ID (only with "write_origin_IDs")
+    and returns the line including the line break
+    """
+    if readable_mdpa:
+        line_format = "{:>" + str(ID_width) + "} " + str(property_ID).rjust(property_width) + "\t{}" * num_nodes
+    else:
+        line_format = "{} " + str(property_ID) + " {}" * num_nodes
+    if write_origin_IDs:
+        line_format += " // {}" # add the origin ID
+
+    return (line_format + "\n").format
+
+_WRITE_SECTIONS = [] # the sections that are rendered by the workers, see "WriteSections"
+
+def _RenderWriteSection(index):
+    write_function, args = _WRITE_SECTIONS[index]
+    buffer = io.StringIO()
+    write_function(buffer, *args)
+    return buffer.getvalue()
+
+def CreateSectionsExecutor(sections, num_workers):
+    """Returns the pool of workers that renders the sections in "WriteSections"
+    The processes are forked when the pool is created, such that they can use the sections (and with them
+    the ModelPart) without pickling them. Forking while other threads are running can leave locks of these
+    threads acquired in the processes, therefore the pool has to be created before threads are started
+    (e.g. by "BufferedFileWriter" or "BlockCompressedFileWriter"). Where forking is not available or if other
+    threads are already running, a pool of threads is used
+    """
+    global _WRITE_SECTIONS
+    _WRITE_SECTIONS = sections # has to be set before the processes are forked
+
+    if "fork" in multiprocessing.get_all_start_methods() and threading.active_count() == 1:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context("fork"))
+        executor.submit(int).result() # the processes are forked when the first task is submitted
+        return executor
+
+    return concurrent.futures.ThreadPoolExecutor(max_workers=num_workers)
+
+def WriteSections(open_file, sections, num_workers=1, max_pending_sections=16, executor=None):
+    """Writes the sections of a file in order, a section is either a string or a tuple
+    (write_function, args), which is called as "write_function(open_file, *args)"
+    With "num_workers" > 1 the sections are rendered into buffers in a pool of workers and written
+    in order, the output is the same as when they are written one after another
+    At most "max_pending_sections" sections are rendered or waiting to be written at the same time,
+    which bounds the memory used by the buffers
+    The pool is either given as "executor" (created with "CreateSectionsExecutor" for the same sections)
+    or created here, see "CreateSectionsExecutor"
+    """
+    if num_workers <= 1:
+        for section in sections:
+            if isinstance(section, str):
+                open_file.write(section)
+            else:
+                write_function, args = section
+                write_function(open_file, *args)
+        return
+
+    if executor is None:
+        with CreateSectionsExecutor(sections, num_workers) as executor:
+            return WriteSections(open_file, sections, num_workers, max_pending_sections, executor)
+
+    global _WRITE_SECTIONS
+    try:
+        pending_sections = collections.deque() # strings or futures, in the order of the sections
+        next_index = 0
+        while next_index < len(sections) or len(pending_sections) > 0:
+            while next_index < len(sections) and len(pending_sections) < max(max_pending_sections, 1):
+                if isinstance(sections[next_index], str):
+                    pending_sections.append(sections[next_index])
+                else:
+                    pending_sections.append(executor.submit(_RenderWriteSection, next_index))
+                next_index += 1
+
+            section = pending_sections.popleft()
+            if isinstance(section, str):
+                open_file.write(section)
+            else:
+                open_file.write(section.result())
+    finally:
+        _WRITE_SECTIONS = []
+
+def GetMdpaFilePath(file_path, compression=None):
+    """Returns the path of the mdpa file and its compression (see "MDPA_COMPRESSION_EXTENSIONS")
+    The compression is either given or determined from the extension of the path, e.g. ".mdpa.gz"
+    """
+    for compression_name, extension in MDPA_COMPRESSION_EXTENSIONS.items():
+        if file_path.endswith(".mdpa" + extension):
+            if compression is not None and compression != compression_name:
+                raise Exception('The compression "{}" does not match the file \"{}\"!'.format(compression, file_path))
+            return file_path, compression_name
+
+    if compression is not None and compression not in MDPA_COMPRESSION_EXTENSIONS:
+        raise Exception('Unknown compression "{}", available are: {}'.format(compression, sorted(MDPA_COMPRESSION_EXTENSIONS.keys())))
+
+    if not file_path.endswith(".mdpa"):
+        file_path += ".mdpa"
+    if compression is not None:
+        file_path += MDPA_COMPRESSION_EXTENSIONS[compression]
+
+    return file_path, compression
+
+def OpenMdpaFile(file_path, compression=None, compression_level="default", num_workers=1):
+    """Opens the mdpa file for writing in text-mode, with "compression" the text is compressed while it is written
+    "compression_level" is one of the presets in "COMPRESSION_LEVELS" or the level (gzip) / preset (xz) itself
+    With "num_workers" > 1 the text is compressed in blocks in parallel, see "BlockCompressedFileWriter"
+    """
+    if compression is None:
+        return open(file_path, "w")
+
+    level = COMPRESSION_LEVELS.get(compression_level, compression_level)
+    if num_workers > 1:
+        return BlockCompressedFileWriter(file_path, compression, level, num_workers)
+    elif compression == "gzip":
+        return gzip.open(file_path, "wt", compresslevel=level)
+    elif compression == "xz":
+        return lzma.open(file_path, "wt", preset=level)
+    else:
+        raise Exception('Unknown compression "{}"'.format(compression))
+
+def SortedUnique(values):
+    """Same as "np.unique(values)" for integer arrays, but much faster for large arrays
+    (np.unique uses a hash table for integers in recent versions of numpy)
+    """
+    values = np.sort(values, axis=None)
+    if values.shape[0] == 0:
+        return values
+    return values[np.append(True, values[1:] != values[:-1])]
+
+def GetNodeAdjacency(connectivities, num_nodes):
+    """Returns the pairs of nodes (indices) that are connected by an entity
+    "connectivities" is a list of arrays with one row per entity (with node indices)
+    Every pair is contained once in each direction, sorted by the first node
+    """
+    adjacency_keys = [np.empty(0, dtype=np.int64)]
+    for connectivity in connectivities:
+        num_entity_nodes = connectivity.shape[1]
+        for i in range(num_entity_nodes):
+            for j in range(num_entity_nodes):
+                if i != j:
+                    adjacency_keys.append(connectivity[:,i] * num_nodes + connectivity[:,j])
+    adjacency_keys = SortedUnique(np.concatenate(adjacency_keys))
+    adjacency_i, adjacency_j = np.divmod(adjacency_keys, num_nodes)
+    is_self_loop = adjacency_i == adjacency_j
+    return adjacency_i[~is_self_loop], adjacency_j[~is_self_loop]
+
+def ComputeBandwidth(adjacency_i, adjacency_j, new_indices=None):
+    """Returns the bandwidth (largest index difference of connected nodes) of the adjacency"""
+    if adjacency_i.shape[0] == 0:
+        return 0
+    if new_indices is not None:
+        adjacency_i = new_indices[adjacency_i]
+        adjacency_j = new_indices[adjacency_j]
+    return int(np.max(np.abs(adjacency_i - adjacency_j)))
+
+def ReverseCuthillMcKee(num_nodes, adjacency_i, adjacency_j):
+    """Returns the order of the nodes (indices) that reduces the bandwidth of the adjacency
+    The Cuthill-McKee ordering is done by levels (breadth first search), where the neighbors
+    of a node are visited in order of increasing degree. Each connected component is started
+    from a pseudo-peripheral node. Nodes without neighbors are put at the end in their original order
+    """
+    degrees = np.bincount(adjacency_i, minlength=num_nodes)
+
+    # CSR adjacency, the neighbors of each node are sorted by degree (the adjacency is sorted by the first node)
+    sort_order = np.argsort(adjacency_i * (np.max(degrees, initial=0) + 1) + degrees[adjacency_j], kind="stable")
+    neighbors = adjacency_j[sort_order]
+    neighbors_begin = np.concatenate(([0], np.cumsum(degrees)))
+
+    def GetLevels(start_node, is_visited):
+        """Breadth first search, the order of the nodes within a level follows the order of their parents"""
+        levels = [np.array([start_node])]
+        is_visited[start_node] = True
+        while True:
+            level = levels[-1]
+            counts = degrees[level]
+            positions = np.arange(np.sum(counts)) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(neighbors_begin[level], counts)
+            next_level = neighbors[positions]
+            next_level = next_level[~is_visited[next_level]]
+            _, first_occurrence = np.unique(next_level, return_index=True)
+            next_level = next_level[np.sort(first_occurrence)]
+            if next_level.shape[0] == 0:
+                return levels
+            is_visited[next_level] = True
+            levels.append(next_level)
+
+    is_visited = degrees == 0
+    order = []
+    for node in np.argsort(degrees, kind="stable").tolist():
+        if is_visited[node]:
+            continue
+
+        # Search for a pseudo-peripheral node (George & Liu)
+        # Each search visits the same component, only its nodes are reset before the next search
+        start_node = node
+        levels = GetLevels(start_node, is_visited)
+        while True:
+            last_level = levels[-1]
+            candidate = int(last_level[np.argmin(degrees[last_level])])
+            is_visited[np.concatenate(levels)] = False
+            candidate_levels = GetLevels(candidate, is_visited)
+            if len(candidate_levels) <= len(levels):
+                break
+            start_node, levels = candidate, candidate_levels
+
+        # the nodes of the component are marked as visited by the last search
+        order.extend(levels)
+
+    order = np.concatenate([np.empty(0, dtype=np.int64)] + order)
+    return np.concatenate((order[::-1], np.flatnonzero(degrees == 0)))
+
+def ComputeMortonKeys(points, min_coords, max_coords):
+    """Returns the Morton (Z-order) keys of the points, the position along a space-filling curve
+    The points are scaled to the box given by "min_coords" and "max_coords", 21 bits per direction
+    """
+    num_bits = 21
+    extents = np.maximum(np.asarray(max_coords) - np.asarray(min_coords), 1e-300)
+    scaled_points = (np.asarray(points) - min_coords) / extents * (2**num_bits - 1)
+    scaled_points = np.clip(scaled_points, 0, 2**num_bits - 1).astype(np.uint64)
+
+    def SpreadBits(values):
+        """Inserts two zeros after each bit"""
+        for shift, mask in [(32, 0x1f00000000ffff), (16, 0x1f0000ff0000ff), (8, 0x100f00f00f00f00f),
+                            (4, 0x10c30c30c30c30c3), (2, 0x1249249249249249)]:
+            values = (values | (values << np.uint64(shift))) & np.uint64(mask)
+        return values
+
+    return (SpreadBits(scaled_points[:,0]) |
+           (SpreadBits(scaled_points[:,1]) << np.uint64(1)) |
+           (SpreadBits(scaled_points[:,2]) << np.uint64(2)))
+
+def NumberOfEntities(entities):
+    """Returns the number of entities in a list that can contain
+    single entities as well as arrays of entities
+    """
+    return sum([entity.NumberOfEntities() for entity in entities])
+
 class Node(object):
     def __init__(self, Id, coordinates, nodal_data=None):
         self.Id = Id
@@ -88,7 +462,540 @@ class Node(object):
         return node
 
 
+class NodeStore(collections.abc.Mapping):
+    """
+    This class stores nodes as struct of arrays: an array of sorted IDs
+    and an array with the coordinates (one row per node)
+    Nodes are found with a binary search and added in bulk
+    It can be used like the nodes-dict ({ID : [[X, Y, Z], nodal_data]})
+    """
+    def __init__(self, ids=None, coords=None, nodal_data=None):
+        if ids is None:
+            ids = np.empty(0, dtype=np.int64)
+            coords = np.empty((0,3), dtype=np.float64)
+        ids = np.asarray(ids, dtype=np.int64)
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1,3)
+        if ids.shape[0] != coords.shape[0]:
+            raise Exception("Number of IDs and number of coordinates do not match!")
+
+        # the nodes are usually ordered already, only sort if this is not the case
+        if not np.all(ids[1:] > ids[:-1]):
+            sort_order = np.argsort(ids, kind="stable") # the first of duplicated nodes stays the first
+            ids = ids[sort_order]
+            coords = coords[sort_order]
+
+            # duplicated nodes are only stored once, they must have the same coordinates
+            is_duplicate = ids[1:] == ids[:-1]
+            if np.any(is_duplicate):
+                CheckCoordinatesOfDuplicatedNodes(ids[1:][is_duplicate], coords[:-1][is_duplicate], coords[1:][is_duplicate])
+                is_first = np.append(True, ~is_duplicate)
+                ids = ids[is_first]
+                coords = coords[is_first]
+
+        self.ids = ids
+        self.coords = coords
+        self.nodal_data = nodal_data # ID : nodal_data, only for nodes that have nodal data
+        if self.nodal_data == None: # this is done bcs default args are shared!
+            self.nodal_data = {}
+
+    def __str__(self):
+        return "NodeStore | number of nodes: " + str(len(self))
+
+    __repr__ = __str__
+
+    def __getitem__(self, node_ID):
+        index = self.GetIndex(node_ID)
+        return [self.coords[index].tolist(), self.GetNodalData(node_ID)]
+
+    def __contains__(self, node_ID):
+        position = np.searchsorted(self.ids, node_ID)
+        return position < self.ids.shape[0] and self.ids[position] == node_ID
+
+    def __iter__(self):
+        # the sorted IDs are converted in chunks, without creating a list of all IDs
+        ids = self.ids # the iteration is not affected by nodes that are added meanwhile
+        for start in range(0, ids.shape[0], NODE_ITERATION_CHUNK_SIZE):
+            yield from ids[start:start+NODE_ITERATION_CHUNK_SIZE].tolist()
+
+    def __len__(self):
+        return self.ids.shape[0]
+
+    def GetIndex(self, node_ID):
+        """Returns the position of a node in the arrays"""
+        if node_ID not in self:
+            raise KeyError(node_ID)
+        return int(np.searchsorted(self.ids, node_ID))
+
+    def GetIndices(self, node_IDs):
+        """Returns the positions of the nodes in the arrays"""
+        node_IDs = np.asarray(node_IDs, dtype=np.int64)
+        positions = np.searchsorted(self.ids, node_IDs)
+        is_missing = positions == self.ids.shape[0]
+        is_missing[~is_missing] = self.ids[positions[~is_missing]] != node_IDs[~is_missing]
+        if np.any(is_missing):
+            raise KeyError(int(node_IDs[np.argmax(is_missing)]))
+        return positions
+
+    def GetIds(self):
+        """Returns the sorted IDs (no copy)"""
+        return self.ids
+
+    def GetCoordinates(self, node_IDs=None):
+        """Returns the coordinates of all nodes (no copy) or of the given nodes"""
+        if node_IDs is None:
+            return self.coords
+        return self.coords[self.GetIndices(node_IDs)]
+
+    def GetNodalData(self, node_ID):
+        """Returns the nodal_data of a node
+        For nodes without nodal_data an empty dict is returned, which is not stored (see "SetNodalData")
+        """
+        if node_ID not in self.nodal_data:
+            if node_ID not in self:
+                raise KeyError(node_ID)
+            return {}
+        return self.nodal_data[node_ID]
+
+    def SetNodalData(self, node_ID, data_name, data_value):
+        if node_ID not in self.nodal_data:
+            if node_ID not in self:
+                raise KeyError(node_ID)
+            self.nodal_data[node_ID] = {}
+        self.nodal_data[node_ID][data_name] = data_value
+
+    def GetNodalDataItems(self, node_IDs=None):
+        """Returns the non-empty nodal_data of all nodes or of the given nodes as [(ID, nodal_data)], sorted by ID"""
+        if node_IDs is not None:
+            node_IDs = set(np.asarray(node_IDs).tolist())
+        return [(node_ID, self.nodal_data[node_ID]) for node_ID in sorted(self.nodal_data.keys())
+                if len(self.nodal_data[node_ID]) > 0 and (node_IDs is None or node_ID in node_IDs)]
+
+    def Union(self, other):
+        """Returns a new NodeStore with the nodes of both NodeStores
+        Nodes that are in both must have the same coordinates
+        """
+        nodal_data = dict(other.nodal_data)
+        for node_ID, data in self.nodal_data.items():
+            if len(data) > 0 or node_ID not in nodal_data:
+                nodal_data[node_ID] = data
+
+        # both are sorted, the nodes of "other" are merged into the nodes of "self"
+        positions = np.searchsorted(self.ids, other.ids)
+        is_existing = positions < self.ids.shape[0]
+        is_existing[is_existing] = self.ids[positions[is_existing]] == other.ids[is_existing]
+        CheckCoordinatesOfDuplicatedNodes(other.ids[is_existing], self.coords[positions[is_existing]], other.coords[is_existing])
+
+        is_new = ~is_existing
+        return NodeStore(np.insert(self.ids, positions[is_new], other.ids[is_new]),
+                         np.insert(self.coords, positions[is_new], other.coords[is_new], axis=0),
+                         nodal_data)
+
+    def AddNodes(self, ids, coords, nodal_data=None):
+        """Adds nodes in bulk, existing nodes must have the same coordinates"""
+        union = self.Union(NodeStore(ids, coords, nodal_data))
+        self.ids, self.coords, self.nodal_data = union.ids, union.coords, union.nodal_data
+
+    def RemoveNodes(self, node_IDs):
+        """Removes nodes in bulk"""
+        is_kept = np.ones(self.ids.shape[0], dtype=bool)
+        is_kept[self.GetIndices(node_IDs)] = False
+        for node_ID in np.asarray(node_IDs).tolist():
+            self.nodal_data.pop(node_ID, None)
+        self.ids = self.ids[is_kept]
+        self.coords = self.coords[is_kept]
+
+
+
+class NodePool(object):
+    """
+    This class stores the nodes of all SubModelParts of a ModelPart
+    Every node is stored once (interned by its ID) in a "NodeStore".
+    The SubModelParts only store the IDs of their nodes. The pool counts
+    how many SubModelParts use a node, nodes that are no longer used are removed
+    """
+    def __init__(self):
+        self.nodes = NodeStore()
+        self.reference_counts = np.empty(0, dtype=np.int64) # same order as the nodes in the NodeStore
+
+    def __str__(self):
+        return "NodePool | number of nodes: " + str(len(self))
+
+    __repr__ = __str__
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node_ID):
+        return node_ID in self.nodes
+
+    def AddNodes(self, nodes):
+        """This function adds nodes ({ID : [[X, Y, Z], nodal_data]} or "NodesArrayMapping")
+        Nodes that exist already must have the same coordinates
+        Returns the IDs of the nodes (in the order of the input)
+        """
+        node_IDs, coords, nodal_data = self.__GetNodesInput(nodes)
+
+        # The nodes are only added if all coordinates match
+        new_nodes = self.nodes.Union(NodeStore(node_IDs, coords, nodal_data))
+
+        reference_counts = np.zeros(len(new_nodes), dtype=np.int64)
+        reference_counts[new_nodes.GetIndices(self.nodes.GetIds())] = self.reference_counts
+        reference_counts[new_nodes.GetIndices(SortedUnique(node_IDs))] += 1
+
+        self.nodes = new_nodes
+        self.reference_counts = reference_counts
+
+        return node_IDs
+
+    def RemoveNodes(self, node_IDs):
+        """This function is called when a SubModelPart no longer uses its nodes
+        Nodes that are not used by any SubModelPart are removed
+        """
+        self.reference_counts[self.nodes.GetIndices(SortedUnique(node_IDs))] -= 1
+        is_unused = self.reference_counts == 0
+        self.nodes.RemoveNodes(self.nodes.GetIds()[is_unused])
+        self.reference_counts = self.reference_counts[~is_unused]
+
+    def GetNodes(self):
+        """Returns the NodeStore with all nodes"""
+        return self.nodes
+
+    def GetCoordinates(self, node_IDs):
+        """Returns the coordinates of the nodes (one row per node)"""
+        return self.nodes.GetCoordinates(node_IDs)
+
+    def GetNodalData(self, node_ID):
+        """Returns the nodal_data of a node, see "NodeStore.GetNodalData" """
+        return self.nodes.GetNodalData(node_ID)
+
+    def GetNodalDataOfNodes(self, node_IDs):
+        """Returns the non-empty nodal_data of the given nodes as [(ID, nodal_data)], sorted by ID"""
+        return self.nodes.GetNodalDataItems(node_IDs)
+
+    def __GetNodesInput(self, nodes):
+        if isinstance(nodes, (global_utils.NodesArrayMapping, NodeStore)):
+            return nodes.GetIds(), nodes.GetCoordinates(), nodes.nodal_data
+
+        node_IDs = np.fromiter(nodes.keys(), dtype=np.int64, count=len(nodes))
+        coords = np.array([node[0] for node in nodes.values()], dtype=np.float64).reshape(-1,3)
+        nodal_data = {node_ID : node[1] for node_ID, node in nodes.items() if len(node[1]) > 0}
+
+        return node_IDs, coords, nodal_data
+
+
+
+class NodePoolView(collections.abc.Mapping):
+    """
+    This class exposes the nodes of a SubModelPart, which are stored in a "NodePool",
+    in the same way as the nodes-dict ({ID : [[X, Y, Z], nodal_data]})
+    """
+    def __init__(self, node_pool, node_IDs):
+        self.node_pool = node_pool
+        self.node_IDs = node_IDs
+
+    def __str__(self):
+        return "NodePoolView | number of nodes: " + str(len(self))
+
+    __repr__ = __str__
+
+    def __getitem__(self, node_ID):
+        return self.node_pool.GetNodes()[node_ID]
+
+    def __iter__(self):
+        return iter(self.node_IDs.tolist())
+
+    def __len__(self):
+        return self.node_IDs.shape[0]
+
+    def GetIds(self):
+        return self.node_IDs
+
+    def GetNodalDataByIndex(self):
+        """Returns the non-empty nodal_data as {position of the node : nodal_data}"""
+        nodal_data = self.node_pool.GetNodes().nodal_data
+        return {i : nodal_data[node_ID] for i, node_ID in enumerate(self.node_IDs.tolist())
+                if node_ID in nodal_data and len(nodal_data[node_ID]) > 0}
+
+
+
+class EntityInstanceTable(object):
+    """
+    This class stores the Kratos entities that are created from the geometric entities
+    It is shared by the SubModelParts such that an entity that belongs to several
+    SubModelParts is created only once. The key is (geometric entity, name of the
+    Kratos entity, property ID), where the geometric entity is either a "GeometricEntity"
+    (one row) or a "GeometricEntitiesArray" (all rows of one geometry)
+    The SubModelParts release their instances with "ReleaseInstances", an instance is
+    removed when no SubModelPart uses it anymore (like the nodes in the "NodePool")
+    The Kratos entities (and their IDs) are dropped all at once with "Clear"
+    """
+    def __init__(self):
+        # (name, property ID) : {id(geometric entity) : instance}, a tuple per instance would need more memory
+        self.instances = {}
+        self.reference_counts = {} # same keys as "instances", only for instances that are used more than once
+
+    def __str__(self):
+        return "EntityInstanceTable | number of instances: " + str(len(self))
+
+    __repr__ = __str__
+
+    def __len__(self):
+        return sum([len(instances) for instances in self.instances.values()])
+
+    def GetInstance(self, origin_entity, name, class_object, property_ID):
+        # The instance keeps the origin entity alive, therefore its id cannot be reused
+        return self.GetInstances([origin_entity], name, class_object, property_ID)[0]
+
+    def GetInstances(self, origin_entities, name, class_object, property_ID):
+        """Same as "GetInstance" for a list of geometric entities"""
+        instances = self.instances.setdefault((name, property_ID), {})
+        reference_counts = self.reference_counts.setdefault((name, property_ID), {})
+        keys = [id(origin_entity) for origin_entity in origin_entities]
+        new_instances = [instances.get(key) for key in keys]
+        for i, instance in enumerate(new_instances):
+            if instance is None:
+                new_instances[i] = instances[keys[i]] = class_object(origin_entities[i], name, property_ID)
+            else:
+                reference_counts[keys[i]] = reference_counts.get(keys[i], 1) + 1
+        return new_instances
+
+    def ReleaseInstances(self, instances):
+        """Releases the given instances (obtained with "GetInstance(s)"), the ones that
+        are not used anymore are removed. Instances that were removed already are ignored
+        """
+        for instance in instances:
+            if isinstance(instance, KratosEntitiesArray):
+                origin_entity = instance.origin_entities
+            else:
+                origin_entity = instance.origin_entity
+            name_key = (instance.name, instance.property_ID)
+            key = id(origin_entity)
+            if self.instances.get(name_key, {}).get(key) is not instance:
+                continue # e.g. after "Clear"
+            reference_count = self.reference_counts[name_key].pop(key, 1) - 1
+            if reference_count == 0:
+                del self.instances[name_key][key]
+            elif reference_count > 1:
+                self.reference_counts[name_key][key] = reference_count
+
+    def Clear(self):
+        self.instances = {}
+        self.reference_counts = {}
+
+
+
+class NodeIdMap(object):
+    """
+    This class maps the IDs of the nodes to the IDs with which they are written,
+    e.g. after merging coincident nodes. Several nodes can be mapped to the same ID
+    If the IDs are not too sparse, a lookup table (indexed by the ID) is used
+    """
+    def __init__(self, node_IDs, new_node_IDs):
+        self.node_IDs = node_IDs # sorted
+        self.new_node_IDs = new_node_IDs
+        self.mapping = None
+        self.lookup_table = None
+        if self.node_IDs.shape[0] > 0 and self.node_IDs[-1] <= 4 * self.node_IDs.shape[0] + 1024:
+            self.lookup_table = np.zeros(self.node_IDs[-1] + 1, dtype=np.int64)
+            self.lookup_table[self.node_IDs] = self.new_node_IDs
+
+    def __str__(self):
+        return "NodeIdMap | number of nodes: " + str(self.node_IDs.shape[0])
+
+    __repr__ = __str__
+
+    def MapIds(self, node_IDs):
+        """Maps an array of IDs (of any shape) in bulk"""
+        if self.lookup_table is not None:
+            return self.lookup_table[node_IDs]
+        return self.new_node_IDs[np.searchsorted(self.node_IDs, node_IDs)]
+
+    def MapIdList(self, node_IDs):
+        """Maps a list of IDs, this is used for single entities"""
+        mapping = self.GetMapping()
+        return [mapping[node_ID] for node_ID in node_IDs]
+
+    def GetMapping(self):
+        """Returns the mapping as dict {ID : new ID}"""
+        if self.mapping is None:
+            self.mapping = dict(zip(self.node_IDs.tolist(), self.new_node_IDs.tolist()))
+        return self.mapping
+
+
+
+class BufferedFileWriter(object):
+    """
+    This class is a file-like object that collects the written text in buffers of (at least)
+    "buffer_size" characters, which are written to "open_file" by a separate thread
+    This way the formatting of the lines overlaps with the (blocking) writing to the disk
+    At most "max_queued_buffers" full buffers are waiting to be written, when the queue is full
+    "write" blocks until the writing thread is ready (this time is counted as stall time)
+    "close" writes the remaining text (but does not close "open_file") and logs the throughput
+    """
+    def __init__(self, open_file, buffer_size=8*1024**2, max_queued_buffers=1):
+        self.open_file = open_file
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.buffered_size = 0
+        self.queue = queue.Queue(maxsize=max(max_queued_buffers, 1))
+        self.exception = None # exception raised in the writing thread
+        self.num_written_chars = 0
+        self.stall_time = 0.0 # time "write" waited for the writing thread
+        self.write_time = 0.0 # time the writing thread spent in writing
+        self.start_time = time.time()
+        self.thread = threading.Thread(target=self.__WriteBuffers, daemon=True)
+        self.thread.start()
+
+    def __str__(self):
+        return "BufferedFileWriter | buffer size: " + str(self.buffer_size) + "; file: " + str(getattr(self.open_file, "name", self.open_file))
+
+    __repr__ = __str__
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else: # stop the writing thread without hiding the exception
+            self.queue.put(None)
+            self.thread.join()
+
+    def write(self, text):
+        self.buffer.append(text)
+        self.buffered_size += len(text)
+        if self.buffered_size >= self.buffer_size:
+            self.__QueueBuffer()
+
+    def close(self):
+        if not self.thread.is_alive():
+            return
+        self.__QueueBuffer()
+        self.queue.put(None) # stops the writing thread
+        self.thread.join()
+        if self.exception is not None:
+            raise self.exception
+
+        megabytes = self.num_written_chars / 1e6
+        elapsed_time = max(time.time() - self.start_time, 1e-9)
+        global_utils.LogTiming("Writing {:.1f} MB ({:.1f} MB/s, stalled {:.2f} sec, writing {:.2f} sec)".format(
+            megabytes, megabytes / elapsed_time, self.stall_time, self.write_time), self.start_time)
+
+    def __QueueBuffer(self):
+        if self.exception is not None:
+            raise self.exception
+        if self.buffered_size == 0:
+            return
+        text = "".join(self.buffer)
+        self.buffer = []
+        self.buffered_size = 0
+
+        start_time = time.time()
+        self.queue.put(text)
+        self.stall_time += time.time() - start_time
+
+    def __WriteBuffers(self):
+        while True:
+            text = self.queue.get()
+            if text is None:
+                return
+            if self.exception is not None:
+                continue # the remaining buffers are dropped, such that "write" does not block
+            try:
+                start_time = time.time()
+                self.open_file.write(text)
+                self.write_time += time.time() - start_time
+                self.num_written_chars += len(text)
+            except Exception as e:
+                self.exception = e
+
+
+
+class BlockCompressedFileWriter(object):
+    """
+    This class is a file-like object that compresses the written text in independent blocks
+    of "block_size" characters in a pool of "num_workers" threads (gzip and xz release the GIL
+    while compressing). The compressed blocks are written in order as separate gzip members or
+    xz streams, which are decompressed as one file (e.g. by "gunzip", "xz -d" or "gzip.open")
+    At most two blocks per worker are compressed or waiting to be written at the same time
+    """
+    def __init__(self, file_path, compression, level, num_workers, block_size=16*1024**2):
+        if compression == "gzip":
+            self.compress = lambda data : gzip.compress(data, compresslevel=level, mtime=0)
+        elif compression == "xz":
+            self.compress = lambda data : lzma.compress(data, format=lzma.FORMAT_XZ, preset=level)
+        else:
+            raise Exception('Unknown compression "{}"'.format(compression))
+
+        self.name = file_path
+        self.block_size = block_size
+        self.buffer = []
+        self.buffered_size = 0
+        self.max_pending_blocks = 2 * max(num_workers, 1)
+        self.pending_blocks = collections.deque() # futures of the compressed blocks, in order
+        self.num_chars = 0
+        self.num_compressed_bytes = 0
+        self.start_time = time.time()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(num_workers, 1))
+        self.file = open(file_path, "wb")
+
+    def __str__(self):
+        return "BlockCompressedFileWriter | block size: " + str(self.block_size) + "; file: " + str(self.name)
+
+    __repr__ = __str__
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else: # stop without hiding the exception
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.file.close()
+
+    def write(self, text):
+        self.buffer.append(text)
+        self.buffered_size += len(text)
+        if self.buffered_size >= self.block_size:
+            self.__SubmitBlock()
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.__SubmitBlock()
+        while len(self.pending_blocks) > 0:
+            self.__WriteNextBlock()
+        self.executor.shutdown()
+        self.file.close()
+
+        global_utils.LogTiming("Compressing {:.1f} MB to {:.1f} MB".format(self.num_chars / 1e6, self.num_compressed_bytes / 1e6), self.start_time)
+
+    def __SubmitBlock(self):
+        if self.buffered_size == 0:
+            return
+        text = "".join(self.buffer)
+        self.buffer = []
+        self.buffered_size = 0
+        self.num_chars += len(text)
+        if os.linesep != "\n": # same as in text-mode
+            text = text.replace("\n", os.linesep)
+
+        self.pending_blocks.append(self.executor.submit(self.compress, text.encode()))
+        while len(self.pending_blocks) > self.max_pending_blocks:
+            self.__WriteNextBlock()
+
+    def __WriteNextBlock(self):
+        compressed_block = self.pending_blocks.popleft().result()
+        self.file.write(compressed_block)
+        self.num_compressed_bytes += len(compressed_block)
+
+
+
 class KratosEntity(object):
+    # "__slots__" are used to reduce the memory footprint, since there are many entities
+    __slots__ = ["is_node", "origin_entity", "name", "property_ID", "new_ID", "is_added_already"]
+
     def __init__(self, origin_entity, name, property_ID):
         self.is_node = False
         if isinstance(origin_entity, int):
@@ -126,20 +1033,39 @@ class KratosEntity(object):
             return False
         return True
 
-    def GetWriteLine(self, format_str, space):
-        # "0" is the Property Placeholder
-        line = format_str.format(str(self.new_ID), str(self.property_ID))
+    def GetWriteLines(self, get_row_formatter, node_ID_map=None, write_origin_IDs=False):
+        return KratosEntity.GetWriteLinesOfEntities([self], get_row_formatter, node_ID_map, write_origin_IDs)
 
-        if self.is_node:
-            line += space + str(self.origin_entity)
-        else:
-            for node in self.origin_entity.GetNodeList():
-                line += space + str(node)
+    @staticmethod
+    def GetWriteLinesOfEntities(entities, get_row_formatter, node_ID_map=None, write_origin_IDs=False):
+        """This function returns the lines of the entities, including the line breaks
+        "get_row_formatter" is called with (num_nodes, property_ID, write_origin_IDs), see "CreateRowFormatter"
+        """
+        lines = []
+        last_row_formatter_key = None
+        for entity in entities:
+            if entity.is_node:
+                node_list = [entity.origin_entity]
+            else:
+                node_list = entity.origin_entity.GetNodeList()
+            if node_ID_map is not None:
+                node_list = node_ID_map.MapIdList(node_list)
+
+            write_origin_ID = write_origin_IDs and not entity.is_node # nodes have no origin ID
+            row_formatter_key = (len(node_list), entity.property_ID, write_origin_ID)
+            if row_formatter_key != last_row_formatter_key: # consecutive entities mostly use the same formatter
+                row_formatter = get_row_formatter(*row_formatter_key)
+                last_row_formatter_key = row_formatter_key
+
+            if write_origin_ID:
+                lines.append(row_formatter(entity.new_ID, *node_list, entity.origin_entity.GetID()))
+            else:
+                lines.append(row_formatter(entity.new_ID, *node_list))
 
-            if global_utils.DEBUG:
-                line += " // " + str(self.origin_entity.GetID()) # add the origin ID
+        return "".join(lines)
 
-        return line
+    def NumberOfEntities(self):
+        return 1
 
     def SetIsAdded(self):
         self.is_added_already = True
@@ -159,6 +1085,9 @@ class KratosEntity(object):
             raise RuntimeError("No new ID has been assiged")
         return self.new_ID
 
+    def GetIDs(self):
+        return [self.GetID()]
+
     def GetNodeList(self):
         return self.origin_entity.GetNodeList()
 
@@ -168,12 +1097,19 @@ class KratosEntity(object):
     def GetEntityData(self):
         return self.origin_entity.GetEntityData()
 
+    def GetEntityDataWithIDs(self):
+        if self.HasEntityData():
+            return [(self.GetID(), self.GetEntityData())]
+        return []
+
     def SetEntityData(self, data_name, data_value):
         self.origin_entity.SetEntityData(data_name, data_value)
 
 
 
 class Element(KratosEntity):
+    __slots__ = []
+
     def __init__(self, origin_entity, name, property_ID):
         super(Element, self).__init__(origin_entity, name, property_ID)
 
@@ -185,6 +1121,8 @@ class Element(KratosEntity):
 
 
 class Condition(KratosEntity):
+    __slots__ = []
+
     def __init__(self, origin_entity, name, property_ID):
         super(Condition, self).__init__(origin_entity, name, property_ID)
 
@@ -195,6 +1133,134 @@ class Condition(KratosEntity):
 
 
 
+class KratosEntitiesArray(object):
+    """
+    This class is the array-based counterpart of "KratosEntity"
+    It represents the Kratos entities that are created from all rows
+    of a "GeometricEntitiesArray", the new IDs are stored in an array
+    """
+    def __init__(self, origin_entities, name, property_ID):
+        self.origin_entities = origin_entities # GeometricEntitiesArray
+
+        self.name = name
+        self.property_ID = property_ID
+        self.new_IDs = None
+        self.row_order = None # order in which the rows are numbered, None means row by row
+        self.is_added_already = False
+
+    def __str__(self):
+        stringbuf = "Name: " + self.name
+        stringbuf += "; PropID: " + str(self.property_ID)
+        stringbuf += "; NumberOfEntities: " + str(self.NumberOfEntities())
+        stringbuf += "; OriginEntities: " + str(self.origin_entities)
+
+        return stringbuf
+
+    __repr__ = __str__
+
+    def __eq__(self, Other):
+        if self.origin_entities != Other.origin_entities:
+            return False
+        if self.name != Other.name:
+            return False
+        if self.property_ID != Other.property_ID:
+            return False
+        return True
+
+    def GetWriteLines(self, get_row_formatter, node_ID_map=None, write_origin_IDs=False, start=0, end=None):
+        """This function returns the lines of all entities (or of the lines [start, end)), including the line breaks
+        "get_row_formatter" is called with (num_nodes, property_ID, write_origin_IDs), see "CreateRowFormatter"
+        """
+        rows_to_write = slice(start, end)
+        if self.row_order is not None: # the lines are written with increasing IDs
+            rows_to_write = self.row_order[start:end]
+        new_IDs = self.GetIDs()[rows_to_write]
+        connectivities = self.origin_entities.GetConnectivities()[rows_to_write]
+        origin_IDs = self.origin_entities.GetOriginIDs()[rows_to_write]
+        if node_ID_map is not None:
+            connectivities = node_ID_map.MapIds(connectivities)
+
+        row_formatter = get_row_formatter(connectivities.shape[1], self.property_ID, write_origin_IDs)
+
+        if write_origin_IDs:
+            rows = np.column_stack((new_IDs, connectivities, origin_IDs))
+        else:
+            rows = np.column_stack((new_IDs, connectivities))
+
+        # the rows are converted to lists in chunks, which keeps the number of temporary lists small
+        chunk_size = 10000
+        return "".join(["".join(itertools.starmap(row_formatter, rows[start : start+chunk_size].tolist()))
+                        for start in range(0, len(rows), chunk_size)])
+
+    def NumberOfEntities(self):
+        return len(self.origin_entities)
+
+    def SetIsAdded(self):
+        self.is_added_already = True
+
+    def IsAddedAlready(self):
+        return self.is_added_already
+
+    def ResetWritingInfo(self):
+        self.new_IDs = None
+        self.row_order = None
+        self.is_added_already = False
+
+    def SetOrder(self, row_order):
+        """Sets the order in which the entities are numbered (has to be called before "SetID")"""
+        self.row_order = row_order
+
+    def SetID(self, first_new_ID):
+        """The entities are numbered consecutively, starting from "first_new_ID" """
+        self.new_IDs = np.arange(first_new_ID, first_new_ID + self.NumberOfEntities(), dtype=np.int64)
+        if self.row_order is not None:
+            new_IDs = np.empty_like(self.new_IDs)
+            new_IDs[self.row_order] = self.new_IDs
+            self.new_IDs = new_IDs
+
+    def GetIDs(self):
+        if self.new_IDs is None:
+            raise RuntimeError("No new IDs have been assiged")
+        return self.new_IDs
+
+    def GetConnectivities(self):
+        return self.origin_entities.GetConnectivities()
+
+    def HasEntityData(self):
+        return self.origin_entities.HasEntityData()
+
+    def GetEntityData(self):
+        return self.origin_entities.GetEntityData()
+
+    def GetEntityDataWithIDs(self):
+        new_IDs = self.GetIDs()
+        entity_data = self.GetEntityData()
+        return [(int(new_IDs[row]), entity_data[row]) for row in sorted(entity_data.keys())]
+
+
+
+class ElementsArray(KratosEntitiesArray):
+    def __init__(self, origin_entities, name, property_ID):
+        super(ElementsArray, self).__init__(origin_entities, name, property_ID)
+
+    def __str__(self):
+        return "ElementsArray | " + super(ElementsArray, self).__str__()
+
+    __repr__ = __str__
+
+
+
+class ConditionsArray(KratosEntitiesArray):
+    def __init__(self, origin_entities, name, property_ID):
+        super(ConditionsArray, self).__init__(origin_entities, name, property_ID)
+
+    def __str__(self):
+        return "ConditionsArray | " + super(ConditionsArray, self).__str__()
+
+    __repr__ = __str__
+
+
+
 class MainModelPart:
     def __init__(self):
         self.__Initialize()
@@ -202,14 +1268,24 @@ class MainModelPart:
 
     def __Initialize(self):
         self.sub_model_parts = {}
+        self.node_pool = NodePool() # nodes of all SubModelParts
+        self.entity_instances = EntityInstanceTable() # elements and conditions of all SubModelParts
         self.__InitializeMesh()
+        self.assembled_smp_names = [] # SubModelParts in the order they were assembled
+        self.assembly_checkpoints = [] # number of elements and conditions (by name) before each SubModelPart
+        self.ordered_entities = False # whether the entities were ordered in the last assembly
+        self.ordering_bounds = None # bounding box of the nodes with which the entities were ordered
         self.mesh_read = False
         self.precision = 12 # Same as in Kratos ("/kratos/includes/gid_io.h")
+        self.node_chunk_size = 100000 # number of nodes that are formatted at once
+        self.entity_chunk_size = 100000 # number of elements / conditions that are formatted at once
+        self.max_pending_sections = 16 # number of sections that are kept in memory when writing with several workers
         self.num_spaces = 3 # number of spaces in mdpa btw numbers
 
 
     def __InitializeMesh(self):
-        self.nodes = {} # ID : [Coord_X, Coord_Y, Coord_Z]
+        self.nodes = NodeStore()
+        self.node_ID_map = None # only used if nodes are written with different IDs
         self.elements = {} # Name : [List]
         self.conditions = {} # Name : [List]
         self.node_counter = 1
@@ -275,8 +1351,15 @@ class MainModelPart:
         if smp_name in self.sub_model_parts.keys():
             raise NameError("SubModelPart \"" + smp_name + "\" exists already!")
 
-        self.sub_model_parts[smp_name] = MeshSubmodelPart()
-        self.sub_model_parts[smp_name].FillWithEntities(smp_info_dict, mesh_dict, nodes_read, geom_entities_read)
+        smp = MeshSubmodelPart(self.node_pool, self.entity_instances)
+        smp.FillWithEntities(smp_info_dict, mesh_dict, nodes_read, geom_entities_read) # checks the coordinates of the nodes
+
+        # The new nodes can add nodal data to the nodes of the other SubModelParts
+        for other_smp in self.sub_model_parts.values():
+            if other_smp.CreatesEntitiesFromNodes():
+                other_smp.ResetAssembly()
+
+        self.sub_model_parts[smp_name] = smp
 
         self.mesh_read = True
 
@@ -291,7 +1374,10 @@ class MainModelPart:
 
 
     def RemoveSubmodelPart(self, name_smp):
-        self.sub_model_parts.pop(name_smp, None)
+        smp = self.sub_model_parts.pop(name_smp, None)
+        if smp is not None:
+            smp.ReleaseNodes()
+            smp.ReleaseEntities()
 
 
     def Serialize(self):
@@ -306,64 +1392,128 @@ class MainModelPart:
 
 
     def Deserialize(self, serialized_dict):
-        # This function constructs a modelpart from a serialized dictionary
+        """This function constructs a modelpart from a serialized dictionary
+        SubModelParts with nodes that exist already with different coordinates (projects of older
+        versions can contain them) are skipped, the names of the skipped SubModelParts are returned
+        """
         self.Reset()
 
+        skipped_smp_names = []
         for smp_name in sorted(serialized_dict.keys()):
             if smp_name != "general":
-                self.sub_model_parts[smp_name] = MeshSubmodelPart()
-                self.sub_model_parts[smp_name].Deserialize(smp_name, serialized_dict[smp_name])
+                smp = MeshSubmodelPart(self.node_pool, self.entity_instances)
+                try:
+                    smp.Deserialize(smp_name, serialized_dict[smp_name])
+                except ValueError as e: # the nodes are only added if all coordinates match
+                    global_utils.LogError("SubModelPart \"" + smp_name + "\" is skipped: " + str(e))
+                    skipped_smp_names.append(smp_name)
+                    continue
+                self.sub_model_parts[smp_name] = smp
 
         self.mesh_read = True
 
         global_utils.LogDebug("Deserialized ModelPart")
 
+        return skipped_smp_names
+
 
     def GetTreeItems(self):
         return sorted(self.sub_model_parts.keys()) # return sorted bcs it is also sorted in the json format!
 
-    def WriteMesh(self, mdpa_file_path, info_text="", readable_mdpa=False): # TODO use this
-        self.__Assemble(readable_mdpa) # TODO only do this if sth has changed
+    def WriteMesh(self, mdpa_file_path, info_text="", readable_mdpa=False, merge_tolerance=None, renumber_nodes=False,
+                  order_entities=False, compact_node_ids=False, workers=1, write_buffer_size=None,
+                  compression=None, compression_level="default", compression_workers=1): # TODO use this
+        """Writes the mdpa file
+        If "merge_tolerance" is given, nodes (of all SubModelParts) whose distance is not larger
+        than the tolerance are merged into the node with the smallest ID, see "FindCoincidentNodes"
+        With "renumber_nodes" the nodes are renumbered (starting from 1) to reduce the bandwidth,
+        see "ReverseCuthillMcKee"
+        With "order_entities" the elements and conditions are numbered along a space-filling
+        curve, such that entities that are close to each other get close IDs
+        With "compact_node_ids" the nodes are renumbered consecutively (starting from 1)
+        The IDs with which the nodes were written are returned by "GetNodeIdMapping"
+        With "workers" > 1 the sections of the file (chunks of nodes and entities, data blocks and
+        SubModelParts) are rendered in parallel and written in order, see "WriteSections"
+        With "write_buffer_size" (number of characters) the file is written by a separate thread
+        in buffers of this size, see "BufferedFileWriter"
+        The file is compressed while it is written if the path ends with ".mdpa.gz" / ".mdpa.xz" or with
+        "compression" ("gzip" or "xz"), "compression_level" is "fast", "default", "best" or the level itself
+        With "compression_workers" > 1 the file is compressed in blocks in parallel, see "BlockCompressedFileWriter"
+        """
+        self.__Assemble(readable_mdpa, merge_tolerance, renumber_nodes, order_entities, compact_node_ids)
 
         start_time = time.time()
         global_utils.LogInfo("Writing Mesh")
 
         # Write Header
-        if not mdpa_file_path.endswith('.mdpa'):
-             mdpa_file_path += ".mdpa"
-        with open(mdpa_file_path,"w") as mdpa_file:
-            self.__WriteMeshInfo(mdpa_file, info_text)
-            mdpa_file.write("\nBegin ModelPartData\n//  VARIABLE_NAME value\nEnd ModelPartData\n\n")
-            mdpa_file.write("Begin Properties 0\nEnd Properties\n\n")
+        mdpa_file_path, compression = GetMdpaFilePath(mdpa_file_path, compression)
+        sections = self.__GetWriteSections(info_text, readable_mdpa)
+        # the processes of the workers are forked before the file writers start their threads
+        with (CreateSectionsExecutor(sections, workers) if workers > 1 else contextlib.nullcontext()) as executor:
+            with OpenMdpaFile(mdpa_file_path, compression, compression_level, compression_workers) as mdpa_file:
+                if write_buffer_size is None:
+                    WriteSections(mdpa_file, sections, workers, self.max_pending_sections, executor)
+                else:
+                    with BufferedFileWriter(mdpa_file, write_buffer_size) as buffered_file:
+                        WriteSections(buffered_file, sections, workers, self.max_pending_sections, executor)
 
-            # Write Nodes
-            self.__WriteNodes(mdpa_file, readable_mdpa)
+                global_utils.LogTiming("Mesh writing time", start_time)
 
-            # Write Elements
-            self.__WriteElements(mdpa_file, readable_mdpa)
+        return True
 
-            # Write Conditions
-            self.__WriteConditions(mdpa_file, readable_mdpa)
 
-            # Write Nodal Data
-            self.__WriteNodalData(mdpa_file, readable_mdpa)
+    def GetNodeIdMapping(self):
+        """Returns the IDs of the nodes and the IDs with which they were written
+        in the last call to "WriteMesh" (as two arrays)
+        """
+        if self.node_ID_map is None:
+            return self.nodes.GetIds(), self.nodes.GetIds()
+        return self.node_ID_map.node_IDs, self.node_ID_map.new_node_IDs
 
-            # Write Elemental Data
-            self.__WriteGeometricalEntityData(mdpa_file, readable_mdpa, self.elements, "Element")
 
-            # Write Conditional Data
-            self.__WriteGeometricalEntityData(mdpa_file, readable_mdpa, self.conditions, "Condition")
+    def WriteNodeIdMapping(self, file_path):
+        """Writes the mapping of the node IDs (see "GetNodeIdMapping") to a file, one node per line:
+        ID new_ID
+        """
+        node_IDs, new_node_IDs = self.GetNodeIdMapping()
+        np.savetxt(file_path, np.column_stack((node_IDs, new_node_IDs)), fmt="%d")
 
-            # Write SubModelParts
-            for smp_name in sorted(self.sub_model_parts.keys()):
-                smp = self.sub_model_parts[smp_name]
-                smp.WriteMesh(mdpa_file, readable_mdpa)
 
-            global_utils.LogTiming("Mesh writing time", start_time)
+    def __GetWriteSections(self, info_text, readable_mdpa):
+        """Returns the sections of the mdpa file in the order in which they are written, see "WriteSections"
+        The nodes and the entities are split into chunks
+        """
+        sections = []
 
-        self.__ClearAfterWriting()
+        # Write Header
+        sections.append((self.__WriteMeshInfo, (info_text,)))
+        sections.append("\nBegin ModelPartData\n//  VARIABLE_NAME value\nEnd ModelPartData\n\n")
+        sections.append("Begin Properties 0\nEnd Properties\n\n")
 
-        return True
+        # Write Nodes
+        sections.extend(self.__GetNodeSections(readable_mdpa))
+
+        # Write Elements
+        sections.extend(self.__GetGeometricEntitiesSections(readable_mdpa, self.elements, "Elements", self.NumberOfElements()))
+
+        # Write Conditions
+        sections.extend(self.__GetGeometricEntitiesSections(readable_mdpa, self.conditions, "Conditions", self.NumberOfConditions()))
+
+        # Write Nodal Data
+        sections.append((self.__WriteNodalData, (readable_mdpa,)))
+
+        # Write Elemental Data
+        sections.append((self.__WriteGeometricalEntityData, (readable_mdpa, self.elements, "Element")))
+
+        # Write Conditional Data
+        sections.append((self.__WriteGeometricalEntityData, (readable_mdpa, self.conditions, "Condition")))
+
+        # Write SubModelParts
+        for smp_name in sorted(self.sub_model_parts.keys()):
+            smp = self.sub_model_parts[smp_name]
+            sections.append((smp.WriteMesh, (readable_mdpa, self.node_ID_map)))
+
+        return sections
 
 
     def __WriteMeshInfo(self, open_file, info_text=""):
@@ -383,17 +1533,15 @@ class MainModelPart:
         open_file.write("// Number of SubModelParts: " + str(num_smps_to_write) + "\n")
         for smp_name in sorted(self.sub_model_parts.keys()):
             smp = self.sub_model_parts[smp_name]
-            smp.WriteMeshInfo(open_file)
+            smp.WriteMeshInfo(open_file, self.node_ID_map)
         open_file.write("\n// Listing the SubModelParts: \"" + '", "'.join(sorted(self.sub_model_parts.keys())) + "\"\n")
 
         open_file.write("\n")
 
 
-    def __WriteNodes(self, open_file, readable_mdpa):
-        open_file.write("Begin Nodes\n")
-
+    def __GetNodeSections(self, readable_mdpa):
         if readable_mdpa:
-            max_ID = max(self.nodes.keys())
+            max_ID = max(self.nodes.GetIds().tolist())
             global_utils.LogDebug("Max Node ID: " + str(max_ID))
 
             spaces_coords_x = '{:>' + str(len(str(int(self.max_node_coord_x))) + self.precision + self.num_spaces) + '} '
@@ -405,51 +1553,34 @@ class MainModelPart:
 
         global_utils.LogDebug("Node Format String: " + str(format_str))
 
-        for ID in sorted(list(self.nodes.keys())):
-            coords = self.nodes[ID][0]
-
-            coords = [round(coords[0], self.precision),
-                      round(coords[1], self.precision),
-                      round(coords[2], self.precision)]
-
-            line = format_str.format(str(ID), coords[0], str(coords[1]), str(coords[2])) + "\n"
+        # The nodes are written in chunks
+        line_format = (format_str + "\n").format
+        sections = ["Begin Nodes\n"]
+        for start in range(0, len(self.nodes), self.node_chunk_size):
+            sections.append((self.__WriteNodeChunk, (line_format, start, start+self.node_chunk_size)))
+        sections.append("End Nodes\n\n")
 
-            open_file.write(line)
+        return sections
 
-        open_file.write("End Nodes\n\n")
-
-
-    def __WriteElements(self, open_file, readable_mdpa):
-        if readable_mdpa:
-            num_elements = self.NumberOfElements()
-            format_str = '{:>' + str(len(str(num_elements))) + '} {:>' + str(self.num_spaces) + '}'
-            space = "\t"
-        else:
-            format_str = '{} {}'
-            space = " "
 
-        global_utils.LogDebug("Element Format String: " + str(format_str))
-
-        for element_name in sorted(list(self.elements.keys())):
-            open_file.write("Begin Elements " + element_name + "\n")
-            elements_by_name = self.elements[element_name]
-            for elem in elements_by_name:
-                open_file.write(elem.GetWriteLine(format_str, space) + "\n")
-
-            open_file.write("End Elements // " + element_name + "\n\n")
+    def __WriteNodeChunk(self, open_file, line_format, start, end):
+        # The coordinates are rounded and formatted for the whole chunk
+        coords = self.nodes.GetCoordinates()[start:end]
+        lines = map(line_format, self.nodes.GetIds()[start:end].tolist(),
+                    FormatRoundedFloats(coords[:,0], self.precision),
+                    FormatRoundedFloats(coords[:,1], self.precision),
+                    FormatRoundedFloats(coords[:,2], self.precision))
+        open_file.write("".join(lines))
 
     def __WriteNodalData(self, open_file, readable_mdpa):
         all_geom_entity_data = {}
 
         # Extracting the Data from the Nodes
-        for node_id in sorted(list(self.nodes.keys())):
-            node = self.nodes[node_id]
-            nodal_data = node[1]
-            if len(nodal_data) > 0:
-                for var_name, var_data in nodal_data.items():
-                    if not var_name in all_geom_entity_data:
-                        all_geom_entity_data[var_name] = {}
-                    all_geom_entity_data[var_name][node_id] = var_data
+        for node_id, nodal_data in self.nodes.GetNodalDataItems():
+            for var_name, var_data in nodal_data.items():
+                if not var_name in all_geom_entity_data:
+                    all_geom_entity_data[var_name] = {}
+                all_geom_entity_data[var_name][node_id] = var_data
 
         self.__WriteEntityData(open_file, readable_mdpa, all_geom_entity_data, "Nod")
 
@@ -460,9 +1591,7 @@ class MainModelPart:
         for geom_entity_name in sorted(list(geom_entities.keys())):
             geom_entities_by_name = geom_entities[geom_entity_name]
             for geom_entity in geom_entities_by_name:
-                if geom_entity.HasEntityData():
-                    geom_entity_data = geom_entity.GetEntityData()
-                    geom_entity_id = geom_entity.GetID()
+                for geom_entity_id, geom_entity_data in geom_entity.GetEntityDataWithIDs():
                     for var_name, var_data in geom_entity_data.items():
                         if not var_name in all_geom_entity_data:
                             all_geom_entity_data[var_name] = {}
@@ -516,113 +1645,335 @@ class MainModelPart:
         else:
             raise Exception("Wrong data type!", type(variable))
 
-    def __WriteConditions(self, open_file, readable_mdpa):
+    def __GetGeometricEntitiesSections(self, readable_mdpa, all_entities, entity_type_name, num_entities):
+        """This function returns the sections that write the entities (Elements or Conditions) by name
+        The lines are formatted with one formatter per number of nodes and property of each name
+        (see "CreateRowFormatter"), which is applied to chunks of entities
+        """
         if readable_mdpa:
-            num_conditions = self.NumberOfConditions()
-            format_str = '{:>' + str(len(str(num_conditions))) + '} {:>' + str(self.num_spaces) + '}'
-            space = "\t"
+            ID_width = len(str(num_entities))
+            property_width = self.num_spaces
         else:
-            format_str = '{} {}'
-            space = " "
+            ID_width = 0
+            property_width = 0
+        write_origin_IDs = global_utils.DEBUG # add the origin ID
+
+        sections = []
+        for entity_name in sorted(list(all_entities.keys())):
+            sections.append("Begin " + entity_type_name + " " + entity_name + "\n")
+
+            get_row_formatter = self.__GetRowFormatterFunction(readable_mdpa, ID_width, property_width)
+
+            # consecutive single entities are written together
+            is_array = lambda entity : isinstance(entity, KratosEntitiesArray)
+            for entities_are_arrays, entities in itertools.groupby(all_entities[entity_name], key=is_array):
+                if entities_are_arrays:
+                    for entities_array in entities:
+                        for start in range(0, entities_array.NumberOfEntities(), self.entity_chunk_size):
+                            sections.append((self.__WriteEntityLines, (entities_array.GetWriteLines, get_row_formatter, self.node_ID_map,
+                                                                       write_origin_IDs, start, start+self.entity_chunk_size)))
+                else:
+                    entities = list(entities)
+                    for start in range(0, len(entities), self.entity_chunk_size):
+                        sections.append((self.__WriteEntityLines, (KratosEntity.GetWriteLinesOfEntities, entities[start : start+self.entity_chunk_size],
+                                                                   get_row_formatter, self.node_ID_map, write_origin_IDs)))
+
+            sections.append("End " + entity_type_name + " // " + entity_name + "\n\n")
+
+        return sections
+
+
+    def __GetRowFormatterFunction(self, readable_mdpa, ID_width, property_width):
+        """Returns a function that creates the row formatters (see "CreateRowFormatter") and caches them"""
+        row_formatters = {}
+        def GetRowFormatter(num_nodes, property_ID, write_origin_IDs):
+            key = (num_nodes, property_ID, write_origin_IDs)
+            if key not in row_formatters:
+                row_formatters[key] = CreateRowFormatter(num_nodes, property_ID, readable_mdpa,
+                                                         ID_width, property_width, write_origin_IDs)
+            return row_formatters[key]
 
-        global_utils.LogDebug("Condition Format String: " + str(format_str))
+        return GetRowFormatter
 
-        for condition_name in sorted(list(self.conditions.keys())):
-            open_file.write("Begin Conditions " + condition_name + "\n")
-            conditions_by_name = self.conditions[condition_name]
-            for cond in conditions_by_name:
-                open_file.write(cond.GetWriteLine(format_str, space) + "\n")
 
-            open_file.write("End Conditions // " + condition_name + "\n\n")
+    def __WriteEntityLines(self, open_file, get_write_lines, *args):
+        open_file.write(get_write_lines(*args))
 
 
-    def __Assemble(self, readable_mdpa):
-        # TODO Check if this was done before! (same for the submodelparts)
+    def __Assemble(self, readable_mdpa, merge_tolerance=None, renumber_nodes=False, order_entities=False, compact_node_ids=False):
+        """This function assembles the entities of the SubModelParts (in sorted order)
+        The SubModelParts that did not change since the last assembly are reused, only the
+        entities from the first changed SubModelPart on are added (and numbered) again
+        """
         start_time = time.time()
         global_utils.LogInfo("Assembling Mesh")
-        self.__InitializeMesh()
-        for smp_name in sorted(self.sub_model_parts.keys()):
-            smp = self.sub_model_parts[smp_name]
-            smp.Assemble()
-            smp_nodes, smp_elements, smp_conditions = smp.GetMesh()
-            self.__AddNodes(smp_nodes, readable_mdpa)
-            self.__AddElements(smp_elements)
-            self.__AddConditions(smp_conditions)
+
+        smp_names = sorted(self.sub_model_parts.keys())
+        smps = [self.sub_model_parts[smp_name] for smp_name in smp_names]
+
+        ordering_bounds = None
+        if order_entities:
+            node_coords = self.node_pool.GetNodes().GetCoordinates()
+            ordering_bounds = (np.min(node_coords, axis=0, initial=np.inf), np.max(node_coords, axis=0, initial=-np.inf))
+
+        if not any([smp.IsAssembled() for smp in smps]):
+            # Nothing can be reused, the Kratos entities are dropped all at once
+            self.__InitializeMesh()
+            self.entity_instances.Clear()
+            self.assembled_smp_names = []
+            self.assembly_checkpoints = []
+            first_changed = 0
+        else:
+            first_changed = 0
+            for assembled_smp_name, smp_name, smp in zip(self.assembled_smp_names, smp_names, smps):
+                if assembled_smp_name != smp_name or not smp.IsAssembled():
+                    break
+                first_changed += 1
+            if order_entities != self.ordered_entities:
+                first_changed = 0 # all entities have to be numbered again
+            elif order_entities and not all(np.array_equal(new_bounds, old_bounds) for new_bounds, old_bounds in zip(ordering_bounds, self.ordering_bounds)):
+                first_changed = 0 # the Morton keys of the reused entities depend on the bounding box
+            self.__RemoveAssembledEntities(first_changed)
+        self.ordered_entities = order_entities
+        self.ordering_bounds = ordering_bounds
+
+        global_utils.LogDebug("Assembling " + str(len(smp_names) - first_changed) + " of " + str(len(smp_names)) + " SubModelParts")
+
+        for smp_name, smp in zip(smp_names[first_changed:], smps[first_changed:]):
+            self.assembled_smp_names.append(smp_name)
+            self.assembly_checkpoints.append((self.__GetNumberOfEntitiesByName(self.elements),
+                                              self.__GetNumberOfEntitiesByName(self.conditions)))
+            if not smp.IsAssembled():
+                smp.Assemble()
+            self.__AddElements(smp.GetElements(), order_entities)
+            self.__AddConditions(smp.GetConditions(), order_entities)
+        self.__AddNodes(readable_mdpa, merge_tolerance, renumber_nodes, compact_node_ids)
 
         global_utils.LogTiming("Mesh assembling time", start_time)
 
 
-    def __AddNodes(self, smp_nodes, readable_mdpa):
-        for node_ID in smp_nodes.keys():
-            if node_ID in self.nodes.keys():
-                existing_node_coords = self.nodes[node_ID][0]
-                new_coords = smp_nodes[node_ID][0]
-                if existing_node_coords != new_coords:
-                    err_msg  = "Node with ID " + str(node_ID) + " already exists with different coordinates!\n"
-                    err_msg += "\tExisting Coords: [" + str(existing_node_coords[0]) + " , "
-                    err_msg += str(existing_node_coords[1]) + " , "
-                    err_msg += str(existing_node_coords[2]) + "]\n"
-                    err_msg += "\tNew Coords: [" + str(new_coords[0]) + " , "
-                    err_msg += str(new_coords[1]) + " , "
-                    err_msg += str(new_coords[2]) + "] "
-                    raise Exception(err_msg)
+    def __RemoveAssembledEntities(self, first_changed):
+        """This function removes the entities that were added by the
+        SubModelParts from position "first_changed" on in the last assembly
+        """
+        if first_changed < len(self.assembly_checkpoints):
+            num_elements, num_conditions = self.assembly_checkpoints[first_changed]
+            self.__RemoveGeometricEntities(self.elements, num_elements)
+            self.__RemoveGeometricEntities(self.conditions, num_conditions)
+        del self.assembled_smp_names[first_changed:]
+        del self.assembly_checkpoints[first_changed:]
+
+
+    def __RemoveGeometricEntities(self, all_entities, num_entities_by_name):
+        for entity_name in list(all_entities.keys()):
+            entities = all_entities[entity_name]
+            num_entities = num_entities_by_name.get(entity_name, 0)
+            for entity in entities[num_entities:]:
+                entity.ResetWritingInfo() # such that it can be added again
+            if entity_name in num_entities_by_name:
+                del entities[num_entities:]
             else:
-                self.nodes[node_ID] = smp_nodes[node_ID]
-                if readable_mdpa:
-                    if smp_nodes[node_ID][0][0] > self.max_node_coord_x: self.max_node_coord_x = smp_nodes[node_ID][0][0]
-                    if smp_nodes[node_ID][0][1] > self.max_node_coord_y: self.max_node_coord_y = smp_nodes[node_ID][0][1]
-                    if smp_nodes[node_ID][0][2] > self.max_node_coord_z: self.max_node_coord_z = smp_nodes[node_ID][0][2]
+                del all_entities[entity_name]
+
 
+    def __GetNumberOfEntitiesByName(self, all_entities):
+        return {entity_name : len(entities) for entity_name, entities in all_entities.items()}
 
-    def __AddElements(self, smp_elements):
-        self.__AddGeometricEntities(smp_elements, self.elements)
 
+    def __AddNodes(self, readable_mdpa, merge_tolerance=None, renumber_nodes=False, compact_node_ids=False):
+        # The NodePool contains exactly the nodes of the SubModelParts,
+        # the coordinates were checked already when the nodes were added to it
+        self.nodes = self.node_pool.GetNodes()
+        self.node_ID_map = None
 
-    def __AddConditions(self, smp_conditions):
-        self.__AddGeometricEntities(smp_conditions, self.conditions)
+        if merge_tolerance is not None:
+            self.__MergeCoincidentNodes(merge_tolerance)
 
+        if renumber_nodes:
+            self.__RenumberNodes()
+        elif compact_node_ids:
+            self.__CompactNodeIds()
 
-    def __AddGeometricEntities(self, smp_entities, all_entities):
-        id_index = sum([len(val) for val in all_entities.values()]) + 1
+        if readable_mdpa and len(self.nodes) > 0:
+            max_node_coords = np.max(self.nodes.GetCoordinates(), axis=0).tolist()
+            self.max_node_coord_x = max(max_node_coords[0], 0)
+            self.max_node_coord_y = max(max_node_coords[1], 0)
+            self.max_node_coord_z = max(max_node_coords[2], 0)
+
+
+    def __MergeCoincidentNodes(self, merge_tolerance):
+        """The merged nodes are only written once, the other
+        nodes are replaced by them in the elements, conditions and SubModelParts
+        """
+        node_IDs = self.nodes.GetIds()
+        merged_with = FindCoincidentNodes(self.nodes.GetCoordinates(), merge_tolerance)
+        is_kept = merged_with == np.arange(merged_with.shape[0])
+        num_merged_nodes = merged_with.shape[0] - np.count_nonzero(is_kept)
+        global_utils.LogInfo("Merged " + str(num_merged_nodes) + " coincident nodes")
+        if num_merged_nodes == 0:
+            return
+
+        self.node_ID_map = NodeIdMap(node_IDs, node_IDs[merged_with])
+
+        # the nodal data of merged nodes is added to the node they are merged with
+        nodal_data = {}
+        for node_ID, data in self.nodes.GetNodalDataItems():
+            nodal_data.setdefault(self.node_ID_map.GetMapping()[node_ID], data)
+
+        self.nodes = NodeStore(node_IDs[is_kept], self.nodes.GetCoordinates()[is_kept], nodal_data)
+
+
+    def __RenumberNodes(self):
+        """The nodes are renumbered with the Reverse Cuthill-McKee algorithm,
+        based on the connectivities of the elements
+        """
+        num_nodes = len(self.nodes)
+        adjacency_i, adjacency_j = GetNodeAdjacency([self.nodes.GetIndices(connectivity) for connectivity
+                                                     in self.__GetElementConnectivities()], num_nodes)
+
+        order = ReverseCuthillMcKee(num_nodes, adjacency_i, adjacency_j)
+        new_indices = np.empty_like(order)
+        new_indices[order] = np.arange(num_nodes)
+        global_utils.LogInfo("Bandwidth before renumbering the nodes: " + str(ComputeBandwidth(adjacency_i, adjacency_j)))
+        global_utils.LogInfo("Bandwidth after renumbering the nodes: " + str(ComputeBandwidth(adjacency_i, adjacency_j, new_indices)))
+
+        self.__SetNodeOrder(order)
+
+
+    def __CompactNodeIds(self):
+        """The nodes are renumbered consecutively (starting from 1), keeping their order"""
+        num_nodes = len(self.nodes)
+        if num_nodes == 0 or self.nodes.GetIds()[-1] == num_nodes:
+            return # the IDs are already consecutive
+        global_utils.LogInfo("Compacting the node IDs, largest ID: " + str(self.nodes.GetIds()[-1]) + ", number of nodes: " + str(num_nodes))
+        self.__SetNodeOrder(np.arange(num_nodes))
+
+
+    def __SetNodeOrder(self, order):
+        """The nodes are written with the IDs 1 to N in the given order
+        "order" contains the indices (in the NodeStore) of the nodes in the new order
+        """
+        node_IDs = self.nodes.GetIds()
+        num_nodes = len(self.nodes)
+        new_node_IDs = np.empty_like(order)
+        new_node_IDs[order] = np.arange(1, num_nodes + 1)
+        if self.node_ID_map is None:
+            self.node_ID_map = NodeIdMap(node_IDs, new_node_IDs)
+        else: # the nodes were merged before
+            self.node_ID_map = NodeIdMap(self.node_ID_map.node_IDs,
+                                         new_node_IDs[self.nodes.GetIndices(self.node_ID_map.new_node_IDs)])
+
+        nodal_data = {int(new_node_IDs[self.nodes.GetIndex(node_ID)]) : data for node_ID, data in self.nodes.GetNodalDataItems()}
+        self.nodes = NodeStore(np.arange(1, num_nodes + 1), self.nodes.GetCoordinates()[order], nodal_data)
+
+
+    def __GetElementConnectivities(self):
+        """Returns the connectivities of all elements (with the IDs of the nodes as they are written)
+        as arrays with one row per element
+        """
+        connectivities = []
+        node_lists_by_length = {}
+        for element_name in sorted(self.elements.keys()):
+            for element in self.elements[element_name]:
+                if isinstance(element, KratosEntitiesArray):
+                    connectivities.append(element.GetConnectivities())
+                else:
+                    node_list = element.GetNodeList()
+                    node_lists_by_length.setdefault(len(node_list), []).append(node_list)
+        for node_lists in node_lists_by_length.values():
+            connectivities.append(np.array(node_lists, dtype=np.int64))
+
+        if self.node_ID_map is not None:
+            connectivities = [self.node_ID_map.MapIds(connectivity) for connectivity in connectivities]
+        return connectivities
+
+
+    def __AddElements(self, smp_elements, order_entities=False):
+        self.__AddGeometricEntities(smp_elements, self.elements, order_entities)
+
+
+    def __AddConditions(self, smp_conditions, order_entities=False):
+        self.__AddGeometricEntities(smp_conditions, self.conditions, order_entities)
+
+
+    def __AddGeometricEntities(self, smp_entities, all_entities, order_entities=False):
+        id_index = sum([NumberOfEntities(val) for val in all_entities.values()]) + 1
         for entity_name in sorted(smp_entities.keys()):
             entities = smp_entities[entity_name]
 
             if entity_name not in all_entities.keys():
                 all_entities[entity_name] = []
 
+            if order_entities:
+                entities = self.__OrderEntities([entity for entity in entities if not entity.IsAddedAlready()])
+
             for entity in entities:
                 if not entity.IsAddedAlready():
                     all_entities[entity_name].append(entity)
-                    entity.SetID(id_index)
+                    entity.SetID(id_index) # for arrays of entities this is the ID of the first entity
                     entity.SetIsAdded()
-                    id_index += 1
+                    id_index += entity.NumberOfEntities()
 
-    def __ClearAfterWriting(self):
-        """Clearing some old entries
-        Esp since the geometric-entities store the information abt child-elements!
+    def __OrderEntities(self, entities):
+        """This function orders the entities by the Morton keys of their centroids
+        Arrays of entities are numbered in this order (see "KratosEntitiesArray.SetOrder"),
+        single entities are sorted (and put after the arrays)
         """
-        for smp in self.sub_model_parts.values():
-            smp.ClearAfterWriting()
+        nodes = self.node_pool.GetNodes()
+        min_coords, max_coords = self.ordering_bounds
+
+        def ComputeCentroidKeys(connectivities):
+            centroids = np.mean(nodes.GetCoordinates(connectivities), axis=1)
+            return ComputeMortonKeys(centroids, min_coords, max_coords)
+
+        entity_arrays = []
+        single_entities_by_num_nodes = {}
+        for entity in entities:
+            if isinstance(entity, KratosEntitiesArray):
+                entity.SetOrder(np.argsort(ComputeCentroidKeys(entity.GetConnectivities()), kind="stable"))
+                entity_arrays.append(entity)
+            else:
+                single_entities_by_num_nodes.setdefault(len(entity.GetNodeList()), []).append(entity)
+
+        single_entities = []
+        single_entity_keys = [np.empty(0, dtype=np.uint64)]
+        for single_entities_with_num_nodes in single_entities_by_num_nodes.values():
+            connectivities = np.array([entity.GetNodeList() for entity in single_entities_with_num_nodes], dtype=np.int64)
+            single_entities.extend(single_entities_with_num_nodes)
+            single_entity_keys.append(ComputeCentroidKeys(connectivities))
+        sort_order = np.argsort(np.concatenate(single_entity_keys), kind="stable")
+
+        return entity_arrays + [single_entities[i] for i in sort_order.tolist()]
+
 
     def NumberOfNodes(self):
         return len(self.nodes)
 
 
     def NumberOfElements(self):
-        return sum([len(val) for val in self.elements.values()])
+        return sum([NumberOfEntities(val) for val in self.elements.values()])
 
 
     def NumberOfConditions(self):
-        return sum([len(val) for val in self.conditions.values()])
+        return sum([NumberOfEntities(val) for val in self.conditions.values()])
 
 
 class MeshSubmodelPart:
-    def __init__(self):
+    def __init__(self, node_pool=None, entity_instances=None):
         """Constructor of the MeshSubModelPart
         Sets some internal variables
+        The nodes are stored in the "node_pool" and the elements and conditions
+        in "entity_instances" (usually the ones of the MainModelPart)
         """
         self.is_properly_initialized = False
         self.is_assembled = False
+        self.node_pool = node_pool
+        if self.node_pool is None:
+            self.node_pool = NodePool()
+        self.entity_instances = entity_instances
+        if self.entity_instances is None:
+            self.entity_instances = EntityInstanceTable()
+        self.__InitializeMesh()
 
 
     def __InitializeMesh(self):
@@ -644,11 +1995,33 @@ class MeshSubmodelPart:
         self.__ValidateMeshDict(mesh_dict)
         self.mesh_dict = mesh_dict
 
-        self.nodes_read = nodes_read
+        node_ids_read = self.node_pool.AddNodes(nodes_read)
+        self.ReleaseNodes() # in case the SubModelPart was filled before
+        self.node_ids_read = node_ids_read
         self.geom_entities_read = geom_entities_read
         self.is_properly_initialized = True
 
 
+    def ReleaseEntities(self):
+        """This function releases the elements and conditions of this SubModelPart in the
+        EntityInstanceTable, it is called before assembling again and when the SubModelPart is removed
+        """
+        for entities in itertools.chain(self.elements.values(), self.conditions.values()):
+            self.entity_instances.ReleaseInstances(entities)
+        self.elements = {}
+        self.conditions = {}
+
+
+    def ReleaseNodes(self):
+        """This function removes the nodes of this SubModelPart from the NodePool
+        It is called when the SubModelPart is removed
+        """
+        if self.is_properly_initialized:
+            self.node_pool.RemoveNodes(self.node_ids_read)
+            self.is_properly_initialized = False
+            self.is_assembled = False
+
+
     def Update(self, smp_info_dict, mesh_dict):
         """This function updates the MeshSubModelPart
         E.g. if different Elements/Conditions should
@@ -696,12 +2069,33 @@ class MeshSubmodelPart:
                 mesh_dict[k] = v # Assigning the default value
 
 
+    def IsAssembled(self):
+        return self.is_assembled
+
+
+    def ResetAssembly(self):
+        """This function marks the MeshSubModelPart as changed,
+        such that it is assembled again before it is written
+        """
+        self.is_assembled = False
+
+
+    def CreatesEntitiesFromNodes(self):
+        """This function returns whether entities are created from the
+        nodes (and their nodal data), see "__CreateGeometricEntitiesFromNodes"
+        """
+        return (self.is_properly_initialized and
+                global_utils.NODE_IDENTIFIER in self.mesh_dict["entity_creation"] and
+                global_utils.NODE_IDENTIFIER not in self.geom_entities_read)
+
+
     def Assemble(self):
         """This function assembles the entities in the MeshSubModelPart
         After this operation the Object is ready to write it's
         entities to an mdpa file
         """
         self.__CheckIsProperlyInitialized()
+        self.ReleaseEntities() # in case the SubModelPart was assembled before
         self.__InitializeMesh()
 
         # This function creates the Kratos entities from the read entities
@@ -714,18 +2108,18 @@ class MeshSubmodelPart:
 
 
     def __AddNodes(self):
-        self.nodes = self.nodes_read
+        self.nodes = NodePoolView(self.node_pool, self.node_ids_read)
 
 
     def __AddElements(self):
-        self.__AddGeometricEntities("Element", Element, self.elements)
+        self.__AddGeometricEntities("Element", Element, ElementsArray, self.elements)
 
 
     def __AddConditions(self):
-        self.__AddGeometricEntities("Condition", Condition, self.conditions)
+        self.__AddGeometricEntities("Condition", Condition, ConditionsArray, self.conditions)
 
 
-    def __AddGeometricEntities(self, entity_name, entity_class, entity_container):
+    def __AddGeometricEntities(self, entity_name, entity_class, entity_array_class, entity_container):
         entity_container.clear()
 
         for geometry_identifier in self.mesh_dict["entity_creation"].keys():
@@ -745,9 +2139,12 @@ class MeshSubmodelPart:
                         entity_container[ent_name] = []
                     property_ID = entity_dict[ent_name]
 
-                    for entity in entities:
-                        new_entity = entity.GetChildObject(ent_name, entity_class, property_ID)
-                        entity_container[ent_name].append(new_entity)
+                    if isinstance(entities, global_utils.GeometricEntitiesArray):
+                        new_entities = self.entity_instances.GetInstance(entities, ent_name, entity_array_class, property_ID)
+                        entity_container[ent_name].append(new_entities)
+                    else:
+                        new_entities = self.entity_instances.GetInstances(entities, ent_name, entity_class, property_ID)
+                        entity_container[ent_name].extend(new_entities)
 
 
     def __CreateGeometricEntitiesFromNodes(self, nodes):
@@ -755,6 +2152,9 @@ class MeshSubmodelPart:
         from Nodes. This is needed for point-based entities in Kratos,
         e.g. PointLoadCondition, NodalConcentratedElement
         """
+        if isinstance(nodes, (global_utils.NodesArrayMapping, NodePoolView)):
+            return self.__CreateGeometricEntitiesArrayFromNodes(nodes)
+
         geom_entities = []
 
         for node_id, node_data in nodes.items():
@@ -768,9 +2168,33 @@ class MeshSubmodelPart:
 
         return geom_entities
 
+    def __CreateGeometricEntitiesArrayFromNodes(self, nodes):
+        """Same as "__CreateGeometricEntitiesFromNodes", but for
+        nodes that are stored in arrays
+        """
+        node_ids = nodes.GetIds()
+        entity_data = nodes.GetNodalDataByIndex()
+
+        return global_utils.GeometricEntitiesArray(global_utils.NODE_IDENTIFIER,
+                                                   np.full(node_ids.shape[0], -1, dtype=np.int64),
+                                                   node_ids.reshape(-1,1),
+                                                   entity_data)
+
     def GetMesh(self):
         self.__CheckIsAssembled()
-        return self.nodes, self.elements, self.conditions
+        return dict(self.nodes), self.elements, self.conditions
+
+    def GetNodeIds(self):
+        self.__CheckIsAssembled()
+        return self.nodes.GetIds()
+
+    def GetElements(self):
+        self.__CheckIsAssembled()
+        return self.elements
+
+    def GetConditions(self):
+        self.__CheckIsAssembled()
+        return self.conditions
 
     def GetGeomEntites(self): # TODO still needed?
         return self.geom_entities_read
@@ -805,17 +2229,18 @@ class MeshSubmodelPart:
         """Returns the number of Elements in this SubModelPart
         """
         self.__CheckIsAssembled()
-        return sum([len(val) for val in self.elements.values()])
+        return sum([NumberOfEntities(val) for val in self.elements.values()])
 
     def NumberOfConditions(self):
         """Returns the number of Conditions in this SubModelPart
         """
         self.__CheckIsAssembled()
-        return sum([len(val) for val in self.conditions.values()])
+        return sum([NumberOfEntities(val) for val in self.conditions.values()])
 
-    def WriteMesh(self, open_file, readable_mdpa=False):
+    def WriteMesh(self, open_file, readable_mdpa=False, node_ID_map=None):
         """This function writes the SubModelPart to the
         mdpa-file (If wanted).
+        The IDs of the nodes are mapped with "node_ID_map" (if given)
         """
         self.__CheckIsAssembled()
 
@@ -828,14 +2253,14 @@ class MeshSubmodelPart:
             if readable_mdpa:
                 space = "\t"
 
-            self.__WriteNodes(open_file, space)
+            self.__WriteNodes(open_file, space, node_ID_map)
             self.__WriteElements(open_file, space)
             self.__WriteConditions(open_file, space)
 
             open_file.write("End SubModelPart // " + smp_name + "\n\n")
 
 
-    def __WriteNodes(self, open_file, space):
+    def __WriteNodes(self, open_file, space, node_ID_map=None):
         """This function write the SubModelPartNodes to the
         mdpa-file.
         Note that these are only the Ids of the Nodes
@@ -844,7 +2269,7 @@ class MeshSubmodelPart:
 
         open_file.write(space + "Begin SubModelPartNodes\n")
 
-        for ID in sorted(self.nodes.keys()):
+        for ID in self.__GetNodeIdsToWrite(node_ID_map).tolist():
             open_file.write(space + space + str(ID) + "\n")
 
         open_file.write(space + "End SubModelPartNodes\n")
@@ -877,21 +2302,30 @@ class MeshSubmodelPart:
 
         for entity_name in sorted(entities.keys()):
             for entity in entities[entity_name]:
-                open_file.write(space + space + str(entity.GetID()) + "\n")
+                for ID in entity.GetIDs():
+                    open_file.write(space + space + str(ID) + "\n")
 
         open_file.write(space + "End " + smp_entities_name + "\n")
 
     def WriteSubModelPart(self):
         return self.mesh_dict["write_smp"]
 
-    def WriteMeshInfo(self, open_file):
+    def __GetNodeIdsToWrite(self, node_ID_map=None):
+        if node_ID_map is None:
+            return np.sort(self.nodes.GetIds())
+        return SortedUnique(node_ID_map.MapIds(self.nodes.GetIds()))
+
+    def WriteMeshInfo(self, open_file, node_ID_map=None):
         """This function is called by the parent class to write info about this
         SubModelPart to the header of the mdpa-file
         """
         self.__CheckIsAssembled()
         if self.mesh_dict["write_smp"]:
             open_file.write("// SubModelPart " + self.smp_info_dict["smp_name"] + "\n")
-            open_file.write("//   Number of Nodes: " + str(self.NumberOfNodes()) + "\n")
+            num_nodes = self.NumberOfNodes()
+            if node_ID_map is not None:
+                num_nodes = self.__GetNodeIdsToWrite(node_ID_map).shape[0]
+            open_file.write("//   Number of Nodes: " + str(num_nodes) + "\n")
             open_file.write("//   Number of Elements: " + str(self.NumberOfElements()) + "\n")
             open_file.write("//   Number of Conditions: " + str(self.NumberOfConditions()) + "\n")
 
@@ -912,14 +2346,6 @@ class MeshSubmodelPart:
         if not self.is_properly_initialized:
             raise RuntimeError("MeshSubmodelPart is not properly initialized!")
 
-    def ClearAfterWriting(self):
-        """Clearing some old entries
-        Esp since the geometric-entities store the information abt child-elements!
-        """
-        for geom_entities_by_key in self.geom_entities_read.values():
-            for geom_entity in geom_entities_by_key:
-                geom_entity.ClearChildObjects()
-
     ##############################################
     ##### Functions related to Serialization #####
     ##############################################
@@ -939,15 +2365,18 @@ class MeshSubmodelPart:
 
     def __SerializeNodesRead(self):
         self.__AddNodes() # Update the internal information
-        return self.nodes
+        return dict(self.nodes) # the nodes are stored in the NodePool
 
 
     def __SerializeGeomEntitiesRead(self):
         serialized_geom_entities = []
 
         for salome_ID in self.geom_entities_read:
-            for entity in self.geom_entities_read[salome_ID]:
-                serialized_geom_entities.append(entity.Serialize())
+            if isinstance(self.geom_entities_read[salome_ID], global_utils.GeometricEntitiesArray):
+                serialized_geom_entities.extend(self.geom_entities_read[salome_ID].Serialize())
+            else:
+                for entity in self.geom_entities_read[salome_ID]:
+                    serialized_geom_entities.append(entity.Serialize())
 
         return serialized_geom_entities
 